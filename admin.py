@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import University, Administrator
+from data_manager import journal
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -15,7 +16,8 @@ def create_admin():
             data['email'],
             data.get('contact_phone')
         )
-        university.users.append(admin)
+        university.add_user(admin)
+        journal.record('add_admin', admin.admin_id, admin.name, admin.email, data.get('contact_phone'))
         return jsonify(admin.to_dict()), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, g, render_template, request, jsonify
 from flask_cors import CORS
 from auth import auth_bp
 from students import students_bp
@@ -12,6 +12,7 @@ from classrooms import classrooms_bp
 from schedules import schedules_bp
 from library import library_bp
 from exam import exam_bp
+from locking import mutations
 
 def create_app():
     app = Flask(__name__)
@@ -34,6 +35,20 @@ def create_app():
     app.register_blueprint(library_bp, url_prefix='/library')
     app.register_blueprint(exam_bp, url_prefix='/exam')
 
+    # Writes hold the mutation lock shared from changing the model to journaling it, so
+    # /save's compaction (which takes it exclusive) never snapshots an unjournaled change
+    @app.before_request
+    def hold_mutation_lock():
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and request.endpoint != 'data_manager.save_data':
+            g.mutation_lock = mutations.shared()
+            g.mutation_lock.__enter__()
+
+    @app.teardown_request
+    def release_mutation_lock(error=None):
+        lock = g.pop('mutation_lock', None)
+        if lock is not None:
+            lock.__exit__(None, None, None)
+
     @app.route('/')
     def dashboard():
         return render_template('index.html')
@@ -137,5 +152,17 @@ def create_app():
     return app
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="University Management System")
+    parser.add_argument('--socket-port', type=int, help="also serve the binary protocol (server.py) on this port")
+    parser.add_argument('--socket-async', action='store_true', help="use the asyncio socket server")
+    options = parser.parse_args()
     app = create_app()
-    app.run(debug=True)
\ No newline at end of file
+    if options.socket_port is None:
+        app.run(debug=True)
+    else:
+        from server import AsyncUniversityServer, UniversityServer
+        server_class = AsyncUniversityServer if options.socket_async else UniversityServer
+        server_class(port=options.socket_port).serve_in_background()
+        # The reloader would fork a second process that binds the socket port again
+        app.run(debug=True, use_reloader=False)
\ No newline at end of file
@@ -10,13 +10,7 @@ def login():
     password = data.get('password')
     
     university = University.get_instance()
-    user = None
-    
-    # Find user by ID
-    for u in university.users:
-        if u.user_id == user_id:
-            user = u
-            break
+    user = university.get_user(user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -35,7 +29,7 @@ def logout():
     user_id = data.get('user_id')
     
     university = University.get_instance()
-    user = university.get_user(user_id)  # You'll need to implement this method
+    user = university.get_user(user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
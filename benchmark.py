@@ -0,0 +1,731 @@
+import os
+import pickle
+import sys
+import tempfile
+import time
+from models import University, Student, Professor, Course, Library, Classroom, Schedule
+
+def _time_lookups(lookup, ids, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for entity_id in ids:
+            lookup(entity_id)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(ids) * 1e9  # ns per lookup
+
+def bench_registry_lookup(sizes=(1_000, 10_000, 100_000, 1_000_000), probes=10_000):
+    """Lookup latency of University.get_student/get_course as the registry grows"""
+    print("entities    get_student(ns)  get_course(ns)  get_professor(ns)")
+    for size in sizes:
+        university = University()
+        for i in range(size):
+            university.add_user(Student(f"S{i}", "Student", "s@uni.edu", "CS"))
+            university.add_course(Course(f"C{i}", "Course", "CS", 3))
+        for i in range(size // 10 or 1):
+            university.add_user(Professor(f"P{i}", "Professor", "p@uni.edu", "CS"))
+
+        step = max(1, size // probes)
+        student_ids = [f"S{i}" for i in range(0, size, step)]
+        course_ids = [f"C{i}" for i in range(0, size, step)]
+        professor_ids = [f"P{i}" for i in range(0, size // 10 or 1, step)]
+        print(f"{size:>9,}  {_time_lookups(university.get_student, student_ids):>15.0f}"
+              f"  {_time_lookups(university.get_course, course_ids):>14.0f}"
+              f"  {_time_lookups(university.get_professor, professor_ids):>17.0f}")
+
+def bench_snapshot_load(sizes=(10_000, 100_000)):
+    """Time until the library is usable: legacy full pickle vs sectioned lazy snapshot"""
+    from data_manager import SnapshotReader, write_snapshot
+    print("students   legacy load(s)  sectioned open(s)  first library access(s)")
+    for size in sizes:
+        university = University()
+        university.library = Library("LIB-01")
+        university.schedules = []
+        university.exams = []
+        for i in range(size):
+            student = Student(f"S{i}", "Student", "s@uni.edu", "CS")
+            university.add_user(student)
+            course = Course(f"C{i}", "Course", "CS", 3)
+            university.add_course(course)
+            student.enroll_course(course)
+            university.library.add_book(f"B{i}", "Title", "Author")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_path = os.path.join(tmp, "legacy.pkl")
+            with open(legacy_path, "wb") as f:
+                pickle.dump({"users": university.users, "courses": university.courses,
+                             "library": university.library, "schedules": university.schedules}, f)
+            sectioned_path = os.path.join(tmp, "sectioned.pkl")
+            with open(sectioned_path, "wb") as f:
+                write_snapshot(f, university)
+
+            start = time.perf_counter()
+            with open(legacy_path, "rb") as f:
+                pickle.load(f)
+            legacy = time.perf_counter() - start
+
+            target = University()
+            start = time.perf_counter()
+            reader = SnapshotReader(sectioned_path)
+            reader.attach(target)
+            opened = time.perf_counter() - start
+            target.library.books
+            first_access = time.perf_counter() - start - opened
+            reader.close()
+        print(f"{size:>8,}  {legacy:>14.3f}  {opened:>17.5f}  {first_access:>23.3f}")
+
+def bench_schedule_assign(sizes=(1_000, 10_000, 50_000), probes=200):
+    """Cost of Schedule.assign_schedule with an existing term of N rows"""
+    university = University.get_instance()
+    course = Course("BENCH", "Bench", "CS", 3)
+    print("rows      assign(us)")
+    for size in sizes:
+        university.schedules = []
+        university.__dict__.pop('_schedule_index', None)
+        rooms = [Classroom(f"R{i}", "Bench Hall", 50) for i in range(100)]
+        professors = [Professor(f"BP{i}", "Prof", "p@uni.edu", "CS") for i in range(100)]
+        slots = [f"{h:02d}:00-{h:02d}:50" for h in range(8, 18)]
+        for i in range(size):
+            # 100 rooms x 10 slots per day, each room with its own professor
+            date = f"2030-{1 + i // 28000 % 12:02d}-{1 + i // 1000 % 28:02d}"
+            slot = slots[i // 100 % 10]
+            Schedule(f"B{i}", course, professors[i % 100], slot, rooms[i % 100], date).assign_schedule()
+        start = time.perf_counter()
+        for j in range(probes):
+            # Clashes with an existing row, so nothing is added and every probe sees N rows
+            Schedule(f"Q{j}", course, professors[j % 100], "08:30-09:10", rooms[j % 100], "2030-01-01").assign_schedule()
+        print(f"{size:>6,}  {(time.perf_counter() - start) / probes * 1e6:>10.1f}")
+
+def bench_bulk_schedule_import(sizes=(10_000, 100_000)):
+    """Rows/sec through schedules.import_schedules (the /schedules/bulk core)"""
+    from data_manager import journal
+    from schedules import import_schedules
+    university = University.get_instance()
+    university.add_course(Course("BULK", "Bulk", "CS", 3))
+    for i in range(200):
+        university.add_user(Professor(f"BULKP{i}", "Prof", "p@uni.edu", "CS"))
+        university.add_classroom(Classroom(f"BULKR{i}", "Bulk Hall", 50))
+    slots = [f"{h:02d}:00-{h:02d}:50" for h in range(8, 18)]
+    print("rows      seconds   rows/sec")
+    for size in sizes:
+        university.schedules = []
+        university.__dict__.pop('_schedule_index', None)
+        rows = [{"scheduleId": f"BULK{i}", "courseId": "BULK", "professorId": f"BULKP{i % 200}",
+                 "timeSlot": slots[i // 200 % 10], "classroomId": f"BULKR{i % 200}",
+                 "date": f"2031-{1 + i // 56000 % 12:02d}-{1 + i // 2000 % 28:02d}"}
+                for i in range(size)]
+        start = time.perf_counter()
+        import_schedules(university, rows)
+        elapsed = time.perf_counter() - start
+        journal.truncate()
+        print(f"{size:>7,}  {elapsed:>8.2f}  {size / elapsed:>9,.0f}")
+
+def bench_timetable(sizes=(1_000, 5_000), restarts=8):
+    """Solve time and quality of timetable.solve for N sections over a week of slots"""
+    import random
+    from timetable import solve
+    rng = random.Random(7)
+    dates = [f"2031-09-0{d}" for d in range(1, 6)]
+    slots = [f"{h:02d}:00-{h:02d}:50" for h in range(8, 18)]
+    print("sections  rooms  seconds  placed  utilization")
+    for size in sizes:
+        rooms = [(f"R{i}", rng.choice([30, 40, 60, 100, 150, 250])) for i in range(size // 25)]
+        sections = [(f"S{i}", f"P{i % (size // 8)}", rng.randint(10, 120)) for i in range(size)]
+        metrics = solve(sections, rooms, dates, slots, restarts=restarts)["metrics"]
+        print(f"{size:>8,}  {len(rooms):>5}  {metrics['solve_seconds']:>7.2f}  {metrics['placement_rate']:>6.1%}"
+              f"  {metrics['avg_seat_utilization']:>11.1%}")
+
+def bench_protocol_throughput(clients=(1, 10, 100), commands=2_000, depth=32, server=None):
+    """Commands/sec through server.py with N concurrent clients, each pipelining `depth` commands"""
+    import threading
+    from client import UniversityClient
+    from server import UniversityServer
+    if server is None:
+        server = UniversityServer(port=0)
+        threading.Thread(target=server.run, daemon=True).start()
+    UniversityClient(port=server.port).add_student("BENCH", "Bench", "b@uni.edu", "CS")
+    print("clients  commands   seconds  commands/sec")
+    for count in clients:
+        per_client = max(depth, commands // count)
+        connections = [UniversityClient(port=server.port) for _ in range(count)]
+
+        def work(client):
+            for _ in range(per_client // depth):
+                client.pipeline([('GET_STUDENT', "BENCH")] * depth)
+
+        threads = [threading.Thread(target=work, args=(client,)) for client in connections]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        total = count * (per_client // depth) * depth
+        for client in connections:
+            client.close()
+        print(f"{count:>7}  {total:>8,}  {elapsed:>8.2f}  {total / elapsed:>12,.0f}")
+
+def bench_async_server(idle=(1_000, 5_000), clients=(1, 10, 100)):
+    """AsyncUniversityServer: OS threads with N idle connections open, then throughput alongside them"""
+    import socket
+    import threading
+    from server import AsyncUniversityServer
+    server = AsyncUniversityServer(port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(0.2)
+    open_sockets = []
+    print("idle connections  threads")
+    for count in idle:
+        while len(open_sockets) < count:
+            open_sockets.append(socket.create_connection((server.host, server.port)))
+        time.sleep(0.2)
+        print(f"{count:>16,}  {threading.active_count():>7}")
+    bench_protocol_throughput(clients, server=server)
+    for sock in open_sockets:
+        sock.close()
+
+def bench_wire_format(class_sizes=(0, 30, 200), courses=6, repeat=2_000):
+    """GET_STUDENT reply: pickled Student (old protocol) vs projected fields in the compact encoding.
+
+    Enrollments hold Course objects, as in the saved university_data.pkl, so pickle follows
+    each course to its enrolled classmates.
+    """
+    from protocol import decode_message, encode_message
+    from server import project
+    print("classmates  pickle(B)  compact(B)  pickle(us)  compact(us)")
+    for size in class_sizes:
+        student = Student("S0", "Student", "s@uni.edu", "CS")
+        student.borrowed_books = [f"B{i}" for i in range(5)]
+        for c in range(courses):
+            course = Course(f"C{c}", "Course", "CS", 3)
+            course.enrolled_students = [student] + [Student(f"S{c}-{i}", "Student", "s@uni.edu", "CS")
+                                                     for i in range(size)]
+            student.courses_enrolled.append(course)
+            student.grades[course.course_id] = 3.5
+        pickled = pickle.dumps(student)
+        compact = encode_message(project(student))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            pickle.loads(pickle.dumps(student))
+        pickle_us = (time.perf_counter() - start) / repeat * 1e6
+        start = time.perf_counter()
+        for _ in range(repeat):
+            decode_message(encode_message(project(student)))
+        compact_us = (time.perf_counter() - start) / repeat * 1e6
+        print(f"{size:>10}  {len(pickled):>9,}  {len(compact):>10,}  {pickle_us:>10.1f}  {compact_us:>11.1f}")
+
+def bench_batch_enroll(courses=(1, 5, 8), students=200):
+    """Kiosk enrollment: one ENROLL round trip per course vs one BATCH frame per student"""
+    import threading
+    from client import UniversityClient
+    from server import UniversityServer
+    server = UniversityServer(port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    client = UniversityClient(port=server.port)
+    for c in range(max(courses)):
+        University.get_instance().add_course(Course(f"BATCH-C{c}", "Batch", "CS", 3))
+    print("courses  per-op ENROLL(us)  per-op BATCH(us)")
+    for count in courses:
+        course_ids = [f"BATCH-C{c}" for c in range(count)]
+        client.batch([('ADD_STUDENT', f"BATCH-{count}-{i}-{mode}", "S", "s@uni.edu", "CS")
+                      for i in range(students) for mode in "ab"])
+        start = time.perf_counter()
+        for i in range(students):
+            for course_id in course_ids:
+                client.enroll_course(f"BATCH-{count}-{i}-a", course_id)
+        single = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(students):
+            client.batch([('ENROLL', f"BATCH-{count}-{i}-b", course_id) for course_id in course_ids])
+        batched = time.perf_counter() - start
+        ops = students * count
+        print(f"{count:>7}  {single / ops * 1e6:>17.1f}  {batched / ops * 1e6:>16.1f}")
+    client.close()
+
+def bench_client_pool(threads=200, lookups=20, concurrent=5_000):
+    """Lookups/sec from many threads through UniversityClientPool, and from AsyncUniversityClient"""
+    import asyncio
+    import threading
+    from client import AsyncUniversityClient, UniversityClientPool
+    from server import AsyncUniversityServer
+    server = AsyncUniversityServer(port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    time.sleep(0.2)
+    print("client               sockets  lookups   lookups/sec")
+    for size in (1, 8, 32):
+        pool = UniversityClientPool(port=server.port, size=size)
+        pool.add_student("POOL", "Pool", "p@uni.edu", "CS")
+
+        def work():
+            for _ in range(lookups):
+                pool.get_student("POOL")
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        print(f"pool ({threads} threads)  {pool._idle.qsize():>7}  {threads * lookups:>7,}  {threads * lookups / elapsed:>12,.0f}")
+        pool.close()
+
+    async def run_async(connections):
+        async with AsyncUniversityClient(port=server.port, connections=connections) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*[client.get_student("POOL") for _ in range(concurrent)])
+            return time.perf_counter() - start
+
+    for connections in (1, 4):
+        elapsed = asyncio.run(run_async(connections))
+        print(f"async                {connections:>7}  {concurrent:>7,}  {concurrent / elapsed:>12,.0f}")
+
+def bench_server_memory(sizes=(10_000, 100_000)):
+    """Memory per student: old server.py copy beside the University store vs the shared store"""
+    import gc
+    import tracemalloc
+
+    def added(size, prefix, duplicate):
+        university = University()
+        old_students = {}
+        gc.collect()
+        tracemalloc.start()
+        for i in range(size):
+            student_id = f"{prefix}{i}"
+            university.add_user(Student(student_id, "Student", "s@uni.edu", "CS"))
+            if duplicate:
+                # What the socket server kept before: its own Student in a module-level dict
+                old_students[student_id] = Student(student_id, "Student", "s@uni.edu", "CS")
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return current / size
+
+    print("students  separate stores(B/student)  shared store(B/student)")
+    for size in sizes:
+        print(f"{size:>8,}  {added(size, 'OLD', True):>26,.0f}  {added(size, 'NEW', False):>23,.0f}")
+
+def bench_model_memory(sizes=(10_000, 100_000, 1_000_000), courses_per_student=5):
+    """Bytes per student (registered, enrolled, graded) and per course, measured with tracemalloc"""
+    import gc
+    import tracemalloc
+    print("students  courses  B/student  B/course")
+    for size in sizes:
+        gc.collect()
+        tracemalloc.start()
+        university = University()
+        course_count = max(1, size // 50)
+        base, _ = tracemalloc.get_traced_memory()
+        courses = [Course(f"C{i}", "Course", "CS", 3) for i in range(course_count)]
+        for course in courses:
+            university.add_course(course)
+        after_courses, _ = tracemalloc.get_traced_memory()
+        for i in range(size):
+            student = Student(f"S{i}", "Student", "s@uni.edu", "CS")
+            university.add_user(student)
+            for k in range(courses_per_student):
+                course = courses[(i + k * 7) % course_count]
+                student.courses_enrolled.append(course.course_id)
+                student.grades[course.course_id] = None
+                course.enrolled_students.append(student)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:>8,}  {course_count:>7,}  {(current - after_courses) / size:>9,.0f}"
+              f"  {(after_courses - base) / course_count:>8,.0f}")
+        del university, courses, student, course
+
+def bench_gradebook(sizes=(30_000, 300_000), class_size=150, repeat=20):
+    """Professor dashboard grade stats: per-request loop over enrolled students vs gradebook totals"""
+    from gradebook import Gradebook
+    print("enrollments  build(s)  loop dashboard(ms)  gradebook dashboard(ms)")
+    for size in sizes:
+        courses = [Course(f"GC{i}", "Course", "CS", 3) for i in range(size // class_size)]
+        for i in range(size):
+            student = Student(f"GS{i}", "Student", "s@uni.edu", "CS")
+            course = courses[i % len(courses)]
+            course.enrolled_students.append(student)
+            student.courses_enrolled.append(course.course_id)
+            student.grades[course.course_id] = "ABCDF"[i % 5]
+
+        def loop_dashboard():
+            # The per-request averaging view_dashboard did before the gradebook
+            for course in courses:
+                grades = []
+                for student in course.enrolled_students:
+                    if course.course_id in student.grades:
+                        grade = student.grades[course.course_id]
+                        if grade == 'A': grades.append(95)
+                        elif grade == 'B': grades.append(85)
+                        elif grade == 'C': grades.append(75)
+                        elif grade == 'D': grades.append(65)
+                        elif grade == 'F': grades.append(55)
+                sum(grades) / len(grades) if grades else None
+
+        start = time.perf_counter()
+        gradebook = Gradebook.from_courses(courses)
+        build = time.perf_counter() - start
+        timings = []
+        for dashboard in (loop_dashboard, lambda: [gradebook.course_stats(c.course_id) for c in courses]):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                dashboard()
+            timings.append((time.perf_counter() - start) / repeat * 1e3)
+        print(f"{size:>11,}  {build:>8.2f}  {timings[0]:>18.2f}  {timings[1]:>23.2f}")
+
+def bench_enrollment_ops(course_sizes=(100, 1_500, 10_000), probes=500):
+    """Enroll/grade/drop cost per operation against one course that already holds N students"""
+    import contextlib
+    import io
+    university = University.get_instance()
+    print("course size  enroll(us)  grade(us)  drop(us)  membership check(us)")
+    for size in course_sizes:
+        course = Course(f"ENR{size}", "Enrollment", "CS", 3)
+        university.add_course(course)
+        for i in range(size):
+            Student(f"ENR{size}-{i}", "Student", "s@uni.edu", "CS").enroll_course(course)
+        probe_students = [Student(f"ENR{size}-P{j}", "Student", "s@uni.edu", "CS") for j in range(probes)]
+        timings = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for operation in (lambda s: s.enroll_course(course),
+                              lambda s: s.update_grade(course.course_id, "A"),
+                              lambda s: s.drop_course(course.course_id),
+                              lambda s: s in course.enrolled_students):
+                start = time.perf_counter()
+                for student in probe_students:
+                    operation(student)
+                timings.append((time.perf_counter() - start) / probes * 1e6)
+        print(f"{size:>11,}  {timings[0]:>10.1f}  {timings[1]:>9.1f}  {timings[2]:>8.1f}  {timings[3]:>20.2f}")
+
+def bench_exam_lookup(sizes=(1_000, 10_000, 100_000), exams_per_course=4, probes=2_000):
+    """Finding an exam by ID: the old scan over course.exams against the exam registry"""
+    from models import Exam
+    print("exams      scan(us)  registry(us)")
+    for size in sizes:
+        university = University()
+        for i in range(size // exams_per_course):
+            course = Course(f"C{i}", "Course", "CS", 3)
+            university.add_course(course)
+            course.exams = [Exam(f"E{i}-{j}", course, "2025-01-10", 90) for j in range(exams_per_course)]
+        university.exams = []
+        university.get_exam_registry()  # Adopts every course.exams entry
+
+        def scan(exam_id):
+            for course in university.courses:
+                for exam in course.exams:
+                    if exam.exam_id == exam_id:
+                        return exam
+
+        step = max(1, size // exams_per_course // probes)
+        ids = [f"E{i}-{exams_per_course - 1}" for i in range(0, size // exams_per_course, step)]
+        scan_ids = ids[::max(1, len(ids) // 50)]  # The scan is slow enough that a sample will do
+        print(f"{size:>9,}  {_time_lookups(scan, scan_ids, repeat=1) / 1e3:>8.1f}"
+              f"  {_time_lookups(university.get_exam, ids) / 1e3:>12.3f}")
+
+def bench_exam_results(rows=1_000_000, students=100_000):
+    """Rows/sec through the /exam/bulk-results parser and importer for a CSV of N result rows"""
+    import io
+    from bulk_rows import read_rows
+    from data_manager import journal
+    from exam import import_exam_results
+    from models import Exam
+    university = University.get_instance()
+    for i in range(students):
+        university.add_user(Student(f"RES{i}", "Student", "s@uni.edu", "CS"))
+    course = Course("RES", "Results", "CS", 3)
+    university.add_course(course)
+    exams = rows // students
+    course.exams = [Exam(f"RES-E{j}", course, "2031-06-01", 90) for j in range(exams)]
+    for exam in course.exams:
+        university.add_exam(exam)
+    lines = ["examId,studentId,grade\n"]
+    lines.extend(f"RES-E{i // students},RES{i % students},{50 + i % 50}\n" for i in range(exams * students))
+    body = "".join(lines).encode()
+    del lines
+    start = time.perf_counter()
+    summary = import_exam_results(university, read_rows(io.BytesIO(body), 'text/csv'))
+    elapsed = time.perf_counter() - start
+    journal.truncate()
+    print("rows       recorded   seconds   rows/sec")
+    print(f"{summary['rows']:>9,}  {summary['recorded']:>9,}  {elapsed:>8.2f}  {summary['rows'] / elapsed:>9,.0f}")
+
+def bench_exam_stats(sizes=(1_000, 10_000, 100_000), polls=200):
+    """Cost of one exam-info poll: rescanning student_results against the running ExamStats"""
+    from models import Exam
+    course = Course("STATS", "Stats", "CS", 3)
+
+    def scan(exam):
+        # What /exam/exam/<id> did per request before the running aggregates
+        numeric = [float(g) if isinstance(g, str) else g for g in exam.student_results.values()
+                   if isinstance(g, (int, float)) or (isinstance(g, str) and g.replace('.', '', 1).isdigit())]
+        return sum(numeric) / len(numeric) if numeric else None
+
+    print("results   record(us)  scan poll(us)  stats poll(us)")
+    for size in sizes:
+        exam = Exam(f"STATS{size}", course, "2031-06-01", 90)
+        exam.get_stats()
+        students = [Student(f"STATS{size}-{i}", "Student", "s@uni.edu", "CS") for i in range(size)]
+        start = time.perf_counter()
+        for i, student in enumerate(students):
+            exam.add_result(student, str(40 + i % 61))
+        record = (time.perf_counter() - start) / size * 1e6
+        timings = []
+        for poll in (lambda: scan(exam), lambda: exam.get_stats().summary()):
+            start = time.perf_counter()
+            for _ in range(polls):
+                poll()
+            timings.append((time.perf_counter() - start) / polls * 1e6)
+        print(f"{size:>7,}  {record:>10.2f}  {timings[0]:>13.1f}  {timings[1]:>14.1f}")
+
+def bench_exam_planner(sizes=(1_000, 3_000), class_size=100, exams_per_student=5, department_exams=40):
+    """exam_planner.plan_exams over a three-week exam period: time, placement rate, room splits"""
+    import random
+    from exam_planner import plan_exams
+    rng = random.Random(1)
+    rooms = [(f"ER{i}", rng.choice((30, 40, 60, 120, 250))) for i in range(150)]
+    dates = [f"2031-12-{day:02d}" for day in range(1, 22)]
+    print("exams   seconds  placed   rate    rooms used  split exams")
+    for size in sizes:
+        # Students sit exams from their own department, so clashes cluster as they do in practice
+        rosters = [[] for _ in range(size)]
+        for s in range(size * class_size // exams_per_student):
+            first = rng.randrange(0, size, department_exams)
+            for e in rng.sample(range(first, min(first + department_exams, size)), exams_per_student):
+                rosters[e].append(f"ES{s}")
+        exams = [(f"EX{i}", rng.choice((60, 90, 120, 180)), roster) for i, roster in enumerate(rosters)]
+        metrics = plan_exams(exams, rooms, dates, ["09:00", "13:00", "17:00"])["metrics"]
+        print(f"{size:>5,}  {metrics['solve_seconds']:>8.2f}  {metrics['placed']:>6,}  {metrics['placement_rate']:>6.1%}"
+              f"  {metrics['rooms_used']:>10,}  {metrics['split_exams']:>11,}")
+
+def bench_library_search(size=500_000, queries=200):
+    """Catalog build, ranked search and available-books paging against the old full scan"""
+    import random
+    rng = random.Random(3)
+    words = [f"{a}{b}{c}" for a in ("al", "bo", "ca", "de", "fi", "go", "ha", "ki")
+             for b in ("ra", "ne", "to", "li", "mu", "so") for c in ("n", "s", "th", "x", "ly", "ment")]
+    surnames = [f"{w.capitalize()}son" for w in words[:200]]
+    library = Library("BENCH")
+    for i in range(size):
+        library.add_book(f"B{i:07d}", " ".join(rng.sample(words, 4)).title(), f"{rng.choice(words).title()} {rng.choice(surnames)}")
+    for i in range(0, size, 3):
+        library.books[f"B{i:07d}"]["available"] = False
+
+    start = time.perf_counter()
+    catalog = library.get_catalog()
+    availability = library.get_availability()
+    print(f"{size:,} books: indexes built in {time.perf_counter() - start:.2f}s")
+
+    books = library.books
+    key = lambda book_id: (books[book_id]['title'].lower(), str(book_id))
+    samples = {
+        "one word": [rng.choice(words) for _ in range(queries)],
+        "two words": [" ".join(rng.sample(words, 2)) for _ in range(queries)],
+        "prefix": [rng.choice(words)[:3] for _ in range(queries)],
+        "title+author": [f"{rng.choice(words)} {rng.choice(surnames)[:4]}" for _ in range(queries)],
+    }
+    print("query          avg matches  search+rank page(ms)")
+    for name, batch in samples.items():
+        matches = 0
+        start = time.perf_counter()
+        for query in batch:
+            matches += catalog.search(query, limit=20, key=key)[0]
+        print(f"{name:<13}  {matches / len(batch):>11,.0f}  {(time.perf_counter() - start) / len(batch) * 1e3:>20.2f}")
+
+    start = time.perf_counter()
+    [{"id": book_id, **book} for book_id, book in books.items() if book["available"]]
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    cursor = None
+    for _ in range(100):
+        _, cursor = availability.page(cursor, 50)
+    paged = (time.perf_counter() - start) / 100
+    print(f"available books: full scan {scan * 1e3:.1f}ms, one page of 50 {paged * 1e3:.3f}ms")
+
+def bench_library_loans(books=20_000, students=5_000, operations=200_000):
+    """Borrow/return/hold churn on a multi-copy catalog, and overdue checks against a full scan"""
+    import random
+    rng = random.Random(5)
+    library = Library("BENCH")
+    for i in range(books):
+        library.add_book(f"B{i:06d}", f"Title {i}", f"Author {i % 977}", copies=rng.randint(1, 4))
+    for i in range(students):
+        library.register_student(Student(f"S{i:05d}", f"Student {i}", f"s{i}@uni.edu", "CS"))
+    student_ids = list(library.students_registered)
+    book_ids = list(library.books)
+    hot = book_ids[:books // 50]   # A few popular titles draw most of the traffic, so holds queue up
+    library.get_due_dates()
+
+    now = 0.0
+    borrows = returns = holds = 0
+    active = []
+    start = time.perf_counter()
+    for _ in range(operations):
+        now += 5
+        if active and rng.random() < 0.45:
+            i = rng.randrange(len(active))
+            active[i], active[-1] = active[-1], active[i]
+            student_id, book_id = active.pop()
+            if (student_id, book_id) in library.loans:
+                library.return_book(student_id, book_id, now)
+                returns += 1
+            continue
+        student_id = rng.choice(student_ids)
+        book_id = rng.choice(hot) if rng.random() < 0.5 else rng.choice(book_ids)
+        if (student_id, book_id) in library.loans:
+            continue
+        if library.books[book_id]["on_shelf"]:
+            library.borrow_book(student_id, book_id, now)
+            borrows += 1
+        elif student_id not in library.holds.get(book_id, ()):
+            library.place_hold(student_id, book_id)
+            holds += 1
+        active.append((student_id, book_id))   # Returned later, whether lent now or handed over from a hold
+    elapsed = time.perf_counter() - start
+    print(f"{operations:,} operations ({borrows:,} borrows, {returns:,} returns, {holds:,} holds) "
+          f"in {elapsed:.2f}s: {operations / elapsed:,.0f} ops/s")
+    print(f"active loans {len(library.loans):,}, titles with holds {len(library.holds):,}")
+
+    checks = 100
+    start = time.perf_counter()
+    first = Library.LOAN_PERIOD + 12 * 3600   # The oldest loans start coming due
+    for i in range(checks):
+        overdue = library.overdue(first + i * 600)
+    indexed = (time.perf_counter() - start) / checks
+    start = time.perf_counter()
+    for i in range(checks):
+        late = first + i * 600
+        scanned = sorted((loan.due, loan.student_id, loan.book_id) for loan in library.loans.values() if loan.due <= late)
+    scan = (time.perf_counter() - start) / checks
+    assert len(scanned) == len(overdue)
+    print(f"overdue check ({len(overdue):,} late): heap {indexed * 1e3:.3f}ms, full scan {scan * 1e3:.3f}ms")
+
+    loan_index = library.get_loan_index()
+    sample = student_ids[:1000]
+    start = time.perf_counter()
+    for student_id in sample:
+        loan_index.student_loans(student_id, 0, 20)
+    indexed = (time.perf_counter() - start) / len(sample)
+    start = time.perf_counter()
+    for student_id in sample[:20]:
+        [loan for (sid, _), loan in library.loans.items() if sid == student_id]
+    scan = (time.perf_counter() - start) / 20
+    print(f"student's active loans: index {indexed * 1e6:.1f}us, scan of all loans {scan * 1e6:,.0f}us")
+
+def bench_catalog_import(rows=1_000_000, per_book=50_000):
+    """Streaming /library/import of a CSV catalog, against one add_book per row on a live index"""
+    import io
+    import random
+    from bulk_rows import read_rows
+    from library import _peak_rss_mb, import_books
+    rng = random.Random(7)
+    words = [f"{a}{b}{c}" for a in ("al", "bo", "ca", "de", "fi", "go", "ha", "ki")
+             for b in ("ra", "ne", "to", "li", "mu", "so") for c in ("n", "s", "th", "x", "ly", "ment")]
+    lines = ["bookId,title,author,copies\n"]
+    lines.extend(f"B{i % (rows - rows // 20):07d},{' '.join(rng.sample(words, 3)).title()},{rng.choice(words).title()} Smith,{1 + i % 3}\n"
+                 for i in range(rows))   # The last 5% repeat earlier IDs
+    body = "".join(lines).encode()
+    del lines
+    print(f"CSV body: {len(body) / 2**20:.0f} MiB, peak RSS before import {_peak_rss_mb()} MiB")
+
+    library = Library("BENCH")
+    start = time.perf_counter()
+    summary = import_books(library, read_rows(io.BytesIO(body), 'text/csv'))
+    elapsed = time.perf_counter() - start
+    print("rows        added  duplicates  seconds  rows/sec  index build(s)  peak RSS(MiB)")
+    print(f"{summary['rows']:>9,}  {summary['added']:>9,}  {summary['duplicates']:>10,}  {elapsed:>7.2f}  "
+          f"{summary['rows'] / elapsed:>8,.0f}  {summary['index_seconds']:>14.2f}  {_peak_rss_mb():>13}")
+
+    library = Library("BENCH")
+    library.get_catalog()
+    library.get_availability()
+    rows_in = read_rows(io.BytesIO(body), 'text/csv')
+    start = time.perf_counter()
+    for _, row in zip(range(per_book), rows_in):
+        library.add_book(row["bookId"], row["title"], row["author"], int(row["copies"]))
+    elapsed = time.perf_counter() - start
+    print(f"add_book per row, indexes live: {per_book / elapsed:,.0f} rows/sec over the first {per_book:,}")
+
+def bench_loan_history(loans=1_000_000, titles=50_000, students=20_000, years=3):
+    """Append rate and bytes per event of the loan log, and /library/stats queries against a log scan"""
+    import random
+    from circulation import BORROW, LoanLog, week_of
+    rng = random.Random(11)
+    history = LoanLog()
+    start_time = 1_600_000_000
+    step = years * 365 * 86400 / loans
+    start = time.perf_counter()
+    for i in range(loans):
+        at = start_time + i * step
+        student_id = f"S{rng.randrange(students)}"
+        book_id = f"B{int(rng.paretovariate(1.2)) % titles}"   # A few titles circulate far more than the rest
+        history.record_loan(student_id, book_id, at)
+        history.record_return(student_id, book_id, at + rng.randrange(86400, 30 * 86400), at)
+    elapsed = time.perf_counter() - start
+    stored = sum(column.itemsize * len(column) for column in (history.kinds, history.times, history.students, history.books))
+    print(f"{len(history):,} events over {years} years in {elapsed:.2f}s ({len(history) / elapsed:,.0f}/s), "
+          f"{stored / len(history):.0f} bytes per event in the log arrays")
+
+    def timed(label, query, scan=None):
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            query()
+        indexed = (time.perf_counter() - start) / runs
+        line = f"{label:<22} aggregates {indexed * 1e3:>8.3f}ms"
+        if scan:
+            start = time.perf_counter()
+            scan()
+            line += f"   log scan {(time.perf_counter() - start) * 1e3:>9.1f}ms"
+        print(line)
+
+    b = history._book_index["B1"]
+    def scan_title():
+        weeks = {}
+        for kind, at, book in zip(history.kinds, history.times, history.books):
+            if kind == BORROW and book == b:
+                weeks[week_of(at)] = weeks.get(week_of(at), 0) + 1
+        return weeks
+    def scan_borrowers():
+        counts = {}
+        for kind, student in zip(history.kinds, history.students):
+            if kind == BORROW:
+                counts[student] = counts.get(student, 0) + 1
+        return sorted(counts.items(), key=lambda item: -item[1])[:10]
+    timed("loans per week (B1)", lambda: history.title_weeks("B1"), scan_title)
+    timed("top 10 borrowers", lambda: history.top_borrowers(10), scan_borrowers)
+    timed("loan durations", history.loan_durations)
+    timed("summary", history.summary)
+
+BENCHMARKS = {
+    'registry': bench_registry_lookup,
+    'snapshot': bench_snapshot_load,
+    'schedules': bench_schedule_assign,
+    'bulk_schedules': bench_bulk_schedule_import,
+    'timetable': bench_timetable,
+    'protocol': bench_protocol_throughput,
+    'async_server': bench_async_server,
+    'wire': bench_wire_format,
+    'batch': bench_batch_enroll,
+    'client_pool': bench_client_pool,
+    'server_memory': bench_server_memory,
+    'model_memory': bench_model_memory,
+    'gradebook': bench_gradebook,
+    'enrollment': bench_enrollment_ops,
+    'exams': bench_exam_lookup,
+    'exam_results': bench_exam_results,
+    'exam_stats': bench_exam_stats,
+    'exam_planner': bench_exam_planner,
+    'library_search': bench_library_search,
+    'library_loans': bench_library_loans,
+    'catalog_import': bench_catalog_import,
+    'loan_history': bench_loan_history,
+}
+
+if __name__ == "__main__":
+    from data_manager import journal
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    with tempfile.TemporaryDirectory() as tmp:
+        journal.path = os.path.join(tmp, "journal.log")  # Benchmarks never append to the real journal
+        for name in selected:
+            print(f"\n== {name} ==")
+            BENCHMARKS[name]()
+        journal.truncate()
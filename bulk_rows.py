@@ -0,0 +1,21 @@
+import codecs
+import csv
+import json
+
+MAX_REPORTED_REJECTS = 1_000     # Rejected rows listed in a bulk summary; the count covers all of them
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def read_rows(stream, mimetype):
+    """Yield rows from a CSV or NDJSON byte stream, one line at a time; malformed NDJSON lines yield None"""
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if mimetype == 'text/csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
@@ -0,0 +1,218 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+_TOKEN = re.compile(r"\w+")
+TITLE_WEIGHT = 2
+AUTHOR_WEIGHT = 1
+MIN_PREFIX = 2   # Shorter query tokens only match whole words
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+class CatalogIndex:
+    """Inverted index over book titles and authors.
+
+    Every query token must match (whole word, or word prefix for tokens of MIN_PREFIX+ characters);
+    books rank by summed field weight, with whole-word matches counting double.
+    """
+    def __init__(self, books=None):
+        self._postings = {}     # token -> {book_id: weight}
+        self._vocabulary = []   # sorted tokens, for prefix ranges
+        self._tokens = {}       # book_id -> tokens it was indexed under, for removal
+        self._lock = threading.Lock()
+        if books:
+            self.add_many((book_id, book["title"], book["author"]) for book_id, book in books.items())
+
+    def __len__(self):
+        return len(self._tokens)
+
+    @staticmethod
+    def _weights(title, author):
+        weights = {}
+        for token in tokenize(author):
+            weights[token] = AUTHOR_WEIGHT
+        for token in tokenize(title):
+            weights[token] = weights.get(token, 0) | TITLE_WEIGHT  # 3 when in both
+        return weights
+
+    def add(self, book_id, title, author):
+        weights = self._weights(title, author)
+        with self._lock:
+            self._remove(book_id)
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                postings[book_id] = weight
+            self._tokens[book_id] = tuple(weights)
+
+    def add_many(self, books):
+        """Index (book_id, title, author) rows, sorting the vocabulary once at the end"""
+        with self._lock:
+            for book_id, title, author in books:
+                self._remove(book_id)
+                weights = self._weights(title, author)
+                for token, weight in weights.items():
+                    self._postings.setdefault(token, {})[book_id] = weight
+                self._tokens[book_id] = tuple(weights)
+            self._vocabulary = sorted(self._postings)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id):
+        for token in self._tokens.pop(book_id, ()):
+            postings = self._postings[token]
+            del postings[book_id]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+
+    def _matches(self, token):
+        """{book_id: score} for one query token"""
+        exact = self._postings.get(token, {})
+        scores = {book_id: 2 * weight for book_id, weight in exact.items()}
+        if len(token) >= MIN_PREFIX:
+            start = bisect_right(self._vocabulary, token)   # The exact token, if any, sits just before
+            end = bisect_left(self._vocabulary, token + "\uffff")
+            for word in self._vocabulary[start:end]:
+                for book_id, weight in self._postings[word].items():
+                    if scores.get(book_id, 0) < weight:
+                        scores[book_id] = weight
+        return scores
+
+    def search(self, query, offset=0, limit=20, key=None):
+        """(total matches, [(book_id, score)] for one page), best first; key(book_id) breaks ties"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return 0, []
+        # Rarest token first, so the running intersection stays small
+        with self._lock:
+            per_token = sorted((self._matches(token) for token in tokens), key=len)
+        scores = dict(per_token[0])
+        for matches in per_token[1:]:
+            scores = {book_id: score + matches[book_id] for book_id, score in scores.items() if book_id in matches}
+            if not scores:
+                return 0, []
+        key = key or str
+        page = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], key(item[0])))
+        return len(scores), page[offset:]
+
+class AvailabilityIndex:
+    """Sorted IDs of books on the shelf; pages resume after a cursor instead of rescanning the catalog"""
+    def __init__(self, book_ids=()):
+        self._ids = sorted(book_ids, key=str)
+        self._keys = [str(book_id) for book_id in self._ids]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, book_id):
+        with self._lock:
+            i = bisect_left(self._keys, str(book_id))
+            return i < len(self._keys) and self._ids[i] == book_id
+
+    def add(self, book_id):
+        key = str(book_id)
+        with self._lock:
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._ids[i] == book_id:
+                return False
+            self._keys.insert(i, key)
+            self._ids.insert(i, book_id)
+            return True
+
+    def discard(self, book_id):
+        with self._lock:
+            i = bisect_left(self._keys, str(book_id))
+            if i < len(self._keys) and self._ids[i] == book_id:
+                del self._keys[i]
+                del self._ids[i]
+                return True
+            return False
+
+    def page(self, after=None, limit=50):
+        """Up to limit book IDs after the cursor, and the cursor for the next page (None at the end)"""
+        with self._lock:
+            start = bisect_right(self._keys, str(after)) if after is not None else 0
+            ids = self._ids[start:start + limit]
+            more = start + limit < len(self._ids)
+        return ids, (str(ids[-1]) if ids and more else None)
+
+class DueDates:
+    """Min-heap of (due, student_id, book_id) over active loans.
+
+    Returned loans stay in the heap until they reach the top and are dropped then, so
+    borrowing and returning are O(log n) and an overdue check only pops what has expired.
+    """
+    def __init__(self, loans=()):
+        self._heap = [(loan.due, loan.student_id, loan.book_id) for loan in loans if loan.due is not None]
+        heapq.heapify(self._heap)
+        self._overdue = {}   # (student_id, book_id) -> due, in due order, for loans already past due
+        self._lock = threading.Lock()
+
+    def add(self, loan):
+        if loan.due is not None:
+            with self._lock:
+                heapq.heappush(self._heap, (loan.due, loan.student_id, loan.book_id))
+
+    def discard(self, loan):
+        with self._lock:
+            self._overdue.pop((loan.student_id, loan.book_id), None)
+
+    def overdue(self, now, loans):
+        """[(student_id, book_id, due)] past due at now, oldest first; loans maps (student_id, book_id) -> Loan"""
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                due, student_id, book_id = heapq.heappop(heap)
+                loan = loans.get((student_id, book_id))
+                if loan is not None and loan.due == due:   # Otherwise returned (or re-borrowed) since
+                    self._overdue[(student_id, book_id)] = due
+            return [(student_id, book_id, due) for (student_id, book_id), due in self._overdue.items() if due <= now]
+
+class LoanIndex:
+    """Active loans by student and by book, updated alongside Library.loans so neither lookup scans it"""
+    def __init__(self, loans=()):
+        self._by_student = {}   # student_id -> {book_id: Loan}, in borrow order
+        self._by_book = {}      # book_id -> {student_id: Loan}
+        self._lock = threading.Lock()
+        for loan in loans:
+            self._add(loan)
+
+    def _add(self, loan):
+        self._by_student.setdefault(loan.student_id, {})[loan.book_id] = loan
+        self._by_book.setdefault(loan.book_id, {})[loan.student_id] = loan
+
+    def add(self, loan):
+        with self._lock:
+            self._add(loan)
+
+    def discard(self, loan):
+        with self._lock:
+            for index, key, other in ((self._by_student, loan.student_id, loan.book_id),
+                                      (self._by_book, loan.book_id, loan.student_id)):
+                loans = index.get(key)
+                if loans is not None:
+                    loans.pop(other, None)
+                    if not loans:
+                        del index[key]
+
+    def count(self, student_id):
+        return len(self._by_student.get(student_id, ()))
+
+    def student_loans(self, student_id, offset=0, limit=None):
+        """(total, [Loan] for one page) of a student's active loans, oldest first"""
+        with self._lock:
+            loans = list(self._by_student.get(student_id, {}).values())
+        return len(loans), loans[offset:None if limit is None else offset + limit]
+
+    def borrowers(self, book_id):
+        """[Loan] for every copy of the title that is out"""
+        with self._lock:
+            return list(self._by_book.get(book_id, {}).values())
@@ -0,0 +1,130 @@
+import calendar
+import heapq
+import threading
+import time
+from array import array
+from datetime import date
+
+WEEK = 7 * 24 * 60 * 60
+_MONDAY = 3 * 24 * 60 * 60   # The Unix epoch fell on a Thursday; weeks run Monday to Sunday, UTC
+BORROW, RETURN = 0, 1
+
+def week_of(timestamp):
+    return int((timestamp + _MONDAY) // WEEK)
+
+def week_of_date(day):
+    """Week number of an ISO date such as '2025-03-14'"""
+    return week_of(calendar.timegm(date.fromisoformat(day).timetuple()))
+
+def week_start(week):
+    return time.strftime('%Y-%m-%d', time.gmtime(week * WEEK - _MONDAY))
+
+class LoanLog:
+    """Append-only loan history: one (kind, time, student, book) row per borrow or return.
+
+    Rows live in typed arrays with student and book IDs interned to numbers. Weekly loans per
+    title, loans per student and weekly loan durations are updated on append, so the stats
+    endpoints never replay the log.
+    """
+    def __init__(self):
+        self._student_index = {}   # student_id -> student number
+        self._book_index = {}      # book_id -> book number
+        self._student_ids = []
+        self._book_ids = []
+        self.kinds = array('b')
+        self.times = array('d')
+        self.students = array('I')
+        self.books = array('I')
+        self._student_loans = array('I')   # Loans per student number
+        self._title_weeks = {}             # book number -> {week: loans}
+        self._return_weeks = {}            # week -> [returns, total loan seconds]
+        self.loans = 0
+        self.returns = 0
+        self._timed_returns = 0            # Returns whose loan start is known
+        self._loan_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _append(self, kind, timestamp, student_id, book_id):
+        s = self._student_index.get(student_id)
+        if s is None:
+            s = self._student_index[student_id] = len(self._student_ids)
+            self._student_ids.append(student_id)
+            self._student_loans.append(0)
+        b = self._book_index.get(book_id)
+        if b is None:
+            b = self._book_index[book_id] = len(self._book_ids)
+            self._book_ids.append(book_id)
+        self.kinds.append(kind)
+        self.times.append(timestamp)
+        self.students.append(s)
+        self.books.append(b)
+        return s, b
+
+    def record_loan(self, student_id, book_id, timestamp):
+        with self._lock:
+            s, b = self._append(BORROW, timestamp, student_id, book_id)
+            self.loans += 1
+            self._student_loans[s] += 1
+            weeks = self._title_weeks.setdefault(b, {})
+            week = week_of(timestamp)
+            weeks[week] = weeks.get(week, 0) + 1
+
+    def record_return(self, student_id, book_id, timestamp, borrowed_at=None):
+        with self._lock:
+            self._append(RETURN, timestamp, student_id, book_id)
+            self.returns += 1
+            if borrowed_at is not None:
+                seconds = timestamp - borrowed_at
+                self._timed_returns += 1
+                self._loan_seconds += seconds
+                bucket = self._return_weeks.setdefault(week_of(timestamp), [0, 0.0])
+                bucket[0] += 1
+                bucket[1] += seconds
+
+    def title_weeks(self, book_id, first=None, last=None):
+        """[(week start date, loans)] for weeks first..last (week numbers) with any loans of the title"""
+        b = self._book_index.get(book_id)
+        if b is None:
+            return []
+        with self._lock:
+            weeks = list(self._title_weeks.get(b, {}).items())
+        return [(week_start(week), loans) for week, loans in sorted(weeks)
+                if (first is None or week >= first) and (last is None or week <= last)]
+
+    def top_borrowers(self, limit=10):
+        """[(student_id, loans)], most loans first"""
+        with self._lock:
+            top = heapq.nlargest(limit, range(len(self._student_loans)), key=self._student_loans.__getitem__)
+            return [(self._student_ids[s], self._student_loans[s]) for s in top]
+
+    def loan_durations(self, first=None, last=None):
+        """[(week start date, returns, average loan seconds)] by week of return"""
+        with self._lock:
+            weeks = [(week, returns, seconds) for week, (returns, seconds) in self._return_weeks.items()
+                     if (first is None or week >= first) and (last is None or week <= last)]
+        return [(week_start(week), returns, seconds / returns) for week, returns, seconds in sorted(weeks)]
+
+    def summary(self):
+        with self._lock:
+            return {
+                'events': len(self.kinds),
+                'loans': self.loans,
+                'returns': self.returns,
+                'borrowers': len(self._student_ids),
+                'titles': len(self._book_ids),
+                'average_loan_seconds': self._loan_seconds / self._timed_returns if self._timed_returns else None,
+                'first_event': self.times[0] if self.times else None,
+                'last_event': self.times[-1] if self.times else None,
+            }
@@ -1,6 +1,8 @@
 import datetime
 from flask import Blueprint, request, jsonify
 from models import University, Classroom
+from data_manager import journal
+from locking import entity_locks
 
 classrooms_bp = Blueprint('classrooms', __name__)
 
@@ -30,6 +32,7 @@ def add_classroom():
 
         # Add to university
         university.add_classroom(new_classroom)
+        journal.record('add_classroom', classroom_id, location, capacity)
 
         return jsonify({"message": f"Classroom {classroom_id} added successfully"}), 200
 
@@ -43,7 +46,7 @@ def list_classrooms():
         classrooms = university.classrooms
         
         classroom_list = []
-        for classroom in classrooms:
+        for classroom in classrooms.values():
             classroom_list.append({
                 "classroom_id": classroom.classroom_id,
                 "location": classroom.location,
@@ -96,16 +99,11 @@ def allocate_classroom():
         if not classroom:
             return jsonify({"error": "Classroom not found"}), 404
         
-        # Check if classroom is already allocated for the given date and time
-        if classroom.is_allocated(date, time_slot):
-            return jsonify({"error": "Classroom already allocated for the given date and time"}), 400
-        
-        # Initialize schedule for date if not exists
-        if date not in classroom.schedule:
-            classroom.schedule[date] = []
-            
-        # Allocate classroom
-        classroom.allocate(date, time_slot)
+        # Check and allocate under the classroom lock so concurrent requests can't double-book
+        with entity_locks.hold(('classroom', classroom_id)):
+            if not classroom.allocate(date, time_slot):
+                return jsonify({"error": "Classroom already allocated for the given date and time"}), 400
+            journal.record('allocate', classroom_id, date, time_slot)
         
         return jsonify({
             "message": f"Classroom {classroom_id} allocated for {date} at {time_slot}",
@@ -1,31 +1,277 @@
+import asyncio
+import queue
 import socket
-import pickle
+import threading
+import time
+from contextlib import contextmanager
+from protocol import pack_frame, read_frame, recv_frame, send_frame
+
+READ_COMMANDS = frozenset({'GET_STUDENT', 'PING'})  # Safe to resend: running them twice changes nothing
+
+def _retryable(command, error, sent):
+    """Whether a failed request may be resent on a new connection.
+
+    Never after a timeout (the server may still be running it). Writes only when the frame never
+    left this side; once sent, the server may have applied it, and a resend would apply it again.
+    """
+    if isinstance(error, TimeoutError):
+        return False
+    return not sent or command[0] in READ_COMMANDS
 
 class UniversityClient:
-    def __init__(self, host='127.0.0.1', port=5500):  # Fixed __init__ and port
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((host, port))
+    def __init__(self, host='127.0.0.1', port=5500, timeout=None):  # Fixed __init__ and port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._next_id = 0
+        self._responses = {}  # replies that arrived while waiting for another request id
+        self.last_used = time.monotonic()
+
+    def send(self, *command):
+        """Send one command without waiting; returns its request id"""
+        self._next_id += 1
+        send_frame(self.sock, self._next_id, command)
+        return self._next_id
+
+    def receive(self, request_id):
+        while request_id not in self._responses:
+            frame = recv_frame(self.sock)
+            if frame is None:
+                raise ConnectionError("No response from server")
+            self._responses[frame[0]] = frame[1]
+        return self._responses.pop(request_id)
+
+    def request(self, *command):
+        response = self.receive(self.send(*command))
+        self.last_used = time.monotonic()
+        return response
+
+    def ping(self):
+        try:
+            return self.request('PING') == "PONG"
+        except (OSError, ValueError):
+            return False
+
+    def pipeline(self, commands):
+        """Send every command before reading any reply; results come back in command order"""
+        request_ids = [self.send(*command) for command in commands]
+        return [self.receive(request_id) for request_id in request_ids]
+
+    def batch(self, operations):
+        """Run many ADD_STUDENT/ENROLL/GET_STUDENT operations in one round trip; one result per operation"""
+        return self.request('BATCH', [list(operation) for operation in operations])
 
-    def get_student(self, student_id):
-        self.sock.sendall(pickle.dumps(('GET_STUDENT', student_id)))
-        return pickle.loads(self.sock.recv(5500))
+    def close(self):
+        self.sock.close()
+
+    def get_student(self, student_id, fields=None):
+        """Student as a dict of fields (server.STUDENT_FIELDS); a default set when fields is None"""
+        if fields:
+            return self.request('GET_STUDENT', student_id, list(fields))
+        return self.request('GET_STUDENT', student_id)
      
     def add_student(self, student_id, name, email, major):
-        self.sock.sendall(pickle.dumps(
-            ('ADD_STUDENT', student_id, name, email, major)
-        ))
-        return pickle.loads(self.sock.recv(5500))
+        return self.request('ADD_STUDENT', student_id, name, email, major)
 
     def enroll_course(self, student_id, course_id):
         try:
-            self.sock.sendall(pickle.dumps(('ENROLL', student_id, course_id)))
-            data = self.sock.recv(5500)
-            if not data:
-                return "No response from server"
-            return pickle.loads(data)
+            return self.request('ENROLL', student_id, course_id)
         except Exception as e:
             return f"Error: {str(e)}"
 
+class UniversityClientPool:
+    """Thread-safe pool of at most `size` UniversityClient connections.
+
+    Idle connections are pinged before reuse once they have sat longer than `health_check_interval`.
+    A request that fails on a reused connection is retried once on a fresh one, if _retryable allows.
+    """
+    def __init__(self, host='127.0.0.1', port=5500, size=8, timeout=5.0, health_check_interval=30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()  # Most recently used first, so spare connections age out
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _checkout(self):
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                return UniversityClient(self.host, self.port, self.timeout), True
+            if time.monotonic() - client.last_used < self.health_check_interval or client.ping():
+                return client, False
+            client.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for several calls (e.g. pipeline); blocks while all are in use"""
+        self._slots.acquire()
+        client = None
+        try:
+            client, _ = self._checkout()
+            yield client
+            self._idle.put(client)
+        except BaseException:
+            if client is not None:
+                client.close()
+            raise
+        finally:
+            self._slots.release()
+
+    def request(self, *command):
+        self._slots.acquire()
+        client = None
+        try:
+            client, fresh = self._checkout()
+            sent = False
+            try:
+                request_id = client.send(*command)
+                sent = True
+                response = client.receive(request_id)
+                client.last_used = time.monotonic()
+            except (OSError, ValueError) as e:
+                if fresh or not _retryable(command, e, sent):
+                    raise
+                client.close()
+                client = UniversityClient(self.host, self.port, self.timeout)  # Stale connection; reconnect once
+                response = client.request(*command)
+            self._idle.put(client)
+            client = None
+            return response
+        finally:
+            if client is not None:
+                client.close()
+            self._slots.release()
+
+    def ping(self):
+        try:
+            return self.request('PING') == "PONG"
+        except (OSError, ValueError):
+            return False
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    batch = UniversityClient.batch
+    get_student = UniversityClient.get_student
+    add_student = UniversityClient.add_student
+    enroll_course = UniversityClient.enroll_course
+
+class _NotSent(ConnectionError):
+    """The connection was already closed, so the request never reached the server"""
+
+class _AsyncConnection:
+    """One socket shared by many coroutines; a reader task hands each reply to its waiter by request id"""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.closed = False
+        self.reader_task = asyncio.create_task(self.read_replies())
+
+    async def read_replies(self):
+        try:
+            while True:
+                frame = await read_frame(self.reader)
+                if frame is None:
+                    break
+                future = self.pending.pop(frame[0], None)
+                if future is not None and not future.done():
+                    future.set_result(frame[1])
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to server lost"))
+            self.pending.clear()
+            self.writer.close()
+
+    async def request(self, request_id, command):
+        if self.closed:
+            raise _NotSent("Connection to server lost")
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(pack_frame(request_id, command))
+        await self.writer.drain()
+        return await future
+
+class AsyncUniversityClient:
+    """asyncio client multiplexing concurrent requests over `connections` sockets.
+
+    At most `max_in_flight` requests are outstanding; dropped connections are reopened on next use,
+    and a request is retried once on a reopened connection if _retryable allows.
+    """
+    def __init__(self, host='127.0.0.1', port=5500, connections=4, max_in_flight=1024):
+        self.host = host
+        self.port = port
+        self._connections = [None] * connections
+        self._connect_locks = [asyncio.Lock() for _ in range(connections)]
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._next_connection = 0
+        self._next_id = 0
+
+    async def _connection(self):
+        i = self._next_connection % len(self._connections)
+        self._next_connection += 1
+        async with self._connect_locks[i]:
+            connection = self._connections[i]
+            if connection is None or connection.closed:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connection = self._connections[i] = _AsyncConnection(reader, writer)
+            return connection
+
+    async def request(self, *command):
+        async with self._in_flight:
+            for attempt in range(2):
+                self._next_id += 1
+                request_id = self._next_id  # Read before awaiting; other coroutines bump the counter
+                connection = await self._connection()
+                try:
+                    return await connection.request(request_id, command)
+                except OSError as e:   # ConnectionError included
+                    if attempt or not _retryable(command, e, sent=not isinstance(e, _NotSent)):
+                        raise
+
+    async def ping(self):
+        try:
+            return await self.request('PING') == "PONG"
+        except (OSError, ValueError):
+            return False
+
+    async def get_student(self, student_id, fields=None):
+        if fields:
+            return await self.request('GET_STUDENT', student_id, list(fields))
+        return await self.request('GET_STUDENT', student_id)
+
+    async def add_student(self, student_id, name, email, major):
+        return await self.request('ADD_STUDENT', student_id, name, email, major)
+
+    async def enroll_course(self, student_id, course_id):
+        return await self.request('ENROLL', student_id, course_id)
+
+    async def batch(self, operations):
+        return await self.request('BATCH', [list(operation) for operation in operations])
+
+    async def close(self):
+        for connection in self._connections:
+            if connection is not None:
+                connection.reader_task.cancel()
+                connection.writer.close()
+        self._connections = [None] * len(self._connections)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
 
 # Example usage
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import University, Course
+from data_manager import journal
 
 courses_bp = Blueprint('courses', __name__)
 
@@ -15,7 +16,8 @@ def create_course():
             department=data['department'],
             credits=data['credits']
         )
-        university.courses.append(course)
+        university.add_course(course)
+        journal.record('add_course', course.course_id, course.name, course.department, course.credits)
         return jsonify({
             'message': 'Course created successfully',
             'course': course.to_dict()
@@ -1,46 +1,404 @@
+import io
+import mmap
 import os
 import pickle
+import struct
+import threading
 
-from flask import Blueprint, jsonify
-from models import University, Library
+from flask import Blueprint, jsonify, request
+from locking import mutations
+from models import University, Library, Student, Professor, Administrator, Course, Classroom, Schedule, Exam
 
 data_bp = Blueprint('data_manager', __name__)
 
+SNAPSHOT_FILE = "university_data.pkl"
+JOURNAL_FILE = "university_journal.log"
+COMPACT_THRESHOLD = 1000  # Journal records before /save folds them into the snapshot
+
+_RECORD_HEADER = struct.Struct('!I')
+
+SNAPSHOT_MAGIC = b'UMSSNAP1'
+_INDEX_HEADER = struct.Struct('!Q')
+
+# Snapshot section -> University attributes it materializes. Users and courses
+# point at each other (enrolled_students / courses_taught), so they share a section.
+SNAPSHOT_SECTIONS = {
+    'core': ('users', 'courses', 'departments', '_users', '_students', '_professors', '_admins', '_courses'),
+    'classrooms': ('classrooms',),
+    'library': ('library',),
+    'schedules': ('schedules',),
+    'exams': ('exams',),
+}
+
+class Journal:
+    """Append-only write-ahead log of mutations, replayed on top of the last snapshot"""
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._file = None
+        self._lock = threading.RLock()
+
+    def record(self, op, *args):
+        self.record_many([(op, args)])
+
+    def record_many(self, entries):
+        """Append several (op, args) records behind a single fsync"""
+        if not entries:
+            return
+        payloads = [pickle.dumps((op, tuple(args))) for op, args in entries]
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            self._file.write(b''.join(_RECORD_HEADER.pack(len(payload)) + payload for payload in payloads))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records += len(payloads)
+
+    def replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                payload = f.read(_RECORD_HEADER.unpack(header)[0])
+                try:
+                    yield pickle.loads(payload)
+                except Exception:
+                    return  # Torn tail from a crash mid-write
+
+    def truncate(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            open(self.path, "wb").close()
+            self.records = 0
+
+    def checkpoint(self, snapshot_path, write):
+        """Atomically write a full snapshot and drop the records it now contains"""
+        with self._lock:
+            tmp_path = snapshot_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, snapshot_path)
+            self.truncate()
+
+journal = Journal(JOURNAL_FILE)
+
+def _snapshot(university):
+    return {
+        "users": university.users,
+        "courses": university.courses,
+        "departments": university.departments,
+        "exams": getattr(university, 'exams', []),
+        "library": getattr(university, 'library', Library("LIB-01")),
+        "classrooms": getattr(university, 'classrooms', {}),  # Ensure classrooms is a dictionary
+        "schedules": getattr(university, 'schedules', [])
+    }
+
+def _section_payloads(university):
+    return {
+        'core': {
+            'users': university.users,
+            'courses': university.courses,
+            'departments': university.departments,
+        },
+        'classrooms': getattr(university, 'classrooms', {}),
+        'library': getattr(university, 'library', Library("LIB-01")),
+        'schedules': getattr(university, 'schedules', []),
+        'exams': getattr(university, 'exams', []),
+    }
+
+def _entity_refs(payloads):
+    """Map each section-owned object to a reference other sections can pickle instead"""
+    refs = {}
+    core = payloads['core']
+    for i, user in enumerate(core['users']):
+        refs.setdefault(id(user), ('core', 'users', i))
+    for i, course in enumerate(core['courses']):
+        refs.setdefault(id(course), ('core', 'courses', i))
+        for j, exam in enumerate(getattr(course, 'exams', [])):
+            refs.setdefault(id(exam), ('core', 'exam', i, j))
+    for i, department in enumerate(core['departments']):
+        refs.setdefault(id(department), ('core', 'departments', i))
+    for key, classroom in payloads['classrooms'].items():
+        refs.setdefault(id(classroom), ('classrooms', key))
+    refs.setdefault(id(payloads['library']), ('library',))
+    for i, schedule in enumerate(payloads['schedules']):
+        refs.setdefault(id(schedule), ('schedules', i))
+    for i, exam in enumerate(payloads['exams']):
+        refs.setdefault(id(exam), ('exams', i))
+    return refs
+
+class _SectionPickler(pickle.Pickler):
+    def __init__(self, file, section, refs):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.section = section
+        self.refs = refs
+
+    def persistent_id(self, obj):
+        ref = self.refs.get(id(obj))
+        if ref is not None and ref[0] != self.section:
+            return ref
+        return None
+
+def write_snapshot(f, university):
+    """Write MAGIC | index length | index | section blobs, each section pickled on its own"""
+    payloads = _section_payloads(university)
+    refs = _entity_refs(payloads)
+    blobs = {}
+    for section, payload in payloads.items():
+        buf = io.BytesIO()
+        _SectionPickler(buf, section, refs).dump(payload)
+        blobs[section] = buf.getvalue()
+
+    # Offsets are relative to the end of the index
+    index = {}
+    offset = 0
+    for section, blob in blobs.items():
+        index[section] = (offset, len(blob))
+        offset += len(blob)
+    index_bytes = pickle.dumps(index)
+
+    f.write(SNAPSHOT_MAGIC)
+    f.write(_INDEX_HEADER.pack(len(index_bytes)))
+    f.write(index_bytes)
+    for blob in blobs.values():
+        f.write(blob)
+
+class _SectionUnpickler(pickle.Unpickler):
+    def __init__(self, file, reader):
+        super().__init__(file)
+        self.reader = reader
+
+    def persistent_load(self, pid):
+        return self.reader.resolve(pid)
+
+class SnapshotReader:
+    """mmap'ed sectioned snapshot; each section is unpickled the first time it is touched"""
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        start = len(SNAPSHOT_MAGIC) + _INDEX_HEADER.size
+        index_size = _INDEX_HEADER.unpack_from(self._mm, len(SNAPSHOT_MAGIC))[0]
+        self.index = pickle.loads(self._mm[start:start + index_size])
+        self._base = start + index_size
+        self.university = None
+        self._payloads = {}   # section -> frozen view used to resolve references
+        self._loading = set()
+        self._lock = threading.RLock()  # Request threads may touch the same section at once
+        self._attribute_sections = {attr: section
+                                    for section, attrs in SNAPSHOT_SECTIONS.items()
+                                    for attr in attrs}
+
+    @staticmethod
+    def is_snapshot(path):
+        with open(path, "rb") as f:
+            return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+    def attach(self, university):
+        """Drop the eagerly built sections so University.__getattr__ pulls them from here"""
+        self.university = university
+        for attr in self._attribute_sections:
+            university.__dict__.pop(attr, None)
+        for index in ('_schedule_index', '_gradebook', '_exam_registry'):
+            university.__dict__.pop(index, None)  # Derived from the sections; rebuilt on next use
+        university._snapshot = self
+
+    def materialize_attribute(self, university, name):
+        section = self._attribute_sections.get(name)
+        if section is None:
+            return False
+        with self._lock:
+            if section not in self._payloads:
+                self._materialize(section)
+        return True
+
+    def _materialize(self, section):
+        if section in self._loading:
+            raise RuntimeError(f"Snapshot section '{section}' references itself while loading")
+        self._loading.add(section)
+        try:
+            university = self.university
+            offset, length = self.index[section]
+            offset += self._base
+            payload = _SectionUnpickler(io.BytesIO(self._mm[offset:offset + length]), self).load()
+
+            if section == 'core':
+                university.users = payload['users']
+                university.courses = payload['courses']
+                university.departments = payload['departments']
+                university.reindex()
+                self._payloads[section] = {key: tuple(value) for key, value in payload.items()}
+            elif section == 'classrooms':
+                if not isinstance(payload, dict):
+                    payload = {c.classroom_id: c for c in payload}
+                university.classrooms = payload
+                self._payloads[section] = payload
+            else:
+                setattr(university, section, payload)
+                self._payloads[section] = tuple(payload) if isinstance(payload, list) else payload
+        finally:
+            self._loading.discard(section)
+
+        if len(self._payloads) == len(SNAPSHOT_SECTIONS):
+            self.close()
+
+    def resolve(self, ref):
+        section = ref[0]
+        with self._lock:
+            if section not in self._payloads:
+                self._materialize(section)
+        payload = self._payloads[section]
+        if section == 'core':
+            if ref[1] == 'exam':
+                return payload['courses'][ref[2]].exams[ref[3]]
+            return payload[ref[1]][ref[2]]
+        if section == 'library':
+            return payload
+        return payload[ref[1]]
+
+    def get(self, key, default=None):
+        return getattr(self.university, key, default)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+        if self.university is not None:
+            self.university.__dict__.pop('_snapshot', None)
+
+def compact():
+    # Waits for in-flight mutations to write their records, and holds off new ones until the journal is truncated
+    with mutations.exclusive():
+        journal.checkpoint(SNAPSHOT_FILE, lambda f: write_snapshot(f, University.get_instance()))
+
 @data_bp.route('/save', methods=['POST'])
 def save_data():
     try:
-        university = University.get_instance()
-        print("Saving data - Current classrooms:", university.classrooms)  # Debug log
-        
-        data = {
-            "users": university.users,
-            "courses": university.courses,
-            "departments": university.departments,
-            "exams": getattr(university, 'exams', []),
-            "library": getattr(university, 'library', Library("LIB-01")),
-            "classrooms": getattr(university, 'classrooms', {}),  # Ensure classrooms is a dictionary
-            "schedules": getattr(university, 'schedules', [])
-        }
-        print("Data to be saved:", data)  # Debug log
-        
-        with open("university_data.pkl", "wb") as f:
-            pickle.dump(data, f)
+        # Every mutation is already durable in the journal; only compact once it grows
+        pending = journal.records
+        force = request.args.get('compact') == '1'
+        if force or pending >= COMPACT_THRESHOLD or not os.path.exists(SNAPSHOT_FILE):
+            compact()
+            return jsonify({
+                    'message': 'Data saved successfully',
+                    'compacted': True,
+                    'journal_records': pending
+                }), 201
         return jsonify({
                 'message': 'Data saved successfully',
+                'compacted': False,
+                'journal_records': pending
             }), 201
     except Exception as e:
         print("Error saving data:", str(e))  # Debug log
         return jsonify({'error': str(e)}), 500
 
+def _library(university):
+    if not hasattr(university, 'library'):
+        university.library = Library("LIB-01")
+    return university.library
+
+def _replay_exam_results(university, rows):
+    for exam_id, student_id, grade in rows:
+        university.get_exam(exam_id).add_result(university.get_student(student_id), grade)
+
+def _replay_assign_professor(university, professor_id, course_id):
+    professor = university.get_professor(professor_id)
+    course = university.get_course(course_id)
+    if course not in professor.courses_taught:
+        professor.courses_taught.append(course)
+    course.professor = professor
+
+def _replay_schedule(university, schedule_id, course_id, professor_id, time_slot, classroom_id, date):
+    Schedule(schedule_id, university.get_course(course_id), university.get_professor(professor_id),
+             time_slot, university.get_classroom(classroom_id), date).assign_schedule()
+
+def _replay_schedule_bulk(university, rows):
+    for row in rows:
+        _replay_schedule(university, *row)
+
+def _replay_update_schedule(university, schedule_id, time_slot, classroom_id, date):
+    for schedule in getattr(university, 'schedules', []):
+        if schedule.schedule_id == schedule_id:
+            classroom = university.get_classroom(classroom_id) if classroom_id else None
+            schedule.update_schedule(time_slot, classroom, date)
+            return
+
+def _replay_schedule_exam(university, exam_id, course_id, date, duration, classroom_id):
+    # Written before exams checked room capacity
+    Exam(exam_id, university.get_course(course_id), date, duration).schedule_exam(
+        university.get_classroom(classroom_id), check_capacity=False)
+
+def _replay_schedule_exam_rooms(university, exam_id, course_id, date, duration, start_time, classroom_ids):
+    Exam(exam_id, university.get_course(course_id), date, duration).schedule_exam(
+        [university.get_classroom(classroom_id) for classroom_id in classroom_ids], start_time)
+
+def _replay_schedule_exam_plan(university, rows):
+    for row in rows:
+        _replay_schedule_exam_rooms(university, *row)
+
+# op -> handler(university, *args); handlers mirror what the blueprint did on success
+REPLAY_HANDLERS = {
+    'add_student': lambda u, *a: u.add_user(Student(*a)),
+    'add_professor': lambda u, *a: u.add_user(Professor(*a)),
+    'add_admin': lambda u, *a: u.add_user(Administrator(*a)),
+    'add_course': lambda u, *a: u.add_course(Course(*a)),
+    'add_classroom': lambda u, *a: u.add_classroom(Classroom(*a)),
+    'enroll': lambda u, sid, cid: u.get_student(sid).enroll_course(u.get_course(cid)),
+    'assign_professor': _replay_assign_professor,
+    'grade': lambda u, sid, cid, grade: u.get_student(sid).update_grade(cid, grade),
+    'register_library': lambda u, sid: _library(u).register_student(u.get_student(sid)),
+    'add_book': lambda u, *a: _library(u).add_book(*a),
+    'add_books': lambda u, rows: _library(u).add_books(rows),
+    # Older borrow/return records carry no timestamp; their loans date from the replay
+    'borrow': lambda u, sid, bid, *now: _library(u).borrow_book(sid, bid, *now),
+    'return': lambda u, sid, bid, *now: _library(u).return_book(sid, bid, *now),
+    'hold': lambda u, sid, bid: _library(u).place_hold(sid, bid),
+    'cancel_hold': lambda u, sid, bid: _library(u).cancel_hold(sid, bid),
+    'add_copies': lambda u, bid, count, now: _library(u).add_copies(bid, count, now),
+    'allocate': lambda u, cid, date, slot: u.get_classroom(cid).allocate(date, slot),
+    'schedule': _replay_schedule,
+    'schedule_bulk': _replay_schedule_bulk,
+    'update_schedule': _replay_update_schedule,
+    'schedule_exam': _replay_schedule_exam,
+    'schedule_exam_rooms': _replay_schedule_exam_rooms,
+    'schedule_exam_plan': _replay_schedule_exam_plan,
+    'exam_result': lambda u, eid, sid, grade: u.get_exam(eid).record_results(u.get_student(sid), grade),
+    'exam_results': _replay_exam_results,
+}
+
+def replay_journal(university):
+    replayed = 0
+    for op, args in journal.replay():
+        replayed += 1
+        try:
+            REPLAY_HANDLERS[op](university, *args)
+        except Exception as e:
+            print(f"Skipping journal record {op}{args}: {e}")  # Debug log
+    journal.records = replayed
+    return replayed
+
 def load_data():
     try:
-        if os.path.exists("university_data.pkl"):
-            print("Loading data from university_data.pkl")  # Debug log
-            with open("university_data.pkl", "rb") as f:
+        data = {}
+        university = University.get_instance()
+        if os.path.exists(SNAPSHOT_FILE) and SnapshotReader.is_snapshot(SNAPSHOT_FILE):
+            print(f"Mapping sectioned snapshot {SNAPSHOT_FILE}")  # Debug log
+            data = SnapshotReader(SNAPSHOT_FILE)
+            data.attach(university)
+        elif os.path.exists(SNAPSHOT_FILE):
+            # Legacy single-pickle snapshot; rewritten as sections on the next compaction
+            print(f"Loading data from {SNAPSHOT_FILE}")  # Debug log
+            with open(SNAPSHOT_FILE, "rb") as f:
                 data = pickle.load(f)
-            print("Loaded data:", data)  # Debug log
-            
-            university = University.get_instance()
+
             university.users = data.get("users", [])
             university.courses = data.get("courses", [])
             university.departments = data.get("departments", [])
@@ -48,11 +406,15 @@ def load_data():
             university.library = data.get("library", Library("LIB-01"))
             university.classrooms = data.get("classrooms", {})  # Ensure classrooms is a dictionary
             university.schedules = data.get("schedules", [])
-            
-            print("University instance after loading:", university.classrooms)  # Debug log
-            return data
-        print("No saved data found")  # Debug log
-        return {}
+            university.reindex()
+        else:
+            print("No saved data found")  # Debug log
+
+        replayed = replay_journal(university)
+        if replayed:
+            print(f"Replayed {replayed} journal records")  # Debug log
+            data = data or _snapshot(university)
+        return data
     except Exception as e:
         print("Error loading data:", str(e))  # Debug log
-        return {}
\ No newline at end of file
+        return {}
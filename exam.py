@@ -1,8 +1,17 @@
+import time
 from flask import Blueprint, request, jsonify
 from models import University, Exam, Course, Classroom
+from data_manager import journal
+from locking import entity_locks
+from intervals import format_time_slot, parse_time
+from exam_planner import plan_exams
+from bulk_rows import MAX_REPORTED_REJECTS, NDJSON_MIMETYPES, read_rows
 
 exam_bp = Blueprint('exam', __name__)
 
+def _seating(exam):
+    return [{"classroomId": classroom.classroom_id, "seats": seats} for classroom, seats in exam.get_rooms()]
+
 @exam_bp.route('/schedule-exam', methods=['POST'])
 def schedule_exam():
     try:
@@ -11,27 +20,41 @@ def schedule_exam():
         course_id = data.get('courseId')
         date = data.get('examDate')
         duration = data.get('duration')
-        classroom_id = data.get('classroomId')
+        # Large exams can be split over several rooms with classroomIds
+        classroom_ids = data.get('classroomIds') or ([data['classroomId']] if data.get('classroomId') else None)
+        start_time = data.get('startTime') or "09:00"
 
-        if not all([exam_id, course_id, date, duration, classroom_id]):
+        if not all([exam_id, course_id, date, duration, classroom_ids]):
             return jsonify({"error": "Missing required fields"}), 400
+        try:
+            duration = int(duration)
+            format_time_slot(parse_time(start_time), parse_time(start_time) + duration)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid start time or duration: {e}"}), 400
 
         university = University.get_instance()
         
-        # Get course and classroom
+        # Get course and classrooms
         course = university.get_course(course_id)
-        classroom = university.get_classroom(classroom_id)
+        classrooms = [university.get_classroom(classroom_id) for classroom_id in classroom_ids]
         
         if not course:
             return jsonify({"error": "Course not found"}), 404
-        if not classroom:
+        if not all(classrooms):
             return jsonify({"error": "Classroom not found"}), 404
+        if university.get_exam(exam_id):
+            return jsonify({"error": "Exam ID already exists"}), 400
 
         # Create and schedule exam
-        exam = Exam(exam_id, course, date, int(duration))
-        success = exam.schedule_exam(classroom)
+        exam = Exam(exam_id, course, date, duration)
+        keys = [('course', course.course_id)] + [('classroom', classroom.classroom_id) for classroom in classrooms]
+        with entity_locks.hold(*keys):
+            success = exam.schedule_exam(classrooms, start_time)
+            if success:
+                journal.record('schedule_exam_rooms', exam_id, course_id, date, duration, start_time, classroom_ids)
         
         if success:
+            classroom = classrooms[0]
             return jsonify({
                 "message": f"Exam scheduled successfully",
                 "exam": {
@@ -39,11 +62,13 @@ def schedule_exam():
                     "course": course.name,
                     "date": date,
                     "duration": duration,
-                    "classroom": f"{classroom.location} (Room {classroom.classroom_id})"
+                    "timeSlot": exam.time_slot,
+                    "classroom": f"{classroom.location} (Room {classroom.classroom_id})",
+                    "rooms": _seating(exam)
                 }
             }), 201
         else:
-            return jsonify({"error": "Failed to schedule exam - classroom may be unavailable"}), 400
+            return jsonify({"error": "Failed to schedule exam - classroom may be unavailable or too small"}), 400
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -67,21 +92,15 @@ def record_result():
             return jsonify({"error": "Student not found"}), 404
 
         # Find exam
-        exam = None
-        for course in university.courses:
-            if hasattr(course, 'exams'):
-                for e in course.exams:
-                    if e.exam_id == exam_id:
-                        exam = e
-                        break
-            if exam:
-                break
-
+        exam = university.get_exam(exam_id)
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
 
         # Record result
-        success = exam.record_results(student, grade)
+        with entity_locks.hold(('exam', exam_id)):
+            success = exam.record_results(student, grade)
+            if success:
+                journal.record('exam_result', exam_id, student_id, grade)
         
         if success:
             return jsonify({
@@ -98,46 +117,220 @@ def record_result():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+RESULT_BATCH_SIZE = 5_000        # Rows recorded (and journaled) per lock acquisition
+def _record_result_batch(batch, summary, reject):
+    recorded = []
+    with entity_locks.hold(*{('exam', exam.exam_id) for _, exam, _, _ in batch}):
+        for number, exam, student, grade in batch:
+            if exam.add_result(student, grade):
+                recorded.append((exam.exam_id, student.user_id, grade))
+            else:
+                reject(number, exam.exam_id, student.user_id, "Result already exists")
+        if recorded:
+            journal.record('exam_results', recorded)
+    summary["recorded"] += len(recorded)
+
+def import_exam_results(university, rows, exam_id=None, batch_size=RESULT_BATCH_SIZE):
+    """Validate result rows against the student and exam registries and record them in batches.
+
+    Rows are {examId, studentId, grade}; exam_id fills in a missing examId. Returns a summary.
+    """
+    summary = {"rows": 0, "recorded": 0, "rejected": 0, "rejected_rows": []}
+
+    def reject(number, row_exam_id, student_id, error):
+        summary["rejected"] += 1
+        if len(summary["rejected_rows"]) < MAX_REPORTED_REJECTS:
+            summary["rejected_rows"].append({"row": number, "examId": row_exam_id,
+                                             "studentId": student_id, "error": error})
+
+    batch = []
+    for number, row in enumerate(rows, start=1):
+        summary["rows"] += 1
+        if row is None:
+            reject(number, None, None, "Malformed row")
+            continue
+        row_exam_id = row.get("examId") or exam_id
+        student_id = row.get("studentId")
+        grade = row.get("grade")
+        if not row_exam_id or not student_id or grade is None or grade == "":
+            reject(number, row_exam_id, student_id, "Missing required fields")
+            continue
+        exam = university.get_exam(row_exam_id)
+        if not exam:
+            reject(number, row_exam_id, student_id, "Exam not found")
+            continue
+        student = university.get_student(student_id)
+        if not student:
+            reject(number, row_exam_id, student_id, "Student not found")
+            continue
+        batch.append((number, exam, student, grade))
+        if len(batch) >= batch_size:
+            _record_result_batch(batch, summary, reject)
+            batch = []
+    if batch:
+        _record_result_batch(batch, summary, reject)
+    return summary
+
+@exam_bp.route('/bulk-results', methods=['POST'])
+def bulk_record_results():
+    """Stream a CSV (text/csv) or NDJSON body of results; ?examId= applies to rows without one"""
+    try:
+        if request.mimetype != 'text/csv' and request.mimetype not in NDJSON_MIMETYPES:
+            return jsonify({"error": "Expected a CSV or NDJSON body"}), 400
+
+        university = University.get_instance()
+        start = time.perf_counter()
+        summary = import_exam_results(university, read_rows(request.stream, request.mimetype),
+                                      exam_id=request.args.get('examId'))
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_second"] = round(summary["rows"] / elapsed) if elapsed else None
+        summary["message"] = f"Recorded {summary['recorded']} of {summary['rows']} results"
+        return jsonify(summary), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @exam_bp.route('/exam/<exam_id>', methods=['GET'])
 def get_exam_info(exam_id):
     try:
         university = University.get_instance()
         
         # Find exam
-        exam = None
-        for course in university.courses:
-            if hasattr(course, 'exams'):
-                for e in course.exams:
-                    if e.exam_id == exam_id:
-                        exam = e
-                        break
-            if exam:
-                break
-
+        exam = university.get_exam(exam_id)
         if not exam:
             return jsonify({"error": "Exam not found"}), 404
 
-        # Calculate statistics
-        num_students = len(exam.student_results)
-        avg_grade = None
-        if exam.student_results:
-            numeric_grades = []
-            for grade in exam.student_results.values():
-                if isinstance(grade, (int, float)):
-                    numeric_grades.append(grade)
-                elif isinstance(grade, str) and grade.replace('.','',1).isdigit():
-                    numeric_grades.append(float(grade))
-            if numeric_grades:
-                avg_grade = sum(numeric_grades)/len(numeric_grades)
+        # Statistics are kept up to date as results come in; ?percentiles=10,95 picks the percentiles
+        try:
+            percentiles = [float(p) for p in request.args['percentiles'].split(',')] \
+                if request.args.get('percentiles') else (25, 50, 75, 90)
+            statistics = exam.get_stats().summary(percentiles)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid percentiles: {e}"}), 400
+        avg_grade = statistics['average']
 
         return jsonify({
             "id": exam_id,
             "course": exam.course.name,
             "date": exam.date,
             "duration": exam.duration,
-            "students_completed": num_students,
-            "average_grade": avg_grade if avg_grade is not None else "N/A"
+            "students_completed": len(exam.student_results),
+            "average_grade": avg_grade if avg_grade is not None else "N/A",
+            "statistics": statistics
         }), 200
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500 
+
+@exam_bp.route('/exams', methods=['GET'])
+def list_exams():
+    """Exams filtered by ?courseId=, ?date= or ?classroomId= (all exams without a filter)"""
+    try:
+        registry = University.get_instance().get_exam_registry()
+        if request.args.get('courseId'):
+            exams = registry.by_course(request.args['courseId'])
+        elif request.args.get('date'):
+            exams = registry.by_date(request.args['date'])
+        elif request.args.get('classroomId'):
+            exams = registry.by_room(request.args['classroomId'])
+        else:
+            exams = list(University.get_instance().exams)
+
+        return jsonify([{
+            "id": exam.exam_id,
+            "course": exam.course.course_id,
+            "date": exam.date,
+            "duration": exam.duration,
+            "timeSlot": exam.get_time_slot(),
+            "classroom": exam.classroom.classroom_id if getattr(exam, 'classroom', None) else None,
+            "rooms": _seating(exam)
+        } for exam in exams]), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def apply_exam_plan(university, requested, assignments):
+    """Schedule planned exams; requested maps exam_id -> (course, duration). Returns (scheduled, failed) IDs"""
+    keys = set()
+    for exam_id, _, _, seating in assignments:
+        keys.add(('course', requested[exam_id][0].course_id))
+        keys.update(('classroom', classroom_id) for classroom_id, _ in seating)
+    scheduled, failed, records = [], [], []
+    # Rooms may have been booked since planning; schedule_exam re-checks each one
+    with entity_locks.hold(*keys):
+        for exam_id, date, time_slot, seating in assignments:
+            course, duration = requested[exam_id]
+            classroom_ids = [classroom_id for classroom_id, _ in seating]
+            start_time = time_slot.split('-')[0]
+            exam = Exam(exam_id, course, date, duration)
+            if not university.get_exam(exam_id) and exam.schedule_exam(
+                    [university.get_classroom(classroom_id) for classroom_id in classroom_ids], start_time):
+                scheduled.append(exam_id)
+                records.append((exam_id, course.course_id, date, duration, start_time, classroom_ids))
+            else:
+                failed.append(exam_id)
+        if records:
+            journal.record('schedule_exam_plan', records)
+    return scheduled, failed
+
+@exam_bp.route('/plan', methods=['POST'])
+def plan_exam_period():
+    """Plan dates, start times and rooms for a batch of exams; "apply": true also schedules them"""
+    try:
+        data = request.get_json() or {}
+        exams = data.get('exams')
+        dates = data.get('dates')
+        start_times = data.get('startTimes') or ["09:00", "14:00"]
+        if not exams or not dates:
+            return jsonify({"error": "Missing required fields: exams, dates"}), 400
+        try:
+            for start_time in start_times:
+                parse_time(start_time)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        university = University.get_instance()
+        requested = {}
+        for item in exams:
+            exam_id = item.get('examId')
+            if not exam_id or not item.get('courseId') or not item.get('duration'):
+                return jsonify({"error": "Each exam needs examId, courseId and duration"}), 400
+            course = university.get_course(item['courseId'])
+            if not course:
+                return jsonify({"error": f"Course {item['courseId']} not found"}), 404
+            if exam_id in requested or university.get_exam(exam_id):
+                return jsonify({"error": f"Exam ID {exam_id} already exists"}), 400
+            try:
+                requested[exam_id] = (course, int(item['duration']))
+            except ValueError:
+                return jsonify({"error": f"Invalid duration for exam {exam_id}"}), 400
+
+        dates = list(dict.fromkeys(dates))
+        classrooms = university.classrooms.values()
+        rooms = [(classroom.classroom_id, classroom.seats()) for classroom in classrooms]
+        busy = [(date, time_slot, classroom.classroom_id)
+                for classroom in classrooms for date in dates for time_slot in classroom.schedule.get(date, ())]
+        registry = university.get_exam_registry()
+        fixed = [(exam.date, exam.get_time_slot(), [student.user_id for student in exam.course.enrolled_students])
+                 for date in dates for exam in registry.by_date(date)]
+        plan = plan_exams([(exam_id, duration, [student.user_id for student in course.enrolled_students])
+                           for exam_id, (course, duration) in requested.items()],
+                          rooms, dates, start_times, busy, fixed)
+
+        response = {
+            "assignments": [{
+                "examId": exam_id,
+                "date": date,
+                "timeSlot": time_slot,
+                "rooms": [{"classroomId": classroom_id, "seats": seats} for classroom_id, seats in seating]
+            } for exam_id, date, time_slot, seating in plan["assignments"]],
+            "unplaced": plan["unplaced"],
+            "metrics": plan["metrics"]
+        }
+        if data.get('apply'):
+            response["scheduled"], response["failed"] = apply_exam_plan(university, requested, plan["assignments"])
+        return jsonify(response), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
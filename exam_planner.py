@@ -0,0 +1,133 @@
+import time
+from bisect import bisect_left
+from intervals import IntervalIndex, format_time_slot, merge_intervals, parse_time, parse_time_slot
+
+def _clash_graph(rosters):
+    """Exams sharing at least one student, per exam index"""
+    exams_by_student = {}
+    for i, students in enumerate(rosters):
+        for student_id in students:
+            exams_by_student.setdefault(student_id, []).append(i)
+    neighbours = [set() for _ in rosters]
+    for exams in exams_by_student.values():
+        if len(exams) > 1:
+            for i in exams:
+                neighbours[i].update(exams)
+    for i, others in enumerate(neighbours):
+        others.discard(i)
+    return neighbours
+
+def _seat(size, capacities, is_free):
+    """Fewest free rooms seating size students: the smallest room that fits everyone left,
+    otherwise the largest free room and repeat. Returns room indexes or None"""
+    chosen = []
+    taken = set()
+    remaining = max(size, 1)  # An exam with nobody enrolled still needs a room
+    while remaining > 0:
+        first = bisect_left(capacities, remaining)
+        pick = next((r for r in range(first, len(capacities)) if r not in taken and is_free(r)), None)
+        if pick is None:
+            pick = next((r for r in range(first - 1, -1, -1)
+                         if capacities[r] > 0 and r not in taken and is_free(r)), None)
+            if pick is None:
+                return None
+        chosen.append(pick)
+        taken.add(pick)
+        remaining -= capacities[pick]
+    return chosen
+
+def plan_exams(exams, rooms, dates, start_times, busy=(), fixed=()):
+    """Give each exam a date, start time and enough rooms, with no room double-booked
+    and no student sitting two exams at once.
+
+    exams: [(exam_id, duration_minutes, student_ids)], rooms: [(room_id, capacity)],
+    busy: existing room bookings as [(date, time_slot, room_id)],
+    fixed: exams already scheduled as [(date, time_slot, student_ids)].
+    Exams with the most clashes go first, then the largest; each takes the earliest
+    clash-free (date, start) with enough free seats.
+    """
+    started = time.perf_counter()
+    starts = sorted({parse_time(start) for start in start_times})
+    rooms = sorted(rooms, key=lambda room: room[1])
+    capacities = [capacity for _, capacity in rooms]
+    room_pos = {room_id: r for r, (room_id, _) in enumerate(rooms)}
+    date_pos = {date: d for d, date in enumerate(dates)}
+
+    existing = {}  # (date index, room index) -> booked intervals
+    for date, time_slot, room_id in busy:
+        if date in date_pos and room_id in room_pos:
+            try:
+                start, end = parse_time_slot(time_slot)
+            except ValueError:
+                continue
+            existing.setdefault((date_pos[date], room_pos[room_id]), []).append((start, end))
+    booked = IntervalIndex()  # (date index, room index) -> bookings
+    for key, intervals in existing.items():
+        for start, end in merge_intervals(intervals):
+            booked.add(key, start, end, key)   # Not None: conflict() returns None for "free"
+
+    # Scheduled exams join the clash graph already placed; their rosters only constrain the new ones
+    rosters = [students for _, _, students in exams]
+    placed = [None] * len(exams)  # exam index -> (date index, start, end)
+    for date, time_slot, students in fixed:
+        try:
+            start, end = parse_time_slot(time_slot)
+        except ValueError:
+            continue
+        rosters.append(students)
+        placed.append((date_pos.get(date), start, end))
+    neighbours = _clash_graph(rosters)
+
+    cells = [(d, start) for d in range(len(dates)) for start in starts]
+    total_seats = sum(capacities)
+    order = sorted(range(len(exams)), key=lambda i: (-len(neighbours[i]), -len(exams[i][2]), i))
+    assignments = {}
+    unplaced = []
+    rooms_used = 0
+    for i in order:
+        exam_id, duration, students = exams[i]
+        size = len(students)
+        if duration <= 0:
+            unplaced.append({"examId": exam_id, "reason": "Duration must be positive"})
+            continue
+        if size > total_seats:
+            unplaced.append({"examId": exam_id, "reason": "More students than all rooms seat"})
+            continue
+        for d, start in cells:
+            end = start + duration
+            if end > 24 * 60:
+                continue
+            if any(placed[j] and placed[j][0] == d and placed[j][1] < end and start < placed[j][2]
+                   for j in neighbours[i]):
+                continue
+            chosen = _seat(size, capacities, lambda r: booked.conflict((d, r), start, end) is None)
+            if chosen is None:
+                continue
+            placed[i] = (d, start, end)
+            seating = []
+            remaining = size
+            for r in chosen:
+                booked.add((d, r), start, end, exam_id)
+                seats = min(remaining, capacities[r])
+                seating.append((rooms[r][0], seats))
+                remaining -= seats
+            rooms_used += len(chosen)
+            assignments[i] = (exam_id, dates[d], format_time_slot(start, end), seating)
+            break
+        else:
+            unplaced.append({"examId": exam_id, "reason": "No clash-free slot with enough free seats"})
+
+    placed_count = len(assignments)
+    return {
+        "assignments": [assignments[i] for i in sorted(assignments)],
+        "unplaced": unplaced,
+        "metrics": {
+            "solve_seconds": round(time.perf_counter() - started, 4),
+            "exams": len(exams),
+            "placed": placed_count,
+            "unplaced": len(unplaced),
+            "placement_rate": placed_count / len(exams) if exams else 1.0,
+            "rooms_used": rooms_used,
+            "split_exams": sum(1 for *_, seating in assignments.values() if len(seating) > 1),
+        }
+    }
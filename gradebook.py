@@ -0,0 +1,221 @@
+import math
+import threading
+from array import array
+from bisect import insort
+
+GRADE_LETTERS = ('A', 'B', 'C', 'D', 'F')
+GRADE_SCORES = (95, 85, 75, 65, 55)      # Dashboard score per letter
+GPA_POINTS = (4.0, 3.0, 2.0, 1.0, 0.0)
+UNGRADED = -1
+_CODES = {letter: code for code, letter in enumerate(GRADE_LETTERS)}
+
+def grade_code(grade):
+    """Letter grade to its code; anything else (None, legacy numbers) counts as ungraded"""
+    return _CODES.get(grade, UNGRADED) if isinstance(grade, str) else UNGRADED
+
+def numeric_grade(grade):
+    """Exam grade as a float: numbers and numeric strings such as '88' or '91.5'; None otherwise"""
+    if isinstance(grade, (int, float)) and not isinstance(grade, bool):
+        return float(grade)
+    if isinstance(grade, str) and grade.replace('.', '', 1).isdigit():
+        return float(grade)
+    return None
+
+class ExamStats:
+    """Running aggregates over an exam's numeric grades.
+
+    Count, sum, min/max, Welford mean/variance and a 10-point histogram are updated per result;
+    a sorted array of the grades answers percentile queries by index.
+    """
+    BUCKETS = 10   # 0-9, 10-19, ..., 90-100
+
+    def __init__(self, grades=()):
+        values = sorted(v for v in map(numeric_grade, grades) if v is not None)
+        self.count = 0
+        self.total = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.histogram = array('I', [0] * self.BUCKETS)
+        self._sorted = array('d', values)
+        self._lock = threading.Lock()
+        for value in values:
+            self._tally(value)
+
+    def _tally(self, value):
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        self.histogram[min(max(int(value // 10), 0), self.BUCKETS - 1)] += 1
+
+    def add(self, grade):
+        value = numeric_grade(grade)
+        if value is None:
+            return False
+        with self._lock:
+            self._tally(value)
+            insort(self._sorted, value)
+        return True
+
+    def _value_at(self, p):
+        # Nearest rank; the caller holds the lock
+        if not 0 <= p <= 100:
+            raise ValueError("Percentile must be between 0 and 100")
+        if not self._sorted:
+            return None
+        return self._sorted[max(math.ceil(p / 100 * len(self._sorted)) - 1, 0)]
+
+    def percentile(self, p):
+        """Nearest-rank percentile for 0 <= p <= 100; None before any numeric grade"""
+        with self._lock:
+            return self._value_at(p)
+
+    def summary(self, percentiles=(25, 50, 75, 90)):
+        with self._lock:
+            if not self.count:
+                return {'count': 0, 'average': None, 'min': None, 'max': None, 'std_dev': None,
+                        'percentiles': {f"{p:g}": self._value_at(p) for p in percentiles},
+                        'histogram': self._histogram_dict()}
+            values = self._sorted
+            return {
+                'count': self.count,
+                'average': self.total / self.count,
+                'min': values[0],
+                'max': values[-1],
+                'std_dev': math.sqrt(self._m2 / self.count),
+                'percentiles': {f"{p:g}": self._value_at(p) for p in percentiles},
+                'histogram': self._histogram_dict(),
+            }
+
+    def _histogram_dict(self):
+        return {f"{10 * i}-{10 * i + 9 if i < self.BUCKETS - 1 else 100}": n for i, n in enumerate(self.histogram)}
+
+class Gradebook:
+    """Columnar enrollment table: one (student, course, grade code) row per enrollment.
+
+    Per-course and per-student totals are updated on every change, so course averages,
+    grade distributions and GPAs are read in O(1) instead of walking enrolled students.
+    """
+    def __init__(self):
+        self._student_index = {}   # student_id -> student number
+        self._course_index = {}    # course_id -> course number
+        self._rows = {}            # (student number, course number) -> row
+        self.students = array('I')
+        self.courses = array('I')
+        self.codes = array('b')
+        self._course_graded = array('I')
+        self._course_scores = array('d')
+        self._histogram = array('I')   # len(GRADE_LETTERS) counters per course
+        self._student_graded = array('I')
+        self._student_points = array('d')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_courses(cls, courses):
+        book = cls()
+        for course in courses:
+            for student in course.enrolled_students:
+                book.enroll(student.user_id, course.course_id, student.grades.get(course.course_id))
+        return book
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _student(self, student_id):
+        s = self._student_index.get(student_id)
+        if s is None:
+            s = self._student_index[student_id] = len(self._student_graded)
+            self._student_graded.append(0)
+            self._student_points.append(0.0)
+        return s
+
+    def _course(self, course_id):
+        c = self._course_index.get(course_id)
+        if c is None:
+            c = self._course_index[course_id] = len(self._course_graded)
+            self._course_graded.append(0)
+            self._course_scores.append(0.0)
+            self._histogram.extend([0] * len(GRADE_LETTERS))
+        return c
+
+    def _row(self, student_id, course_id):
+        s = self._student_index.get(student_id)
+        c = self._course_index.get(course_id)
+        if s is None or c is None:
+            return None
+        return self._rows.get((s, c))
+
+    def _tally(self, row, sign):
+        code = self.codes[row]
+        if code == UNGRADED:
+            return
+        s, c = self.students[row], self.courses[row]
+        self._course_graded[c] += sign
+        self._course_scores[c] += sign * GRADE_SCORES[code]
+        self._histogram[c * len(GRADE_LETTERS) + code] += sign
+        self._student_graded[s] += sign
+        self._student_points[s] += sign * GPA_POINTS[code]
+
+    def enroll(self, student_id, course_id, grade=None):
+        with self._lock:
+            key = (self._student(student_id), self._course(course_id))
+            if key in self._rows:
+                return False
+            row = self._rows[key] = len(self.codes)
+            self.students.append(key[0])
+            self.courses.append(key[1])
+            self.codes.append(grade_code(grade))
+            self._tally(row, 1)
+            return True
+
+    def drop(self, student_id, course_id):
+        with self._lock:
+            row = self._row(student_id, course_id)
+            if row is None:
+                return False
+            self._tally(row, -1)
+            del self._rows[(self.students[row], self.courses[row])]
+            last = len(self.codes) - 1
+            if row != last:
+                # Move the last row into the gap so the columns stay dense
+                self.students[row] = self.students[last]
+                self.courses[row] = self.courses[last]
+                self.codes[row] = self.codes[last]
+                self._rows[(self.students[row], self.courses[row])] = row
+            self.students.pop()
+            self.courses.pop()
+            self.codes.pop()
+            return True
+
+    def set_grade(self, student_id, course_id, grade):
+        with self._lock:
+            row = self._row(student_id, course_id)
+            if row is None:
+                return False
+            self._tally(row, -1)
+            self.codes[row] = grade_code(grade)
+            self._tally(row, 1)
+            return True
+
+    def course_stats(self, course_id):
+        """{'graded', 'average' (dashboard score or None), 'distribution' {letter: count}}"""
+        c = self._course_index.get(course_id)
+        if c is None:
+            return {'graded': 0, 'average': None, 'distribution': dict.fromkeys(GRADE_LETTERS, 0)}
+        with self._lock:
+            graded = self._course_graded[c]
+            start = c * len(GRADE_LETTERS)
+            return {
+                'graded': graded,
+                'average': self._course_scores[c] / graded if graded else None,
+                'distribution': dict(zip(GRADE_LETTERS, self._histogram[start:start + len(GRADE_LETTERS)])),
+            }
+
+    def student_gpa(self, student_id):
+        s = self._student_index.get(student_id)
+        if s is None:
+            return None
+        with self._lock:
+            graded = self._student_graded[s]
+            return self._student_points[s] / graded if graded else None
@@ -0,0 +1,180 @@
+from bisect import bisect_left, bisect_right
+
+def parse_time_slot(time_slot):
+    """Parse 'HH:MM-HH:MM' into (start, end) minutes since midnight"""
+    try:
+        start, end = time_slot.split('-')
+        start_h, start_m = start.strip().split(':')
+        end_h, end_m = end.strip().split(':')
+        start = int(start_h) * 60 + int(start_m)
+        end = int(end_h) * 60 + int(end_m)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time slot '{time_slot}'. Use HH:MM-HH:MM")
+    if not 0 <= start < end <= 24 * 60:
+        raise ValueError(f"Invalid time slot '{time_slot}'. Start must be before end")
+    return start, end
+
+def parse_time(value):
+    """Parse 'HH:MM' into minutes since midnight"""
+    try:
+        hours, minutes = value.split(':')
+        minutes = int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time '{value}'. Use HH:MM")
+    if not 0 <= minutes < 24 * 60:
+        raise ValueError(f"Invalid time '{value}'. Use HH:MM")
+    return minutes
+
+def format_time_slot(start, end):
+    """Minutes since midnight back to 'HH:MM-HH:MM'"""
+    if not 0 <= start < end <= 24 * 60:
+        raise ValueError("Time slot must start before it ends and end by midnight")
+    return f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+
+def slots_overlap(slot, other):
+    """Whether two time slots overlap; free-form slots that don't parse only clash with themselves"""
+    if slot == other:
+        return True
+    try:
+        start, end = parse_time_slot(slot)
+        other_start, other_end = parse_time_slot(other)
+    except ValueError:
+        return False
+    return start < other_end and other_start < end
+
+def merge_intervals(intervals):
+    """Sorted union of (start, end) intervals; older bookings may overlap, and the union clashes the same"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+class IntervalIndex:
+    """Sorted intervals per key (e.g. (date, room)); overlap checks are O(log n) plus the intervals
+    starting within one longest-interval length of the query, so overlapping legacy rows are still caught"""
+    def __init__(self):
+        self._starts = {}   # key -> sorted interval starts
+        self._ends = {}     # key -> ends, parallel to starts
+        self._items = {}    # key -> items, parallel to starts
+        self._longest = {}  # key -> longest interval added; nothing overlapping can start earlier than that
+
+    def conflict(self, key, start, end, ignore=None):
+        """Return the item overlapping [start, end) under key, or None"""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        # Anything overlapping starts before `end` and no more than the longest interval before `start`
+        first = bisect_right(starts, start - self._longest[key])
+        ends, items = self._ends[key], self._items[key]
+        for i in range(bisect_left(starts, end) - 1, first - 1, -1):
+            if ends[i] > start and items[i] is not ignore:
+                return items[i]
+        return None
+
+    def add(self, key, start, end, item):
+        starts = self._starts.setdefault(key, [])
+        i = bisect_right(starts, start)
+        starts.insert(i, start)
+        self._ends.setdefault(key, []).insert(i, end)
+        self._items.setdefault(key, []).insert(i, item)
+        if end - start > self._longest.get(key, 0):
+            self._longest[key] = end - start
+
+    def clear(self, key):
+        self._starts.pop(key, None)
+        self._ends.pop(key, None)
+        self._items.pop(key, None)
+        self._longest.pop(key, None)
+
+    def remove(self, key, start, item):
+        starts = self._starts.get(key, [])
+        items = self._items.get(key, [])
+        i = bisect_left(starts, start)
+        while i < len(starts) and starts[i] == start:
+            if items[i] is item:
+                del starts[i]
+                del self._ends[key][i]
+                del items[i]
+                return True
+            i += 1
+        return False
+
+class BookedSlots:
+    """One room's bookings parsed per date, so overlap checks are O(log n) instead of re-parsing the day.
+
+    A date is loaded from the room's slot list on first check; free-form slots that don't parse
+    only clash with the same string, as in slots_overlap.
+    """
+    def __init__(self):
+        self._intervals = IntervalIndex()   # date -> merged booked intervals
+        self._free_form = {}                # date -> free-form slots; a date is here once loaded
+
+    def _load(self, date, slots):
+        parsed = []
+        free_form = set()
+        for slot in slots:
+            try:
+                parsed.append(parse_time_slot(slot))
+            except ValueError:
+                free_form.add(slot)
+        for start, end in merge_intervals(parsed):
+            self._intervals.add(date, start, end, date)
+        self._free_form[date] = free_form
+
+    def overlaps(self, date, slots, time_slot):
+        """Whether time_slot overlaps any of slots, the room's bookings on date"""
+        if date not in self._free_form:
+            self._load(date, slots)
+        try:
+            start, end = parse_time_slot(time_slot)
+        except ValueError:
+            return time_slot in self._free_form[date]
+        return self._intervals.conflict(date, start, end) is not None
+
+    def add(self, date, time_slot):
+        """Record a booking already checked not to overlap; dates not loaded yet pick it up on load"""
+        if date not in self._free_form:
+            return
+        try:
+            start, end = parse_time_slot(time_slot)
+        except ValueError:
+            self._free_form[date].add(time_slot)
+            return
+        self._intervals.add(date, start, end, date)
+
+    def forget(self, date):
+        """Drop a date after a booking was removed from it; it is reloaded on the next check"""
+        self._free_form.pop(date, None)
+        self._intervals.clear(date)
+
+class ScheduleIndex:
+    """Per-date room and professor interval indexes over University.schedules"""
+    def __init__(self, schedules=()):
+        self.rooms = IntervalIndex()
+        self.professors = IntervalIndex()
+        for schedule in schedules:
+            try:
+                self.add(schedule)
+            except ValueError:
+                pass  # Legacy rows with free-form time slots can't clash-check
+
+    def conflict(self, date, time_slot, classroom, professor, ignore=None):
+        start, end = parse_time_slot(time_slot)
+        return (self.rooms.conflict((date, classroom.classroom_id), start, end, ignore) or
+                self.professors.conflict((date, professor.user_id), start, end, ignore))
+
+    def add(self, schedule):
+        start, end = parse_time_slot(schedule.time_slot)
+        self.rooms.add((schedule.date, schedule.classroom.classroom_id), start, end, schedule)
+        self.professors.add((schedule.date, schedule.professor.user_id), start, end, schedule)
+
+    def remove(self, schedule):
+        try:
+            start, _ = parse_time_slot(schedule.time_slot)
+        except ValueError:
+            return
+        self.rooms.remove((schedule.date, schedule.classroom.classroom_id), start, schedule)
+        self.professors.remove((schedule.date, schedule.professor.user_id), start, schedule)
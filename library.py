@@ -1,8 +1,31 @@
+import time
 from flask import Blueprint, request, jsonify
 from models import University, Library
+from data_manager import journal
+from locking import entity_locks
+from bulk_rows import MAX_REPORTED_REJECTS, NDJSON_MIMETYPES, read_rows
+from circulation import week_of_date
+
+try:
+    import resource
+except ImportError:   # Not on Windows; imports then report no memory high-water mark
+    resource = None
 
 library_bp = Blueprint('library', __name__)
 
+def _book_json(library, book_id):
+    book = library.books[book_id]
+    return {
+        "id": book_id,
+        "title": book['title'],
+        "author": book['author'],
+        "available": book['available'],
+        "borrowed_by": book['borrowed_by'],
+        "copies": book['copies'],
+        "copies_available": len(book['on_shelf']),
+        "holds": len(library.holds.get(book_id, ()))
+    }
+
 @library_bp.route('/add-book', methods=['POST'])
 def add_book():
     try:
@@ -13,6 +36,10 @@ def add_book():
 
         if not all([book_id, title, author]):
             return jsonify({"error": "Missing required fields"}), 400
+        try:
+            copies = int(data.get('copies', 1))
+        except (TypeError, ValueError):
+            return jsonify({"error": "copies must be a number"}), 400
 
         university = University.get_instance()
         if not hasattr(university, 'library'):
@@ -22,18 +49,15 @@ def add_book():
 
         # Add the book
         try:
-            success = library.add_book(book_id, title, author)
+            with entity_locks.hold(('book', book_id)):
+                success = library.add_book(book_id, title, author, copies)
+                if success:
+                    journal.record('add_book', book_id, title, author, copies)
             
             if success:
                 return jsonify({
                     "message": f"Book '{title}' added successfully",
-                    "book": {
-                        "id": book_id,
-                        "title": title,
-                        "author": author,
-                        "available": True,
-                        "borrowed_by": None
-                    }
+                    "book": _book_json(library, book_id)
                 }), 201
             else:
                 return jsonify({"error": f"Book with ID {book_id} already exists"}), 400
@@ -56,20 +80,29 @@ def borrow_book():
         university = University.get_instance()
         library = university.library
 
-        # Borrow the book
-        success = library.borrow_book(student_id, book_id)
+        # Borrow a copy, or join the hold queue when none is on the shelf ("hold": false opts out)
+        now = time.time()
+        with entity_locks.hold(('student', student_id), ('book', book_id)):
+            book = library.books.get(book_id)
+            if (book is not None and not book['on_shelf'] and data.get('hold', True)
+                    and (student_id, book_id) not in library.loans):
+                position = library.place_hold(student_id, book_id)
+                journal.record('hold', student_id, book_id)
+                return jsonify({
+                    "message": f"No copy of '{book['title']}' is available; hold placed",
+                    "position": position,
+                    "book": _book_json(library, book_id)
+                }), 202
+            success = library.borrow_book(student_id, book_id, now)
+            if success:
+                journal.record('borrow', student_id, book_id, now)
         
         if success:
             book = library.books[book_id]
             return jsonify({
                 "message": f"Book '{book['title']}' borrowed successfully",
-                "book": {
-                    "id": book_id,
-                    "title": book['title'],
-                    "author": book['author'],
-                    "available": False,
-                    "borrowed_by": student_id
-                }
+                "book": dict(_book_json(library, book_id), borrowed_by=student_id),
+                "due": library.loans[(student_id, book_id)].due
             }), 200
         else:
             return jsonify({"error": "Failed to borrow book"}), 400
@@ -90,21 +123,22 @@ def return_book():
         university = University.get_instance()
         library = university.library
 
-        # Return the book
+        # Return the book; the copy goes straight to the first student holding the title, if any
         try:
-            success = library.return_book(student_id, book_id)
+            now = time.time()
+            with entity_locks.hold(('student', student_id), ('book', book_id)):
+                waiting = library.holds.get(book_id)
+                next_in_line = waiting[0] if waiting else None
+                success = library.return_book(student_id, book_id, now)
+                if success:
+                    journal.record('return', student_id, book_id, now)
+                    book_json = _book_json(library, book_id)
             
             if success:
-                book = library.books[book_id]
                 return jsonify({
-                    "message": f"Book '{book['title']}' returned successfully",
-                    "book": {
-                        "id": book_id,
-                        "title": book['title'],
-                        "author": book['author'],
-                        "available": True,
-                        "borrowed_by": None
-                    }
+                    "message": f"Book '{book_json['title']}' returned successfully",
+                    "book": book_json,
+                    "assigned_to": next_in_line
                 }), 200
             else:
                 return jsonify({"error": "Failed to return book"}), 400
@@ -123,14 +157,9 @@ def get_book(book_id):
         if book_id not in library.books:
             return jsonify({"error": "Book not found"}), 404
             
-        book = library.books[book_id]
-        return jsonify({
-            "id": book_id,
-            "title": book['title'],
-            "author": book['author'],
-            "available": book['available'],
-            "borrowed_by": book['borrowed_by']
-        }), 200
+        # Every copy that is out, from the book -> loans index
+        borrowers = [loan.student_id for loan in library.get_loan_index().borrowers(book_id)]
+        return jsonify(dict(_book_json(library, book_id), borrowers=borrowers)), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -143,14 +172,350 @@ def get_student(student_id):
         
         if not student:
             return jsonify({"error": "Student not found"}), 404
-            
+
+        library = getattr(university, 'library', None)
         return jsonify({
             "id": student.user_id,
             "name": student.name,
             "email": student.email,
             "major": student.major,
-            "libraryRegistered": student.libraryRegistered
+            "libraryRegistered": student.libraryRegistered,
+            "active_loans": library.get_loan_index().count(student_id) if library else 0
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+BOOK_BATCH_SIZE = 5_000   # Rows per add_books call and journal record
+MARC_FIELDS = {"001": "bookId", "245": "title", "100": "author"}   # MARC tags accepted in JSON lines
+
+def _marc_value(value):
+    # MARC-in-JSON fields may be {"a": "Dune", ...} subfield maps; $a holds the main value
+    return value.get("a") if isinstance(value, dict) else value
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)   # KiB on Linux
+
+def import_books(library, rows, batch_size=BOOK_BATCH_SIZE):
+    """Validate catalog rows and add them to the library in batches, then build the indexes once.
+
+    Rows are {bookId, title, author, copies} (or MARC tags 001/245/100); the first row for
+    an ID wins and later ones, or IDs already in the library, count as duplicates. Returns a summary.
+    """
+    summary = {"rows": 0, "added": 0, "duplicates": 0, "rejected": 0, "rejected_rows": []}
+
+    def reject(number, book_id, error):
+        summary["rejected"] += 1
+        if len(summary["rejected_rows"]) < MAX_REPORTED_REJECTS:
+            summary["rejected_rows"].append({"row": number, "bookId": book_id, "error": error})
+
+    def flush(batch):
+        added = library.add_books(batch)
+        if added:
+            journal.record('add_books', added)
+        summary["added"] += len(added)
+        summary["duplicates"] += len(batch) - len(added)
+
+    books = library.books
+    batch = []
+    batch_ids = set()
+    for number, row in enumerate(rows, start=1):
+        summary["rows"] += 1
+        if row is None:
+            reject(number, None, "Malformed row")
+            continue
+        for tag, field in MARC_FIELDS.items():
+            if tag in row and field not in row:
+                row[field] = _marc_value(row[tag])
+        book_id = row.get("bookId")
+        title = row.get("title")
+        author = row.get("author")
+        if not all([book_id, title, author]):
+            reject(number, book_id, "Missing required fields")
+            continue
+        if isinstance(book_id, int) and not isinstance(book_id, bool):
+            book_id = str(book_id)   # JSON rows may carry numeric IDs; routes and CSV rows use strings
+        if not isinstance(book_id, str):
+            reject(number, None, "bookId must be text or a number")
+            continue
+        if not isinstance(title, str) or not isinstance(author, str):
+            reject(number, book_id, "title and author must be text")
+            continue
+        try:
+            copies = int(row.get("copies") or 1)
+        except (TypeError, ValueError):
+            reject(number, book_id, "copies must be a number")
+            continue
+        if copies < 1:
+            reject(number, book_id, "Number of copies must be positive")
+            continue
+        if book_id in books or book_id in batch_ids:
+            summary["duplicates"] += 1
+            continue
+        batch.append((book_id, title, author, copies))
+        batch_ids.add(book_id)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+            batch_ids.clear()
+    if batch:
+        flush(batch)
+
+    start = time.perf_counter()
+    library.get_catalog()
+    library.get_availability()
+    summary["index_seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+def _page_limit(default=20, maximum=200):
+    return min(max(int(request.args.get('limit', default)), 1), maximum)
+
+@library_bp.route('/search', methods=['GET'])
+def search_books():
+    """Ranked title/author search: ?q=dune herb&page=1&limit=20; words match by prefix"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Missing search query"}), 400
+        try:
+            limit = _page_limit()
+            page = max(int(request.args.get('page', 1)), 1)
+        except ValueError:
+            return jsonify({"error": "page and limit must be numbers"}), 400
+
+        library = University.get_instance().library
+        books = library.books
+        total, hits = library.get_catalog().search(
+            query, offset=(page - 1) * limit, limit=limit,
+            key=lambda book_id: (books[book_id]['title'].lower(), str(book_id)))
+        return jsonify({
+            "query": query,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "results": [dict(_book_json(library, book_id), score=score) for book_id, score in hits]
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/available', methods=['GET'])
+def available_books():
+    """Books on the shelf in ID order, a page at a time: ?after=<next cursor>&limit=50"""
+    try:
+        try:
+            limit = _page_limit(default=50, maximum=500)
+        except ValueError:
+            return jsonify({"error": "limit must be a number"}), 400
+
+        library = University.get_instance().library
+        availability = library.get_availability()
+        book_ids, cursor = availability.page(request.args.get('after'), limit)
+        return jsonify({
+            "total": len(availability),
+            "books": [_book_json(library, book_id) for book_id in book_ids],
+            "next": cursor
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/books/<book_id>/copies', methods=['POST'])
+def add_copies(book_id):
+    try:
+        data = request.get_json() or {}
+        try:
+            count = int(data.get('count', 1))
+        except (TypeError, ValueError):
+            return jsonify({"error": "count must be a number"}), 400
+
+        library = University.get_instance().library
+        if book_id not in library.books:
+            return jsonify({"error": "Book not found"}), 404
+        now = time.time()
+        try:
+            with entity_locks.hold(('book', book_id)):
+                library.add_copies(book_id, count, now)
+                journal.record('add_copies', book_id, count, now)
+                return jsonify({"message": f"Added {count} copies", "book": _book_json(library, book_id)}), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/holds/<book_id>', methods=['GET'])
+def get_holds(book_id):
+    try:
+        library = University.get_instance().library
+        if book_id not in library.books:
+            return jsonify({"error": "Book not found"}), 404
+        return jsonify({"book_id": book_id, "queue": list(library.holds.get(book_id, ()))}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/holds/cancel', methods=['POST'])
+def cancel_hold():
+    try:
+        data = request.get_json() or {}
+        student_id = data.get('studentId')
+        book_id = data.get('bookId')
+        if not all([student_id, book_id]):
+            return jsonify({"error": "Missing required fields"}), 400
+
+        library = University.get_instance().library
+        try:
+            with entity_locks.hold(('student', student_id), ('book', book_id)):
+                library.cancel_hold(student_id, book_id)
+                journal.record('cancel_hold', student_id, book_id)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"message": "Hold cancelled"}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/overdue', methods=['GET'])
+def overdue_loans():
+    """Loans past their due date, oldest first: ?limit=100"""
+    try:
+        try:
+            limit = _page_limit(default=100, maximum=1000)
+        except ValueError:
+            return jsonify({"error": "limit must be a number"}), 400
+        library = University.get_instance().library
+        loans = library.overdue(limit=limit)
+        return jsonify({
+            "count": len(loans),
+            "loans": [{"student_id": student_id, "book_id": book_id, "due": due} for student_id, book_id, due in loans]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/import', methods=['POST'])
+def bulk_import_books():
+    """Stream a CSV (text/csv) or JSON lines body of books: bookId,title,author[,copies]"""
+    try:
+        if request.mimetype != 'text/csv' and request.mimetype not in NDJSON_MIMETYPES:
+            return jsonify({"error": "Expected a CSV or NDJSON body"}), 400
+
+        university = University.get_instance()
+        if not hasattr(university, 'library'):
+            university.library = Library("LIB-01")
+
+        start = time.perf_counter()
+        summary = import_books(university.library, read_rows(request.stream, request.mimetype))
+        elapsed = time.perf_counter() - start
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_second"] = round(summary["rows"] / elapsed) if elapsed else None
+        summary["peak_rss_mb"] = _peak_rss_mb()
+        summary["message"] = f"Added {summary['added']} of {summary['rows']} books"
+        return jsonify(summary), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _week_range():
+    # ?from=2025-01-01&to=2025-06-30, either optional; raises ValueError on a bad date
+    first, last = request.args.get('from'), request.args.get('to')
+    return (week_of_date(first) if first else None), (week_of_date(last) if last else None)
+
+@library_bp.route('/stats', methods=['GET'])
+def circulation_stats():
+    try:
+        library = University.get_instance().library
+        summary = library.history.summary()
+        seconds = summary.pop('average_loan_seconds')
+        summary['average_loan_days'] = round(seconds / 86400, 2) if seconds is not None else None
+        summary['active_loans'] = len(library.loans)
+        return jsonify(summary), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/stats/titles/<book_id>', methods=['GET'])
+def title_stats(book_id):
+    """Loans of one title per week (weeks start on Monday): ?from=2025-01-01&to=2025-06-30"""
+    try:
+        library = University.get_instance().library
+        if book_id not in library.books:
+            return jsonify({"error": "Book not found"}), 404
+        try:
+            first, last = _week_range()
+        except ValueError:
+            return jsonify({"error": "from and to must be dates like 2025-01-31"}), 400
+        weeks = library.history.title_weeks(book_id, first, last)
+        return jsonify({
+            "book_id": book_id,
+            "title": library.books[book_id]['title'],
+            "total": sum(loans for _, loans in weeks),
+            "weeks": [{"week": week, "loans": loans} for week, loans in weeks]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/stats/top-borrowers', methods=['GET'])
+def top_borrowers():
+    try:
+        try:
+            limit = _page_limit(default=10, maximum=100)
+        except ValueError:
+            return jsonify({"error": "limit must be a number"}), 400
+        library = University.get_instance().library
+        return jsonify({
+            "borrowers": [{"student_id": student_id, "loans": loans}
+                          for student_id, loans in library.history.top_borrowers(limit)]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/stats/loan-durations', methods=['GET'])
+def loan_durations():
+    """Average loan length per week of return: ?from=2025-01-01&to=2025-06-30"""
+    try:
+        try:
+            first, last = _week_range()
+        except ValueError:
+            return jsonify({"error": "from and to must be dates like 2025-01-31"}), 400
+        library = University.get_instance().library
+        weeks = library.history.loan_durations(first, last)
+        return jsonify({
+            "weeks": [{"week": week, "returns": returns, "average_days": round(seconds / 86400, 2)}
+                      for week, returns, seconds in weeks]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@library_bp.route('/students/<student_id>/loans', methods=['GET'])
+def get_student_loans(student_id):
+    """A student's active loans, oldest first: ?page=1&limit=20"""
+    try:
+        try:
+            limit = _page_limit()
+            page = max(int(request.args.get('page', 1)), 1)
+        except ValueError:
+            return jsonify({"error": "page and limit must be numbers"}), 400
+
+        university = University.get_instance()
+        if not university.get_student(student_id):
+            return jsonify({"error": "Student not found"}), 404
+        library = getattr(university, 'library', None)
+        total, loans = library.get_loan_index().student_loans(student_id, (page - 1) * limit, limit) if library else (0, [])
+        now = time.time()
+        return jsonify({
+            "student_id": student_id,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "loans": [{
+                "book_id": loan.book_id,
+                "title": library.books[loan.book_id]['title'],
+                "copy": loan.copy,
+                "borrowed_at": loan.borrowed_at,
+                "due": loan.due,
+                "overdue": loan.due is not None and loan.due <= now
+            } for loan in loans]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
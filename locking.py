@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+
+class EntityLocks:
+    """Per-entity locks keyed by (kind, id), e.g. ('student', 'S1') or ('book', 'B7')"""
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, threading.RLock())
+        return lock
+
+    @contextmanager
+    def hold(self, *keys):
+        """Hold every given entity lock; keys are taken in one global order so callers can't deadlock"""
+        ordered = sorted(set(keys), key=repr)  # IDs may mix str and int
+        locks = [self._lock_for(key) for key in ordered]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+class SharedExclusiveLock:
+    """Many shared holders or one exclusive holder; a waiting exclusive holder blocks new shared ones"""
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        # Not reentrant: a thread already holding the lock must not take it again
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                if not self._shared:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._cond.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+entity_locks = EntityLocks()
+# Mutations hold it shared from changing the model until their journal record is written;
+# compaction holds it exclusive, so a snapshot never contains a change its truncated journal still lacks
+mutations = SharedExclusiveLock()
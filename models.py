@@ -1,5 +1,15 @@
+import sys
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import MutableSet
 from multipledispatch import dispatch
+from threading import Lock
+from locking import entity_locks
+from intervals import BookedSlots, ScheduleIndex, format_time_slot, parse_time
+from gradebook import ExamStats, Gradebook
+from catalog import AvailabilityIndex, CatalogIndex, DueDates, LoanIndex
+from circulation import LoanLog
 
 class GradeUpdateProxy:
     """Protected Proxy: Controls grade update access"""
@@ -14,7 +24,99 @@ class GradeUpdateProxy:
             return False
         return self.real_student.update_grade(course_name, grade)
 
+def _intern(value):
+    """Share one copy of repeated ID and label strings across all records"""
+    return sys.intern(value) if type(value) is str else value
+
+def _gradebook():
+    """The shared University's gradebook if it has been built, else None.
+
+    Callers change enrollments or grades under University._index_lock, which get_gradebook holds
+    while building, so a build either sees the change or runs after it and is updated here.
+    """
+    university = University._instance
+    return university.__dict__.get('_gradebook') if university is not None else None
+
+class OrderedSet(MutableSet):
+    """Insertion-ordered set for enrollments: O(1) membership, add and discard.
+
+    Also answers the list calls older code makes (append, remove, == against a list).
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        self._items = dict.fromkeys(items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item):
+        self._items[item] = None
+
+    append = add
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def remove(self, item):
+        if item not in self._items:
+            raise ValueError(f"{item!r} is not in the set")
+        del self._items[item]
+
+    def replace(self, old, new):
+        """Swap old for new in place, keeping its position"""
+        if old in self._items and new not in self._items:
+            self._items = {new if item == old else item: None for item in self._items}
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple)):
+            return list(self._items) == list(other)
+        return MutableSet.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"OrderedSet({list(self._items)!r})"
+
+    def __reduce__(self):
+        return (OrderedSet, (list(self._items),))
+
+def _link(student, course):
+    """Enroll on both sides: the course_id into student.courses_enrolled, the student into the course"""
+    with University._index_lock:
+        student.courses_enrolled.add(course.course_id)
+        student.grades.setdefault(course.course_id, None)
+        course.enrolled_students.add(student)
+        gradebook = _gradebook()
+        if gradebook is not None:
+            gradebook.enroll(student.user_id, course.course_id, student.grades[course.course_id])
+
+def _unlink(student, course_id, course=None):
+    with University._index_lock:
+        student.courses_enrolled.discard(course_id)
+        if course is not None:
+            student.courses_enrolled.discard(course.name)  # Older records enrolled by course name
+            course.enrolled_students.discard(student)
+        gradebook = _gradebook()
+        if gradebook is not None:
+            gradebook.drop(student.user_id, course_id)
+
+def _restore_slots(obj, state):
+    """Pickle state for slotted models: (None, slots) now, a plain __dict__ in older snapshots"""
+    if isinstance(state, tuple):
+        state = {**(state[0] or {}), **state[1]}
+    for name, value in state.items():
+        setattr(obj, name, value)
+
 class User(ABC):
+    __slots__ = ('user_id', 'name', 'role', 'email', 'logged_in')
+
     def __init__(self, user_id, name, role, email):
         try:
             if not isinstance(user_id, (int, str)) or not user_id:
@@ -26,7 +128,7 @@ class User(ABC):
             if not email or "@" not in email:
                 raise ValueError("Invalid email format")
                 
-            self.user_id = user_id
+            self.user_id = _intern(user_id)
             self.name = name
             self.role = role
             self.email = email
@@ -64,15 +166,29 @@ class User(ABC):
     def view_dashboard(self):
         pass
 
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+        self.user_id = _intern(self.user_id)
+
 class Student(User):
+    __slots__ = ('major', 'courses_enrolled', 'grades', 'libraryRegistered', 'borrowed_books')
+
     def __init__(self, student_id, name, email, major):
         super().__init__(student_id, name, "student", email)
-        self.major = major
-        self.courses_enrolled = []
+        self.major = _intern(major)
+        self.courses_enrolled = OrderedSet()
         self.grades = {}
         self.libraryRegistered = False
         self.borrowed_books = []
 
+    def __setstate__(self, state):
+        # Older snapshots have students saved before library fields existed, with list enrollments
+        self.libraryRegistered = False
+        self.borrowed_books = []
+        super().__setstate__(state)
+        if not isinstance(self.courses_enrolled, OrderedSet):
+            self.courses_enrolled = OrderedSet(self.courses_enrolled)
+
     def is_enrolled_in_course(self, course_id):
         return course_id in self.courses_enrolled
 
@@ -104,20 +220,22 @@ class Student(User):
         if not isinstance(course, Course):
             raise ValueError("Must provide a Course object")
         
-        if course.course_id not in self.courses_enrolled:
-            self.courses_enrolled.append(course.course_id)
-            self.grades[course.course_id] = None  # Initialize grade
-            course.enrolled_students.append(self)
-            return f"Enrolled in {course.course_id}"
-        return f"Already enrolled in {course.course_id}"
+        with entity_locks.hold(('student', self.user_id), ('course', course.course_id)):
+            if course.course_id not in self.courses_enrolled:
+                self.grades[course.course_id] = None  # Initialize grade
+                _link(self, course)
+                return f"Enrolled in {course.course_id}"
+            return f"Already enrolled in {course.course_id}"
     
     def drop_course(self, course_name):
-        if course_name in self.courses_enrolled:
-            self.courses_enrolled.remove(course_name)
-            del self.grades[course_name]
-            print(f"Successfully dropped {course_name}")
-            return f"Successfully dropped {course_name}"
-        return f"Not enrolled in {course_name}"
+        with entity_locks.hold(('student', self.user_id), ('course', course_name)):
+            if course_name in self.courses_enrolled:
+                self.grades.pop(course_name, None)
+                university = University._instance
+                _unlink(self, course_name, university.get_course(course_name) if university is not None else None)
+                print(f"Successfully dropped {course_name}")
+                return f"Successfully dropped {course_name}"
+            return f"Not enrolled in {course_name}"
 
     def view_grades(self):
         if not self.grades:
@@ -129,10 +247,15 @@ class Student(User):
             return result
 
     def update_grade(self, course_name, grade):
-        if course_name in self.courses_enrolled:
-            self.grades[course_name] = grade
-            return f"Grade updated to {grade} for {course_name}"
-        return f"Cannot update grade - not enrolled in {course_name}"
+        with entity_locks.hold(('student', self.user_id)):
+            if course_name in self.courses_enrolled:
+                with University._index_lock:
+                    self.grades[course_name] = grade
+                    gradebook = _gradebook()
+                    if gradebook is not None:
+                        gradebook.set_grade(self.user_id, course_name, grade)
+                return f"Grade updated to {grade} for {course_name}"
+            return f"Cannot update grade - not enrolled in {course_name}"
 
     def get_info(self):
         self.view_dashboard()
@@ -146,11 +269,13 @@ class Student(User):
             'name': self.name,
             'email': self.email,
             'major': self.major,
-            'courses_enrolled': self.courses_enrolled,
+            'courses_enrolled': list(self.courses_enrolled),
             'grades': self.grades
         }
 
 class Professor(User):
+    __slots__ = ('department', 'courses_taught', 'students')
+
     def __init__(self, professor_id, name, email, department):
         super().__init__(professor_id, name, "professor", email)
         self.department = department
@@ -212,31 +337,33 @@ class Professor(User):
         }
 
 class Course:
+    __slots__ = ('course_id', 'name', 'department', 'credits', 'enrolled_students', 'professor', 'exams')
+
     def __init__(self, course_id, name, department, credits):
-        self.course_id = course_id
+        self.course_id = _intern(course_id)
         self.name = name
-        self.department = department
+        self.department = _intern(department)
         self.credits = credits
-        self.enrolled_students = []
+        self.enrolled_students = OrderedSet()
         self.professor = None
 
     def add_student(self, student):
-        if student in self.enrolled_students:
-            print(f"{student.name} is already enrolled in {self.name}")
-            return
-        self.enrolled_students.append(student)
-        if self.name not in student.courses_enrolled:
-            student.courses_enrolled.append(self.name)
-        print(f"Added {student.name} to {self.name}")
+        with entity_locks.hold(('student', student.user_id), ('course', self.course_id)):
+            if student in self.enrolled_students:
+                print(f"{student.name} is already enrolled in {self.name}")
+                return False
+            _link(student, self)
+            print(f"Added {student.name} to {self.name}")
+            return True
 
     def remove_student(self, student):
-        if student not in self.enrolled_students:
-            print(f"{student.name} is not enrolled in {self.name}")
-            return
-        self.enrolled_students.remove(student)
-        if self.name in student.courses_enrolled:
-            student.courses_enrolled.remove(self.name)
-        print(f"Removed {student.name} from {self.name}")
+        with entity_locks.hold(('student', student.user_id), ('course', self.course_id)):
+            if student not in self.enrolled_students:
+                print(f"{student.name} is not enrolled in {self.name}")
+                return False
+            _unlink(student, self.course_id, self)
+            print(f"Removed {student.name} from {self.name}")
+            return True
 
     def to_dict(self):
         return {
@@ -246,6 +373,12 @@ class Course:
             'credits': self.credits,
         }
 
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+        self.course_id = _intern(self.course_id)
+        if not isinstance(self.enrolled_students, OrderedSet):
+            self.enrolled_students = OrderedSet(self.enrolled_students)
+
     def get_course_info(self):
         professor_name = self.professor.name if self.professor else "Not assigned"
         student_names = [s.name for s in self.enrolled_students]
@@ -335,6 +468,8 @@ class Department:
             print(f"Professor {professor.name} already in department")
 
 class Administrator(User):
+    __slots__ = ('admin_id', 'contact_info', 'privileges')
+
     def __init__(self, admin_id, name, email, contact_phone=None):
         super().__init__(admin_id, name, "admin", email)
         self.admin_id = admin_id
@@ -370,12 +505,11 @@ class Administrator(User):
             print("Please login first")
             return False
             
-        if student in course.enrolled_students:
-            print(f"{student.name} already enrolled in {course.name}")
-            return False
-            
-        course.enrolled_students.append(student)
-        student.courses_enrolled.append(course.name)
+        with entity_locks.hold(('student', student.user_id), ('course', course.course_id)):
+            if student in course.enrolled_students:
+                print(f"{student.name} already enrolled in {course.name}")
+                return False
+            _link(student, course)
         print(f"Added {student.name} to {course.name}")
         return True
 
@@ -390,13 +524,11 @@ class Administrator(User):
             print("Please login first")
             return False
             
-        if student not in course.enrolled_students:
-            print(f"{student.name} not enrolled in {course.name}")
-            return False
-            
-        course.enrolled_students.remove(student)
-        if course.name in student.courses_enrolled:
-            student.courses_enrolled.remove(course.name)
+        with entity_locks.hold(('student', student.user_id), ('course', course.course_id)):
+            if student not in course.enrolled_students:
+                print(f"{student.name} not enrolled in {course.name}")
+                return False
+            _unlink(student, course.course_id, course)
         print(f"Removed {student.name} from {course.name}")
         return True
 
@@ -442,9 +574,10 @@ class Administrator(User):
             
         if new_name and new_name != course.name:
             old_name = course.name
-            for student in course.enrolled_students:
-                if course.name in student.courses_enrolled:
-                    student.courses_enrolled[student.courses_enrolled.index(course.name)] = new_name
+            # Enrollments are keyed by course_id; only older name-keyed entries need renaming
+            if old_name != course.course_id:
+                for student in course.enrolled_students:
+                    student.courses_enrolled.replace(old_name, new_name)
             
             if course.professor and course.name in course.professor.courses_taught:
                 course.professor.courses_taught[course.professor.courses_taught.index(course.name)] = new_name
@@ -522,23 +655,36 @@ class Administrator(User):
         return name_changed or credits_changed or dept_changed
 
 class Classroom:
+    __slots__ = ('classroom_id', 'location', 'capacity', 'schedule', '_booked')
+
     def __init__(self, classroom_id, location, capacity):
-        self.classroom_id = classroom_id
+        self.classroom_id = _intern(classroom_id)
         self.location = location
         self.capacity = capacity
         self.schedule = {}
+        self._booked = BookedSlots()  # Parsed view of self.schedule
+
+    def __getstate__(self):
+        # _booked is derived from schedule and rebuilt per date on demand
+        return None, {name: getattr(self, name) for name in self.__slots__ if name != '_booked' and hasattr(self, name)}
+
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+        self._booked = BookedSlots()
 
     def allocate_class(self, date, time_slot):
-        if date not in self.schedule:
-            self.schedule[date] = []
+        with entity_locks.hold(('classroom', self.classroom_id)):
+            if date not in self.schedule:
+                self.schedule[date] = []
         
-        if time_slot in self.schedule[date]:
-            print(f"Time slot {time_slot} on {date} is already booked")
-            return False
+            if self.is_allocated(date, time_slot):
+                print(f"Time slot {time_slot} on {date} is already booked")
+                return False
         
-        self.schedule[date].append(time_slot)
-        print(f"Allocated {time_slot} on {date} in {self.location} (Room {self.classroom_id})")
-        return True
+            self.schedule[date].append(time_slot)
+            self._booked.add(date, time_slot)
+            print(f"Allocated {time_slot} on {date} in {self.location} (Room {self.classroom_id})")
+            return True
 
     def check_availability(self, date, time_slot=None):
         if date not in self.schedule:
@@ -547,7 +693,7 @@ class Classroom:
         if not time_slot:
             return False
         
-        return time_slot not in self.schedule[date]
+        return not self.is_allocated(date, time_slot)
 
     def get_classroom_info(self):
         booked_days = len(self.schedule)
@@ -564,18 +710,35 @@ class Classroom:
         print(info)
 
     def is_allocated(self, date, time_slot):
+        """Whether time_slot overlaps a booking on date (free-form slots only match exactly)"""
         if date not in self.schedule:
             return False
-        return time_slot in self.schedule[date]
+        with entity_locks.hold(('classroom', self.classroom_id)):   # Loading a date must not race a booking
+            return self._booked.overlaps(date, self.schedule[date], time_slot)
+
+    def release(self, date, time_slot):
+        """Remove one booking of time_slot on date, if there is one"""
+        with entity_locks.hold(('classroom', self.classroom_id)):
+            if time_slot in self.schedule.get(date, ()):
+                self.schedule[date].remove(time_slot)
+                self._booked.forget(date)
+
+    def seats(self):
+        try:
+            return int(self.capacity)
+        except (TypeError, ValueError):
+            return 0  # Free-form capacity; can't seat anyone by number
 
     def allocate(self, date, time_slot):
-        if date not in self.schedule:
-            self.schedule[date] = []
+        with entity_locks.hold(('classroom', self.classroom_id)):
+            if date not in self.schedule:
+                self.schedule[date] = []
             
-        if not self.is_allocated(date, time_slot):
-            self.schedule[date].append(time_slot)
-            return True
-        return False
+            if not self.is_allocated(date, time_slot):
+                self.schedule[date].append(time_slot)
+                self._booked.add(date, time_slot)
+                return True
+            return False
 
 class Schedule:
     def __init__(self, schedule_id, course, professor, time_slot, classroom, date):
@@ -591,54 +754,60 @@ class Schedule:
         if not hasattr(university, 'schedules'):
             university.schedules = []
 
-        # Check for conflicts
-        for schedule in university.schedules:
-            if schedule.date == self.date and schedule.time_slot == self.time_slot:
-                if (schedule.classroom == self.classroom or 
-                    schedule.professor == self.professor):
-                    return False
+        with entity_locks.hold(('classroom', self.classroom.classroom_id), ('professor', self.professor.user_id)):
+            # Check for overlapping room/professor bookings on the same date
+            index = university.get_schedule_index()
+            if index.conflict(self.date, self.time_slot, self.classroom, self.professor):
+                return False
 
-        if self.classroom.allocate(self.date, self.time_slot):
-            university.schedules.append(self)
-            return True
-        return False
+            if self.classroom.allocate(self.date, self.time_slot):
+                university.schedules.append(self)
+                index.add(self)
+                return True
+            return False
 
     def update_schedule(self, new_time_slot=None, new_location=None, new_date=None):
         university = University.get_instance()
+        target_room = new_location if new_location else self.classroom
         
-        # Store original values
-        old_time_slot = self.time_slot
-        old_classroom = self.classroom
-        old_date = self.date
-
-        # Check conflicts for new values
-        for schedule in university.schedules:
-            if schedule == self:
-                continue
-                
+        with entity_locks.hold(('classroom', self.classroom.classroom_id), ('classroom', target_room.classroom_id), ('professor', self.professor.user_id)):
+            # Store original values
+            old_time_slot = self.time_slot
+            old_classroom = self.classroom
+            old_date = self.date
+
+            # Check conflicts for new values
             check_date = new_date if new_date else self.date
             check_time = new_time_slot if new_time_slot else self.time_slot
             check_room = new_location if new_location else self.classroom
-            
-            if schedule.date == check_date and schedule.time_slot == check_time:
-                if (schedule.classroom == check_room or 
-                    schedule.professor == self.professor):
-                    return False
-
-        # Remove old allocation
-        if old_date in old_classroom.schedule:
-            if old_time_slot in old_classroom.schedule[old_date]:
-                old_classroom.schedule[old_date].remove(old_time_slot)
-
-        # Update values and allocate
-        if new_time_slot:
-            self.time_slot = new_time_slot
-        if new_location:
-            self.classroom = new_location
-        if new_date:
-            self.date = new_date
-
-        return self.classroom.allocate(self.date, self.time_slot)
+            index = university.get_schedule_index()
+            try:
+                clash = index.conflict(check_date, check_time, check_room, self.professor, ignore=self)
+            except ValueError:
+                # Legacy free-form slot: no interval to check, so compare slots as strings as before
+                clash = any(schedule is not self and schedule.date == check_date and schedule.time_slot == check_time
+                            and (schedule.classroom == check_room or schedule.professor == self.professor)
+                            for schedule in getattr(university, 'schedules', []))
+            if clash:
+                return False
+
+            # Remove old allocation
+            old_classroom.release(old_date, old_time_slot)
+            index.remove(self)
+
+            # Update values and allocate
+            if new_time_slot:
+                self.time_slot = new_time_slot
+            if new_location:
+                self.classroom = new_location
+            if new_date:
+                self.date = new_date
+
+            try:
+                index.add(self)
+            except ValueError:
+                pass  # Legacy free-form slot; stays out of the index as on load
+            return self.classroom.allocate(self.date, self.time_slot)
 
     def view_schedule(self):
         info = f"""
@@ -659,44 +828,97 @@ class Exam:
         self.date = date            # Format: "YYYY-MM-DD"
         self.duration = duration
         self.student_results = {}   # {student_id: grade}
+        self.classroom = None       # Classroom object, set once scheduled (the first room if split)
+        self.rooms = []             # [(Classroom, seats)] once scheduled
+        self.time_slot = None       # "HH:MM-HH:MM" once scheduled
 
-    def schedule_exam(self, classroom):
-        if not hasattr(self.course, 'exams'):
-            self.course.exams = []
-        self.course.exams.append(self)
-        
-        hours = self.duration // 60
-        mins = self.duration % 60
-        time_slot = f"09:00-{9+hours:02d}:{mins:02d}"
-        
-        if classroom.allocate_class(self.date, time_slot):
-            print(f"Scheduled {self.course.name} exam on {self.date} for {self.duration} mins")
+    def get_time_slot(self):
+        # Exams scheduled before start times were stored always began at 09:00
+        return getattr(self, 'time_slot', None) or format_time_slot(9 * 60, 9 * 60 + self.duration)
+
+    def get_rooms(self):
+        rooms = getattr(self, 'rooms', None)
+        if rooms:
+            return rooms
+        return [(self.classroom, len(self.course.enrolled_students))] if getattr(self, 'classroom', None) else []
+
+    def schedule_exam(self, classrooms, start_time="09:00", check_capacity=True):
+        """Book one Classroom or a list of them from start_time for the exam's duration.
+
+        Fails if any room overlaps another booking that day or, with check_capacity, if the rooms
+        can't seat every enrolled student. Students fill the rooms in the order given.
+        """
+        rooms = [classrooms] if isinstance(classrooms, Classroom) else list(classrooms)
+        start = parse_time(start_time)
+        time_slot = format_time_slot(start, start + self.duration)
+        keys = [('course', self.course.course_id)] + [('classroom', room.classroom_id) for room in rooms]
+        with entity_locks.hold(*keys):
+            if not rooms or len({room.classroom_id for room in rooms}) != len(rooms):
+                return False
+            enrolled = len(self.course.enrolled_students)
+            if check_capacity and enrolled > sum(room.seats() for room in rooms):
+                print(f"{self.course.name} has {enrolled} students; the rooms seat {sum(room.seats() for room in rooms)}")
+                return False
+            if any(room.is_allocated(self.date, time_slot) for room in rooms):
+                print(f"A room is already booked on {self.date} during {time_slot}")
+                return False
+
+            seating = []
+            remaining = enrolled
+            for room in rooms:
+                room.allocate_class(self.date, time_slot)
+                seats = min(remaining, room.seats()) if room is not rooms[-1] else remaining
+                seating.append((room, seats))
+                remaining -= seats
+            # Only exams that got their rooms are attached to the course and the registry
+            if not hasattr(self.course, 'exams'):
+                self.course.exams = []
+            self.course.exams.append(self)
+            self.classroom = rooms[0]
+            self.rooms = seating
+            self.time_slot = time_slot
+            University.get_instance().add_exam(self)
+            print(f"Scheduled {self.course.name} exam on {self.date} {time_slot} in {len(rooms)} room(s)")
             return True
-        return False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_stats', None)  # Derived from student_results; rebuilt after loading
+        return state
+
+    def get_stats(self):
+        """Running ExamStats over student_results, built on first use (e.g. for exams from a snapshot)"""
+        stats = self.__dict__.get('_stats')
+        if stats is None:
+            with entity_locks.hold(('exam', self.exam_id)):
+                stats = self.__dict__.get('_stats')
+                if stats is None:
+                    stats = self._stats = ExamStats(self.student_results.values())
+        return stats
+
+    def add_result(self, student, grade):
+        """record_results without the lock or the output; bulk callers hold ('exam', exam_id) themselves"""
+        if student.user_id in self.student_results:
+            return False
+        self.student_results[student.user_id] = grade
+        stats = self.__dict__.get('_stats')
+        if stats is not None:
+            stats.add(grade)  # Not built yet means the next get_stats() counts this grade anyway
+        if hasattr(student, 'exam_grades'):
+            student.exam_grades[self.exam_id] = grade
+        return True
 
     def record_results(self, student, grade):
-        if student.user_id not in self.student_results:
-            self.student_results[student.user_id] = grade
-            if hasattr(student, 'exam_grades'):
-                student.exam_grades[self.exam_id] = grade
-            print(f"Recorded grade {grade} for {student.name}")
-            return True
-        print(f"Result already exists for {student.name}")
-        return False
+        with entity_locks.hold(('exam', self.exam_id)):
+            if self.add_result(student, grade):
+                print(f"Recorded grade {grade} for {student.name}")
+                return True
+            print(f"Result already exists for {student.name}")
+            return False
 
     def view_exam_info(self):
         num_students = len(self.student_results)
-        
-        avg_grade = None
-        if self.student_results:
-            numeric_grades = []
-            for grade in self.student_results.values():
-                if isinstance(grade, (int, float)):
-                    numeric_grades.append(grade)
-                elif isinstance(grade, str) and grade.replace('.','',1).isdigit():
-                    numeric_grades.append(float(grade))
-            if numeric_grades:
-                avg_grade = sum(numeric_grades)/len(numeric_grades)
+        avg_grade = self.get_stats().summary(percentiles=())['average']
         
         info = f"""
         EXAM INFORMATION:
@@ -709,55 +931,266 @@ class Exam:
         """
         print(info)
 
+class ExamRegistry:
+    """Exams by ID, plus by course, date and room"""
+    def __init__(self, exams=()):
+        self._exams = {}
+        self._by_course = {}
+        self._by_date = {}
+        self._by_room = {}
+        for exam in exams:
+            self.add(exam)
+
+    def __contains__(self, exam_id):
+        return exam_id in self._exams
+
+    def add(self, exam):
+        # First registration wins, matching the old first-match scan over course.exams
+        if exam.exam_id in self._exams:
+            return False
+        self._exams[exam.exam_id] = exam
+        self._by_course.setdefault(exam.course.course_id, []).append(exam)
+        self._by_date.setdefault(exam.date, []).append(exam)
+        for classroom, _ in exam.get_rooms():  # Older exams never recorded their room
+            self._by_room.setdefault(classroom.classroom_id, []).append(exam)
+        return True
+
+    def get(self, exam_id):
+        return self._exams.get(exam_id)
+
+    def by_course(self, course_id):
+        return list(self._by_course.get(course_id, ()))
+
+    def by_date(self, date):
+        return list(self._by_date.get(date, ()))
+
+    def by_room(self, classroom_id):
+        return list(self._by_room.get(classroom_id, ()))
+
+class Loan:
+    """One copy of a title out with a student; times are Unix seconds (None on loans from before due dates)"""
+    __slots__ = ('student_id', 'book_id', 'copy', 'borrowed_at', 'due')
+
+    def __init__(self, student_id, book_id, copy, borrowed_at, due):
+        self.student_id = student_id
+        self.book_id = book_id
+        self.copy = copy
+        self.borrowed_at = borrowed_at
+        self.due = due
+
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+
 class Library:
+    LOAN_PERIOD = 14 * 24 * 60 * 60   # Seconds
+    _index_lock = Lock()
+
     def __init__(self, library_id):
         self.library_id = library_id
-        self.books = {}  # Format: {book_id: {"title": str, "author": str, "available": bool, "borrowed_by": str}}
+        # Format: {book_id: {"title": str, "author": str, "available": bool (a copy is on the shelf),
+        #          "borrowed_by": str (latest borrower while no copy is left), "copies": int, "on_shelf": [copy numbers]}}
+        self.books = {}
         self.students_registered = {}  # Format: {student_id: Student object}
+        self.loans = {}  # Format: {(student_id, book_id): Loan}
+        self.holds = {}  # Format: {book_id: deque of student IDs, first in line first}; only titles with holds
+        self.history = LoanLog()  # Every borrow and return, with running circulation stats
+        self._loan_index = LoanIndex()
+        self._due_dates = DueDates()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_catalog', None)        # Derived from books; rebuilt after loading
+        state.pop('_availability', None)
+        state.pop('_due_dates', None)      # Rebuilt from loans in __setstate__
+        state.pop('_loan_index', None)     # Rebuilt from loans in __setstate__
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'loans' not in state:
+            # Saved before copies and holds: every book is a single copy, out with borrowed_by if anyone
+            self.loans = {}
+            self.holds = {}
+            for book_id, book in self.books.items():
+                book["copies"] = 1
+                book["on_shelf"] = [1] if book["available"] else []
+                if not book["available"] and book["borrowed_by"] is not None:
+                    self.loans[(book["borrowed_by"], book_id)] = Loan(book["borrowed_by"], book_id, 1, None, None)
+        if 'history' not in state:
+            self.history = LoanLog()   # Loans before the log have no history
+        self._loan_index = LoanIndex(self.loans.values())
+        self._due_dates = DueDates(self.loans.values())
+
+    def get_catalog(self):
+        """Title/author search index over self.books, built on first use"""
+        catalog = self.__dict__.get('_catalog')
+        if catalog is None:
+            with self._index_lock:
+                catalog = self.__dict__.get('_catalog')
+                if catalog is None:
+                    catalog = self._catalog = CatalogIndex(self.books)
+        return catalog
+
+    def get_availability(self):
+        """Sorted index of available book IDs, built on first use"""
+        availability = self.__dict__.get('_availability')
+        if availability is None:
+            with self._index_lock:
+                availability = self.__dict__.get('_availability')
+                if availability is None:
+                    availability = self._availability = AvailabilityIndex(
+                        book_id for book_id, book in self.books.items() if book["available"])
+        return availability
+
+    def get_due_dates(self):
+        """Due-date heap over the active loans; always built, so it never misses a loan"""
+        return self._due_dates
+
+    def get_loan_index(self):
+        """Active loans by student and by book; always built, so it never misses a loan"""
+        return self._loan_index
+
+    def _set_available(self, book_id, available):
+        # Under the index lock, so an availability index being built sees the flag either before or after
+        with self._index_lock:
+            self.books[book_id]["available"] = available
+            availability = self.__dict__.get('_availability')
+            if availability is not None:
+                if available:
+                    availability.add(book_id)
+                else:
+                    availability.discard(book_id)
+
+    def _lend(self, book_id, student_id, copy, now):
+        # Caller holds the book lock and has taken copy off the shelf (or straight from a return).
+        # On a hold handoff the holder's student lock is not taken: locks are acquired in one sorted
+        # order up front, and taking it now could deadlock against a thread holding it while waiting
+        # on ours. Nothing here needs it: the loan, history and indexes are keyed by this book (its
+        # lock is held), and other threads only add or remove *other* books in borrowed_books.
+        now = time.time() if now is None else now
+        loan = Loan(student_id, book_id, copy, now, now + self.LOAN_PERIOD)
+        self.loans[(student_id, book_id)] = loan
+        self.history.record_loan(student_id, book_id, now)
+        book = self.books[book_id]
+        if not book["on_shelf"]:
+            self._set_available(book_id, False)
+            book["borrowed_by"] = student_id
+        self.students_registered[student_id].borrowed_books.append(book_id)
+        self._due_dates.add(loan)
+        self._loan_index.add(loan)
+        return loan
+
+    def _shelve(self, book_id, copy, now):
+        """Put a free copy back, or hand it to the first student waiting for the title; returns who got it"""
+        queue = self.holds.get(book_id)
+        while queue:
+            student_id = queue.popleft()
+            if not queue:
+                del self.holds[book_id]
+            student = self.students_registered.get(student_id)
+            if student is not None and student.libraryRegistered:   # Otherwise the hold has lapsed; try the next
+                self._lend(book_id, student_id, copy, now)
+                return student_id
+        book = self.books[book_id]
+        book["on_shelf"].append(copy)
+        book["borrowed_by"] = None
+        self._set_available(book_id, True)
+        return None
 
-    def borrow_book(self, student_id, book_id):
-        if student_id not in self.students_registered:
-            raise Exception("Student is not registered in the library")
+    def borrow_book(self, student_id, book_id, now=None):
+        with entity_locks.hold(('student', student_id), ('book', book_id)):
+            if student_id not in self.students_registered:
+                raise Exception("Student is not registered in the library")
         
-        if book_id not in self.books:
-            raise Exception("Book does not exist in the library")
+            if book_id not in self.books:
+                raise Exception("Book does not exist in the library")
+
+            if (student_id, book_id) in self.loans:
+                raise Exception("Student already has a copy of this book")
             
-        if not self.books[book_id]["available"]:
-            raise Exception("Book is already borrowed by another student")
+            if not self.books[book_id]["on_shelf"]:
+                raise Exception("Book is already borrowed by another student")
             
-        student = self.students_registered[student_id]
+            student = self.students_registered[student_id]
         
-        if not student.libraryRegistered:
-            raise Exception("Student is not registered in the library")
+            if not student.libraryRegistered:
+                raise Exception("Student is not registered in the library")
             
-        # Update book status first
-        self.books[book_id]["available"] = False
-        self.books[book_id]["borrowed_by"] = student_id
-        student.borrowed_books.append(book_id)
-        
-        return True
+            self._lend(book_id, student_id, self.books[book_id]["on_shelf"].pop(), now)
+            return True
 
-    def return_book(self, student_id, book_id):
-        if student_id not in self.students_registered:
-            raise Exception("Student is not registered")
-            
-        if book_id not in self.books:
-            raise Exception("Book does not exist")
+    def return_book(self, student_id, book_id, now=None):
+        with entity_locks.hold(('student', student_id), ('book', book_id)):
+            if student_id not in self.students_registered:
+                raise Exception("Student is not registered")
             
-        if self.books[book_id]["available"]:
-            raise Exception("Book was not borrowed")
-            
-        if self.books[book_id]["borrowed_by"] != student_id:
-            raise Exception("Book was not borrowed by this student")
-            
-        self.books[book_id]["available"] = True
-        self.books[book_id]["borrowed_by"] = None
-        student = self.students_registered[student_id]
-        
-        if book_id in student.borrowed_books:
-            student.borrowed_books.remove(book_id)
+            if book_id not in self.books:
+                raise Exception("Book does not exist")
+
+            book = self.books[book_id]
+            loan = self.loans.pop((student_id, book_id), None)
+            if loan is None:
+                if len(book["on_shelf"]) == book["copies"]:
+                    raise Exception("Book was not borrowed")
+                raise Exception("Book was not borrowed by this student")
+            now = time.time() if now is None else now
+            self.history.record_return(student_id, book_id, now, loan.borrowed_at)
+
+            self._due_dates.discard(loan)
+            self._loan_index.discard(loan)
+            student = self.students_registered[student_id]
         
-        return True
+            if book_id in student.borrowed_books:
+                student.borrowed_books.remove(book_id)
+
+            self._shelve(book_id, loan.copy, now)
+            return True
+
+    def place_hold(self, student_id, book_id):
+        """Queue for the next free copy of a title; returns the place in line (1 = next)"""
+        with entity_locks.hold(('student', student_id), ('book', book_id)):
+            if student_id not in self.students_registered:
+                raise Exception("Student is not registered in the library")
+            if book_id not in self.books:
+                raise Exception("Book does not exist in the library")
+            if (student_id, book_id) in self.loans:
+                raise Exception("Student already has a copy of this book")
+            if self.books[book_id]["on_shelf"]:
+                raise Exception("A copy is available; borrow it instead")
+            queue = self.holds.setdefault(book_id, deque())
+            if student_id in queue:
+                raise Exception("Student already has a hold on this book")
+            queue.append(student_id)
+            return len(queue)
+
+    def cancel_hold(self, student_id, book_id):
+        with entity_locks.hold(('student', student_id), ('book', book_id)):
+            queue = self.holds.get(book_id)
+            if not queue or student_id not in queue:
+                raise Exception("Student has no hold on this book")
+            queue.remove(student_id)
+            if not queue:
+                del self.holds[book_id]
+            return True
+
+    def add_copies(self, book_id, count, now=None):
+        """Add count copies to a title; they go to waiting students first"""
+        with entity_locks.hold(('book', book_id)):
+            if book_id not in self.books:
+                raise Exception("Book does not exist")
+            if count < 1:
+                raise Exception("Number of copies must be positive")
+            book = self.books[book_id]
+            first = book["copies"] + 1
+            book["copies"] += count
+            for copy in range(first, first + count):
+                self._shelve(book_id, copy, now)
+            return True
+
+    def overdue(self, now=None, limit=None):
+        """[(student_id, book_id, due)] for loans past due, oldest first"""
+        overdue = self.get_due_dates().overdue(time.time() if now is None else now, self.loans)
+        return overdue if limit is None else overdue[:limit]
 
     def check_availability(self, book_id=None):
         if book_id:
@@ -765,40 +1198,83 @@ class Library:
                 raise Exception("Book does not exist")
             return self.books[book_id]
         else:
-            available_books = [
-                {"id": book_id, **book_info} 
-                for book_id, book_info in self.books.items() 
-                if book_info["available"]
-            ]
-            return available_books
+            availability = self.get_availability()
+            book_ids, _ = availability.page(limit=len(availability))
+            return [{"id": book_id, **self.books[book_id]} for book_id in book_ids]
+
+    def add_book(self, book_id, title, author, copies=1):
+        with entity_locks.hold(('book', book_id)):
+            if copies < 1:
+                raise Exception("Number of copies must be positive")
+            book = self._new_book(title, author, copies)
+            # The index lock keeps an index build from iterating self.books mid-insert, or from
+            # being stored just after the check below and missing the book
+            with self._index_lock:
+                # setdefault so a concurrent add_books of the same ID can't be overwritten
+                if self.books.setdefault(book_id, book) is not book:
+                    raise Exception("Book already exists")
+                # Indexes not built yet pick the book up when they are
+                catalog = self.__dict__.get('_catalog')
+                if catalog is not None:
+                    catalog.add(book_id, title, author)
+                availability = self.__dict__.get('_availability')
+                if availability is not None:
+                    availability.add(book_id)
+            return True
 
-    def add_book(self, book_id, title, author):
-        if book_id in self.books:
-            raise Exception("Book already exists")
-            
-        self.books[book_id] = {
+    @staticmethod
+    def _new_book(title, author, copies):
+        return {
             "title": title,
             "author": author,
             "available": True,
-            "borrowed_by": None
+            "borrowed_by": None,
+            "copies": copies,
+            "on_shelf": list(range(copies, 0, -1))   # Copy 1 is lent first
         }
-        return True
+
+    def add_books(self, rows):
+        """Bulk add_book for (book_id, title, author, copies) rows; returns the rows added.
+
+        IDs already in the library are skipped. Instead of indexing each book, the search and
+        availability indexes are dropped and rebuilt once on next use.
+        """
+        added = []
+        books = self.books
+        # New IDs have no loans or holds to lock; the index lock keeps index builds from
+        # iterating self.books mid-batch (or finishing with a stale copy of it)
+        with self._index_lock:
+            for row in rows:
+                book_id, title, author, copies = row
+                if copies >= 1 and book_id not in books:
+                    book = self._new_book(title, author, copies)
+                    if books.setdefault(book_id, book) is book:
+                        added.append(row)
+            if added:
+                self.__dict__.pop('_catalog', None)
+                self.__dict__.pop('_availability', None)
+        return added
 
     def register_student(self, student):
-        if student.user_id in self.students_registered:
-            raise Exception("Student already registered")
+        with entity_locks.hold(('student', student.user_id)):
+            if student.user_id in self.students_registered:
+                raise Exception("Student already registered")
             
-        self.students_registered[student.user_id] = student
-        student.libraryRegistered = True
-        return True
+            self.students_registered[student.user_id] = student
+            student.libraryRegistered = True
+            return True
 
 class University:
     _instance = None
+    _instance_lock = Lock()
+    _index_lock = Lock()
     
     @staticmethod
     def get_instance():
         if University._instance is None:
-            University._instance = University()
+            with University._instance_lock:
+                if University._instance is None:
+                    University._instance = University()
         return University._instance
     
     def __init__(self):
@@ -808,6 +1284,7 @@ class University:
             self.users = []
             self.courses = []
             self.classrooms = {}  # Initialize as empty dictionary
+            self.reindex()
             self.initialized = True
             print("Initial classrooms:", self.classrooms)  # Debug log
             
@@ -827,39 +1304,125 @@ class University:
             print("Final classrooms after initialization:", self.classrooms)  # Debug log
             self.initialized = True
     
+    def __getattr__(self, name):
+        # Only reached for attributes not set yet, i.e. sections of a lazily loaded snapshot
+        snapshot = self.__dict__.get('_snapshot')
+        if snapshot is not None and snapshot.materialize_attribute(self, name):
+            return self.__dict__[name]
+        raise AttributeError(f"'University' object has no attribute '{name}'")
+
     def add_department(self, department):
         self.departments.append(department)
     
     def add_user(self, user):
         self.users.append(user)
+        self._index_user(user)
     
     def add_course(self, course):
         self.courses.append(course)
+        self._courses.setdefault(course.course_id, course)
 
     def add_classroom(self, classroom):
-        self.classrooms.append(classroom)
+        self.classrooms[classroom.classroom_id] = classroom
+
+    def _index_user(self, user):
+        # First registration wins, matching the old first-match linear scan
+        self._users.setdefault(user.user_id, user)
+        if isinstance(user, Student):
+            self._students.setdefault(user.user_id, user)
+        elif isinstance(user, Professor):
+            self._professors.setdefault(user.user_id, user)
+        elif isinstance(user, Administrator):
+            self._admins.setdefault(user.user_id, user)
+
+    def reindex(self):
+        """Rebuild the ID registries after users/courses were replaced wholesale (e.g. on load)"""
+        self._users = {}
+        self._students = {}
+        self._professors = {}
+        self._admins = {}
+        self._courses = {}
+        for user in self.users:
+            if hasattr(user, 'user_id'):
+                self._index_user(user)
+        for course in self.courses:
+            if hasattr(course, 'course_id'):
+                self._courses.setdefault(course.course_id, course)
+        self.__dict__.pop('_schedule_index', None)  # Rebuilt from self.schedules on next use
+        self.__dict__.pop('_gradebook', None)
+        self.__dict__.pop('_exam_registry', None)
+        # Older snapshots stored classrooms as a list (lazily loaded sections normalise themselves)
+        if 'classrooms' in self.__dict__ and not isinstance(self.classrooms, dict):
+            self.classrooms = {c.classroom_id: c for c in self.classrooms}
+
+    def get_schedule_index(self):
+        """Room/professor interval index over self.schedules, built on first use"""
+        index = self.__dict__.get('_schedule_index')
+        if index is None:
+            with self._index_lock:
+                index = self.__dict__.get('_schedule_index')
+                if index is None:
+                    index = ScheduleIndex(getattr(self, 'schedules', []))
+                    self._schedule_index = index
+        return index
+
+    def get_gradebook(self):
+        """Columnar enrollment/grade table over self.courses, built on first use"""
+        gradebook = self.__dict__.get('_gradebook')
+        if gradebook is None:
+            with self._index_lock:
+                gradebook = self.__dict__.get('_gradebook')
+                if gradebook is None:
+                    gradebook = Gradebook.from_courses(self.courses)
+                    self._gradebook = gradebook
+        return gradebook
+
+    def get_exam_registry(self):
+        """ExamRegistry over self.exams, built on first use.
+
+        Older snapshots only kept exams on their course; those are adopted into self.exams here.
+        """
+        registry = self.__dict__.get('_exam_registry')
+        if registry is None:
+            with self._index_lock:
+                registry = self.__dict__.get('_exam_registry')
+                if registry is None:
+                    if getattr(self, 'exams', None) is None:
+                        self.exams = []
+                    registry = ExamRegistry(self.exams)
+                    for course in self.courses:
+                        for exam in getattr(course, 'exams', []):
+                            if exam.exam_id not in registry:
+                                registry.add(exam)
+                                self.exams.append(exam)
+                    self._exam_registry = registry
+        return registry
+
+    def add_exam(self, exam):
+        registry = self.get_exam_registry()
+        with self._index_lock:
+            if registry.add(exam):
+                self.exams.append(exam)
+                return True
+        return False
+
+    def get_exam(self, exam_id):
+        return self.get_exam_registry().get(exam_id)
+
+    def get_user(self, user_id):
+        return self._users.get(user_id)
 
     def get_student(self, student_id):
-        for user in self.users:
-            if hasattr(user, 'user_id') and user.user_id == student_id:
-                if isinstance(user, Student):  # Ensure it's a Student
-                   return user
-        return None
+        return self._students.get(student_id)
 
     def get_course(self, course_id):
-        for course in self.courses:
-            if hasattr(course, 'course_id') and course.course_id == course_id:
-                return course
-        return None
+        return self._courses.get(course_id)
 
     def get_professor(self, professor_id):
-        for user in self.users:
-            if isinstance(user, Professor) and user.user_id == professor_id:
-                return user
-        return None
+        return self._professors.get(professor_id)
+
+    def get_admin(self, admin_id):
+        return self._admins.get(admin_id)
     
     def get_classroom(self, classroom_id):
-        for classroom in self.classrooms:
-            if hasattr(classroom, 'classroom_id') and classroom.classroom_id == classroom_id:
-                return classroom
-        return None
\ No newline at end of file
+        return self.classrooms.get(classroom_id)
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models import University, Professor
+from data_manager import journal
+from locking import entity_locks
 
 professors_bp = Blueprint('professors', __name__)
 
@@ -15,7 +17,8 @@ def create_professor():
             email=data['email'],
             department=data['department']
         )
-        university.users.append(professor)
+        university.add_user(professor)
+        journal.record('add_professor', professor.user_id, professor.name, professor.email, professor.department)
         return jsonify({
             'message': 'Professor created successfully',
             'professor': professor.to_dict()
@@ -55,17 +58,19 @@ def assign_grade(professor_id):
         if not course:
             return jsonify({'error': 'Course not found'}), 404
 
-        # Validate professor teaches the course
-        if course.professor != professor:
-            return jsonify({'error': 'Professor is not teaching this course'}), 403
+        with entity_locks.hold(('student', student.user_id), ('course', course.course_id)):
+            # Validate professor teaches the course
+            if course.professor != professor:
+                return jsonify({'error': 'Professor is not teaching this course'}), 403
 
-        # Validate student is enrolled in the course
-        if student not in course.enrolled_students:
-            return jsonify({'error': 'Student is not enrolled in this course'}), 400
+            # Validate student is enrolled in the course
+            if student not in course.enrolled_students:
+                return jsonify({'error': 'Student is not enrolled in this course'}), 400
 
-        # Assign the grade
-        student.update_grade(course.course_id, data['grade'])
-        return jsonify({'message': f'Successfully assigned grade {data["grade"]} to {student.name} for {course.name}'}), 200
+            # Assign the grade
+            student.update_grade(course.course_id, data['grade'])
+            journal.record('grade', student.user_id, course.course_id, data['grade'])
+            return jsonify({'message': f'Successfully assigned grade {data["grade"]} to {student.name} for {course.name}'}), 200
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -84,28 +89,20 @@ def view_dashboard(prof_id):
     total_students = sum(len(course.enrolled_students) for course in university.courses 
                         if course.professor and course.professor.user_id == prof_id)
     
-    # Get course details
+    # Get course details; averages and distributions come from the gradebook's running totals
+    gradebook = university.get_gradebook()
     courses_teaching = []
     for course in university.courses:
         if course.professor and course.professor.user_id == prof_id:
-            # Calculate average grade for this course
-            grades = []
-            for student in course.enrolled_students:
-                if course.course_id in student.grades:
-                    grade = student.grades[course.course_id]
-                    if grade == 'A': grades.append(95)
-                    elif grade == 'B': grades.append(85)
-                    elif grade == 'C': grades.append(75)
-                    elif grade == 'D': grades.append(65)
-                    elif grade == 'F': grades.append(55)
-            
-            avg_grade = sum(grades)/len(grades) if grades else None
+            stats = gradebook.course_stats(course.course_id)
+            avg_grade = stats['average']
             
             courses_teaching.append({
                 'code': course.course_id,
                 'name': course.name,
                 'students': len(course.enrolled_students),
-                'avg_grade': letter_grade(avg_grade) if avg_grade else 'N/A'
+                'avg_grade': letter_grade(avg_grade) if avg_grade else 'N/A',
+                'grade_distribution': stats['distribution']
             })
     
     dashboard_data = {
@@ -148,19 +145,21 @@ def assign_professor_to_course():
         if not course:
             return jsonify({'error': 'Course not found'}), 404
 
-        if course.professor:
-            if course.professor.user_id == professor.user_id:
-                return jsonify({'error': 'Professor is already assigned to this course'}), 400
-            return jsonify({'error': 'Course already has an assigned professor'}), 400
+        with entity_locks.hold(('professor', professor.user_id), ('course', course.course_id)):
+            if course.professor:
+                if course.professor.user_id == professor.user_id:
+                    return jsonify({'error': 'Professor is already assigned to this course'}), 400
+                return jsonify({'error': 'Course already has an assigned professor'}), 400
             
-        # Update both professor and course
-        if course not in professor.courses_taught:
-            professor.courses_taught.append(course)
-        course.professor = professor
+            # Update both professor and course
+            if course not in professor.courses_taught:
+                professor.courses_taught.append(course)
+            course.professor = professor
+            journal.record('assign_professor', professor.user_id, course.course_id)
         
-        return jsonify({
-            'message': 'Professor assigned to course successfully'
-        }), 200
+            return jsonify({
+                'message': 'Professor assigned to course successfully'
+            }), 200
     except Exception as e:
         return jsonify({'error': f'Failed to assign professor to course: {str(e)}'}), 500
 
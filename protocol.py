@@ -0,0 +1,216 @@
+import asyncio
+import struct
+
+# Every message on the wire: payload length, request id, payload
+FRAME_HEADER = struct.Struct('!IQ')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+MAX_DEPTH = 32
+
+# Payloads use the msgpack encoding for None, bool, int, float, str, bytes, list/tuple and dict.
+# Anything else is refused, so models must be projected to plain fields before they are sent.
+_INT_FORMATS = ((0xd0, -2**7, 2**7, '!b'), (0xd1, -2**15, 2**15, '!h'),
+                (0xd2, -2**31, 2**31, '!i'), (0xd3, -2**63, 2**63, '!q'))
+_UINT_FORMATS = ((0xcc, 2**8, '!B'), (0xcd, 2**16, '!H'), (0xce, 2**32, '!I'), (0xcf, 2**64, '!Q'))
+
+def _pack_length(out, n, fix_tag, fix_max, tags):
+    if n <= fix_max:
+        out.append(fix_tag | n)
+    elif tags[0] is not None and n < 2**8:
+        out.append(tags[0])
+        out.append(n)
+    elif n < 2**16:
+        out.append(tags[1])
+        out += n.to_bytes(2, 'big')
+    elif n < 2**32:
+        out.append(tags[2])
+        out += n.to_bytes(4, 'big')
+    else:
+        raise ValueError("Value too large to encode")
+
+def _pack(obj, out, depth):
+    if depth > MAX_DEPTH:
+        raise ValueError("Message nested too deeply")
+    if type(obj) is str:  # Most common case first
+        data = obj.encode('utf-8')
+        if len(data) < 32:
+            out.append(0xa0 | len(data))
+        else:
+            _pack_length(out, len(data), 0xa0, 31, (0xd9, 0xda, 0xdb))
+        out += data
+    elif obj is None:
+        out.append(0xc0)
+    elif obj is True or obj is False:
+        out.append(0xc3 if obj else 0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80 or -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif obj >= 0:
+            for tag, limit, fmt in _UINT_FORMATS:
+                if obj < limit:
+                    out.append(tag)
+                    out += struct.pack(fmt, obj)
+                    break
+            else:
+                raise ValueError("Integer too large to encode")
+        else:
+            for tag, low, high, fmt in _INT_FORMATS:
+                if low <= obj:
+                    out.append(tag)
+                    out += struct.pack(fmt, obj)
+                    break
+            else:
+                raise ValueError("Integer too large to encode")
+    elif isinstance(obj, float):
+        out.append(0xcb)
+        out += struct.pack('!d', obj)
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        _pack_length(out, len(data), 0xa0, 31, (0xd9, 0xda, 0xdb))
+        out += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        _pack_length(out, len(data), 0xc4, -1, (0xc4, 0xc5, 0xc6))
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        _pack_length(out, len(obj), 0x90, 15, (None, 0xdc, 0xdd))
+        for item in obj:
+            _pack(item, out, depth + 1)
+    elif isinstance(obj, dict):
+        _pack_length(out, len(obj), 0x80, 15, (None, 0xde, 0xdf))
+        for key, value in obj.items():
+            _pack(key, out, depth + 1)
+            _pack(value, out, depth + 1)
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__}; send plain fields instead")
+
+def _take(data, pos, n):
+    end = pos + n
+    if end > len(data):
+        raise ValueError("Truncated message")
+    return data[pos:end], end
+
+def _unpack(data, pos, depth):
+    if depth > MAX_DEPTH:
+        raise ValueError("Message nested too deeply")
+    if pos >= len(data):
+        raise ValueError("Truncated message")
+    tag = data[pos]
+    pos += 1
+    if 0xa0 <= tag <= 0xbf:  # fixstr, the most common case
+        end = pos + (tag & 0x1f)
+        if end > len(data):
+            raise ValueError("Truncated message")
+        return data[pos:end].decode('utf-8'), end
+    if tag < 0x80:
+        return tag, pos
+    if tag >= 0xe0:
+        return tag - 0x100, pos
+    if tag == 0xc0:
+        return None, pos
+    if tag in (0xc2, 0xc3):
+        return tag == 0xc3, pos
+    if 0xa0 <= tag <= 0xbf or tag in (0xd9, 0xda, 0xdb):
+        if tag <= 0xbf:
+            n = tag & 0x1f
+        else:
+            raw, pos = _take(data, pos, 1 << (tag - 0xd9))
+            n = int.from_bytes(raw, 'big')
+        raw, pos = _take(data, pos, n)
+        return raw.decode('utf-8'), pos
+    if tag in (0xc4, 0xc5, 0xc6):
+        raw, pos = _take(data, pos, 1 << (tag - 0xc4))
+        return _take(data, pos, int.from_bytes(raw, 'big'))
+    if 0x90 <= tag <= 0x9f or 0x80 <= tag <= 0x8f or tag in (0xdc, 0xdd, 0xde, 0xdf):
+        if tag <= 0x9f:
+            n = tag & 0x0f
+        else:
+            raw, pos = _take(data, pos, 2 if tag in (0xdc, 0xde) else 4)
+            n = int.from_bytes(raw, 'big')
+        if tag <= 0x8f or tag >= 0xde:
+            result = {}
+            for _ in range(n):
+                key, pos = _unpack(data, pos, depth + 1)
+                if isinstance(key, (list, dict)):
+                    raise ValueError("Unhashable map key")
+                result[key], pos = _unpack(data, pos, depth + 1)
+            return result, pos
+        result = []
+        for _ in range(n):
+            item, pos = _unpack(data, pos, depth + 1)
+            result.append(item)
+        return result, pos
+    if tag == 0xcb:
+        raw, pos = _take(data, pos, 8)
+        return struct.unpack('!d', raw)[0], pos
+    for fmt_tag, _, _, fmt in _INT_FORMATS:
+        if tag == fmt_tag:
+            raw, pos = _take(data, pos, struct.calcsize(fmt))
+            return struct.unpack(fmt, raw)[0], pos
+    for fmt_tag, _, fmt in _UINT_FORMATS:
+        if tag == fmt_tag:
+            raw, pos = _take(data, pos, struct.calcsize(fmt))
+            return struct.unpack(fmt, raw)[0], pos
+    raise ValueError(f"Unsupported type tag 0x{tag:02x}")
+
+def encode_message(message):
+    out = bytearray()
+    _pack(message, out, 0)
+    return bytes(out)
+
+def decode_message(payload):
+    """Decode a payload; lists come back for tuples. Malformed input raises ValueError"""
+    message, pos = _unpack(payload, 0, 0)
+    if pos != len(payload):
+        raise ValueError("Trailing bytes after message")
+    return message
+
+def recv_exact(sock, size):
+    """Read exactly size bytes; None if the peer closed before sending any"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("Connection closed mid-frame")
+        received += n
+    return bytes(buf)
+
+def pack_frame(request_id, message):
+    payload = encode_message(message)
+    return FRAME_HEADER.pack(len(payload), request_id) + payload
+
+def send_frame(sock, request_id, message):
+    sock.sendall(pack_frame(request_id, message))
+
+def recv_frame(sock):
+    """Return (request_id, message), or None once the peer has closed the connection"""
+    header = recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, request_id = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    payload = recv_exact(sock, length) if length else b''
+    if payload is None:
+        raise ConnectionError("Connection closed mid-frame")
+    return request_id, decode_message(payload)
+
+async def read_frame(reader):
+    """asyncio counterpart of recv_frame for a StreamReader"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ConnectionError("Connection closed mid-frame")
+        return None
+    length, request_id = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("Connection closed mid-frame")
+    return request_id, decode_message(payload)
@@ -1,7 +1,13 @@
+import csv
 import datetime
+import io
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from models import University, Schedule
+from data_manager import journal
+from locking import entity_locks
+from intervals import parse_time_slot
+from timetable import MAX_RESTARTS, solve
 
 schedules_bp = Blueprint('schedules', __name__)
 
@@ -34,6 +40,11 @@ def add_schedule():
         if missing_fields:
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
 
+        try:
+            parse_time_slot(time_slot)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         university = University.get_instance()
         
         # Get course and professor
@@ -59,21 +70,162 @@ def add_schedule():
         )
 
         # Assign schedule
-        if new_schedule.assign_schedule():
-            return jsonify({
-                "message": f"Schedule {schedule_id} added successfully",
-                "schedule": {
-                    "id": schedule_id,
-                    "course": course.name,
-                    "professor": professor.name,
-                    "timeSlot": time_slot,
-                    "classroom": f"{classroom.location} (Room {classroom.classroom_id})",
-                    "date": date
-                }
-            }), 200
+        with entity_locks.hold(('classroom', classroom.classroom_id), ('professor', professor.user_id)):
+            if new_schedule.assign_schedule():
+                journal.record('schedule', schedule_id, course_id, professor_id, time_slot, classroom_id, date)
+                return jsonify({
+                    "message": f"Schedule {schedule_id} added successfully",
+                    "schedule": {
+                        "id": schedule_id,
+                        "course": course.name,
+                        "professor": professor.name,
+                        "timeSlot": time_slot,
+                        "classroom": f"{classroom.location} (Room {classroom.classroom_id})",
+                        "date": date
+                    }
+                }), 200
+            else:
+                return jsonify({"error": "Schedule conflicts with existing schedule"}), 400
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+BULK_FIELDS = ("scheduleId", "courseId", "professorId", "timeSlot", "classroomId", "date")
+
+def import_schedules(university, rows):
+    """Validate, resolve and assign a batch of schedule rows; returns (per-row results, accepted rows)"""
+    if not hasattr(university, 'schedules'):
+        university.schedules = []
+
+    results = []
+    pending = []  # (result, Schedule) for rows that passed validation
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            results.append({"row": number, "scheduleId": None, "status": "error", "error": "Row must be an object"})
+            continue
+        result = {"row": number, "scheduleId": row.get("scheduleId")}
+        results.append(result)
+        missing = [field for field in BULK_FIELDS if not row.get(field)]
+        if missing:
+            result.update(status="error", error=f"Missing required fields: {', '.join(missing)}")
+            continue
+        try:
+            parse_time_slot(row["timeSlot"])
+        except ValueError as e:
+            result.update(status="error", error=str(e))
+            continue
+
+        course = university.get_course(row["courseId"])
+        professor = university.get_professor(row["professorId"])
+        classroom = university.get_classroom(row["classroomId"])
+        if not course:
+            result.update(status="error", error="Course not found")
+        elif not professor:
+            result.update(status="error", error="Professor not found")
+        elif not classroom:
+            result.update(status="error", error="Classroom not found")
+        else:
+            pending.append((result, Schedule(row["scheduleId"], course, professor,
+                                             row["timeSlot"], classroom, row["date"])))
+
+    # One acquisition per room/professor for the whole batch; the index catches clashes
+    # both with existing schedules and with earlier rows of this batch
+    keys = set()
+    for _, schedule in pending:
+        keys.add(('classroom', schedule.classroom.classroom_id))
+        keys.add(('professor', schedule.professor.user_id))
+    accepted = []
+    with entity_locks.hold(*keys):
+        for result, schedule in pending:
+            if schedule.assign_schedule():
+                result["status"] = "created"
+                accepted.append((schedule.schedule_id, schedule.course.course_id, schedule.professor.user_id,
+                                 schedule.time_slot, schedule.classroom.classroom_id, schedule.date))
+            else:
+                result.update(status="error", error="Schedule conflicts with existing schedule")
+        if accepted:
+            journal.record('schedule_bulk', accepted)
+    return results, accepted
+
+@schedules_bp.route('/bulk', methods=['POST'])
+def bulk_add_schedules():
+    try:
+        if request.mimetype == 'text/csv':
+            rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+        elif not request.is_json:
+            return jsonify({"error": "Expected a JSON or CSV body"}), 415
+        else:
+            data = request.get_json(silent=True)
+            rows = data.get("schedules") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            return jsonify({"error": "Expected a list of schedules or a CSV body"}), 400
+
+        university = University.get_instance()
+        results, accepted = import_schedules(university, rows)
+        return jsonify({
+            "message": f"Imported {len(accepted)} of {len(rows)} schedules",
+            "created": len(accepted),
+            "failed": len(rows) - len(accepted),
+            "results": results
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@schedules_bp.route('/solve', methods=['POST'])
+def solve_timetable():
+    try:
+        data = request.get_json() or {}
+        dates = data.get("dates")
+        time_slots = data.get("timeSlots")
+        if not dates or not time_slots:
+            return jsonify({"error": "Missing required fields: dates, timeSlots"}), 400
+        try:
+            for time_slot in time_slots:
+                parse_time_slot(time_slot)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            restarts = min(max(int(data.get("restarts", 8)), 1), MAX_RESTARTS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "restarts must be a number"}), 400
+
+        university = University.get_instance()
+        if data.get("courseIds"):
+            courses = [university.get_course(course_id) for course_id in data["courseIds"]]
+            if not all(courses):
+                return jsonify({"error": "Course not found"}), 404
         else:
-            return jsonify({"error": "Schedule conflicts with existing schedule"}), 400
+            # Every course without a schedule yet, so solving twice doesn't double-book; older
+            # data may hold the same course ID twice, so solve each course once
+            scheduled = {schedule.course.course_id for schedule in getattr(university, 'schedules', [])}
+            courses = [university.get_course(course_id)
+                       for course_id in dict.fromkeys(course.course_id for course in university.courses)
+                       if course_id not in scheduled]
+
+        sections = [(course.course_id, course.professor.user_id if course.professor else None,
+                     len(course.enrolled_students)) for course in courses]
+        rooms = [(room.classroom_id, room.seats()) for room in university.classrooms.values()]
+        busy = [(s.date, s.time_slot, s.classroom.classroom_id, s.professor.user_id)
+                for s in getattr(university, 'schedules', [])]
+        for room in university.classrooms.values():
+            for date, booked in room.schedule.items():
+                busy.extend((date, time_slot, room.classroom_id, None) for time_slot in booked)
 
+        result = solve(sections, rooms, dates, time_slots, busy,
+                       workers=data.get("workers"), restarts=restarts)
+
+        if data.get("apply", True):
+            rows = [{"scheduleId": f"AUTO-{course_id}-{date}-{time_slot}", "courseId": course_id,
+                     "professorId": university.get_course(course_id).professor.user_id,
+                     "timeSlot": time_slot, "classroomId": room_id, "date": date}
+                    for course_id, date, time_slot, room_id in result["assignments"]]
+            results, accepted = import_schedules(university, rows)
+            result["created"] = len(accepted)
+            result["failed"] = [r for r in results if r["status"] != "created"]
+
+        result["assignments"] = [{"course_id": course_id, "date": date, "time_slot": time_slot, "classroom_id": room_id}
+                                 for course_id, date, time_slot, room_id in result["assignments"]]
+        return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -130,6 +282,12 @@ def update_schedule(schedule_id):
         if not any([new_time_slot, new_classroom, new_date]):
             return jsonify({"error": "No update fields provided"}), 400
 
+        if new_time_slot:
+            try:
+                parse_time_slot(new_time_slot)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
         university = University.get_instance()
         schedules = getattr(university, 'schedules', [])
         
@@ -140,7 +298,14 @@ def update_schedule(schedule_id):
                     if not classroom:
                         return jsonify({"error": "Classroom not found"}), 404
                     
-                if schedule.update_schedule(new_time_slot, classroom if new_classroom else None, new_date):
+                target_room = classroom if new_classroom else schedule.classroom
+                with entity_locks.hold(('schedule', schedule_id), ('professor', schedule.professor.user_id),
+                                       ('classroom', schedule.classroom.classroom_id),
+                                       ('classroom', target_room.classroom_id)):
+                    updated = schedule.update_schedule(new_time_slot, classroom if new_classroom else None, new_date)
+                    if updated:
+                        journal.record('update_schedule', schedule_id, new_time_slot, new_classroom, new_date)
+                if updated:
                     return jsonify({
                         "message": f"Schedule {schedule_id} updated successfully",
                         "schedule": {
@@ -1,12 +1,39 @@
+import argparse
+import asyncio
 import socket
-import pickle
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
-from models import Student, Course 
+from protocol import pack_frame, read_frame, recv_frame, send_frame
+from models import University, Student
+from data_manager import journal, load_data
+from locking import entity_locks, mutations
 
-students = {}
-courses = {}
+def _course_id(course):
+    return getattr(course, 'course_id', course)
+
+# Fields a GET_STUDENT reply may carry; replies hold plain values, never model objects
+STUDENT_FIELDS = {
+    'student_id': lambda student: student.user_id,
+    'name': lambda student: student.name,
+    'email': lambda student: student.email,
+    'major': lambda student: student.major,
+    # list()/dict() copy in one step, so lock-free reads never see a container mid-mutation
+    'courses_enrolled': lambda student: [_course_id(course) for course in list(student.courses_enrolled)],
+    'grades': lambda student: {_course_id(course): grade for course, grade in dict(student.grades).items()},
+}
+DEFAULT_STUDENT_FIELDS = ('student_id', 'name', 'email', 'major', 'courses_enrolled')
+
+def project(student, fields=None):
+    fields = fields or DEFAULT_STUDENT_FIELDS
+    unknown = [field for field in fields if field not in STUDENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))}")
+    return {field: STUDENT_FIELDS[field](student) for field in fields}
 
 class UniversityServer:
+    READ_COMMANDS = {'GET_STUDENT', 'PING'}  # Change nothing, so they don't wait for a compaction
+
     def __init__(self, host='127.0.0.1', port=5500):
         self.host = host
         self.port = port
@@ -14,66 +41,183 @@ class UniversityServer:
     
     def setup_socket(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.sock.bind((self.host, self.port))
-        self.sock.listen()
+        self.sock.listen(socket.SOMAXCONN)
+        self.port = self.sock.getsockname()[1]  # port=0 picks a free port
         print(f"Server listening on {self.host}:{self.port}")
     
+    @staticmethod
+    def lock_keys(command_data):
+        """Entity locks a command needs; GET_STUDENT only copies fields, so it takes none"""
+        command, *args = command_data
+        if command == 'ADD_STUDENT' and args:
+            return [('student', args[0])]
+        if command == 'ENROLL' and len(args) == 2:
+            return [('student', args[0]), ('course', args[1])]
+        return []
+
+    def apply(self, command, args, records):
+        """Run one command; journal entries for it are appended to records for the caller to write"""
+        # Same store and journal as the Flask blueprints, so HTTP and socket clients see one state
+        university = University.get_instance()
+        if command == 'GET_STUDENT':
+            student_id, *fields = args
+            student = university.get_student(student_id)
+            return project(student, fields[0] if fields else None) if student else "Student not found"
+
+        elif command == 'ADD_STUDENT':
+            student_id, name, email, major = args
+            if university.get_user(student_id):
+                return "Student already exists"
+            university.add_user(Student(student_id, name, email, major))
+            records.append(('add_student', (student_id, name, email, major)))
+            return f"Student {student_id} added successfully"
+
+        elif command == 'ENROLL':
+            student_id, course_id = args
+            student = university.get_student(student_id)
+            if not student:
+                return "Student not found"
+            course = university.get_course(course_id)
+            if not course:
+                return "Course not found"
+            if course_id in student.courses_enrolled:
+                return f"Student {student_id} already enrolled in {course_id}"
+            student.enroll_course(course)
+            records.append(('enroll', (student_id, course_id)))
+            return f"Student {student_id} enrolled in {course_id}"
+
+        elif command == 'PING':
+            return "PONG"
+
+        return "Unknown command"
+
+    def apply_safely(self, command_data, records):
+        try:
+            command, *args = command_data
+            return self.apply(command, args, records)
+        except Exception as e:
+            return f"Error processing command: {str(e)}"
+
+    def execute(self, command_data):
+        try:
+            command = command_data[0]
+            with nullcontext() if command in self.READ_COMMANDS else mutations.shared():
+                return self._execute(command_data)
+        except Exception as e:
+            return f"Error processing command: {str(e)}"
+
+    def _execute(self, command_data):
+        try:
+            command, *args = command_data
+            if command == 'BATCH':
+                # Lock every entity the batch touches once, then run the operations in order
+                operations = args[0]
+                keys = []
+                for operation in operations:
+                    try:
+                        keys.extend(self.lock_keys(operation))
+                    except (TypeError, ValueError):
+                        pass  # Malformed operation; apply_safely reports it in its slot
+                records = []
+                with entity_locks.hold(*keys):
+                    results = [self.apply_safely(operation, records) for operation in operations]
+                    journal.record_many(records)  # Whole batch behind one fsync, before its locks drop
+                return results
+            records = []
+            with entity_locks.hold(*self.lock_keys(command_data)):
+                response = self.apply(command, args, records)
+                journal.record_many(records)
+            return response
+        except Exception as e:
+            return f"Error processing command: {str(e)}"
+
     def handle_client(self, conn):
+        # One connection carries many frames; clients may pipeline, replies echo each request id
         try:
             while True:
-                data = conn.recv(5500)
-                if not data:
+                frame = recv_frame(conn)
+                if frame is None:
                     break
-
-                try:
-                    command_data = pickle.loads(data)
-                    command, *args = command_data
-
-                    if command == 'GET_STUDENT':
-                        student_id = args[0]
-                        response = students.get(student_id, "Student not found")
-
-                    elif command == 'ADD_STUDENT':
-                        student_id, name, email, major = args
-                        if student_id in students:
-                            response = "Student already exists"
-                        else:
-                            students[student_id] = Student(student_id, name, email, major)
-                            response = f"Student {student_id} added successfully"
-
-                    elif command == 'ENROLL':
-                        student_id, course_id = args
-                        student = students.get(student_id)
-                        if not student:
-                            response = "Student not found"
-                        else:
-                            if course_id not in courses:
-                                courses[course_id] = Course(course_id, course_id, "General", 3)  # Added required parameters
-                            if course_id not in student.courses_enrolled:
-                                student.courses_enrolled.append(course_id)
-                                response = f"Student {student_id} enrolled in {course_id}"
-                            else:
-                                response = f"Student {student_id} already enrolled in {course_id}"
-                    else:
-                        response = "Unknown command"
-
-                except Exception as e:
-                    response = f"Error processing command: {str(e)}"
-
-                conn.sendall(pickle.dumps(response))
+                request_id, command_data = frame
+                send_frame(conn, request_id, self.execute(command_data))
         except Exception as e:
             print(f"Error: {e}")
         finally:
             conn.close()
     
+    def serve_in_background(self):
+        """Serve from a daemon thread, e.g. next to the Flask app in the same process"""
+        thread = Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
     def run(self):
         print("Server is running...")
         while True:
             conn, addr = self.sock.accept()
             print(f"Connected by {addr}")
-            Thread(target=self.handle_client, args=(conn,)).start()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            Thread(target=self.handle_client, args=(conn,), daemon=True).start()
+
+class AsyncUniversityServer(UniversityServer):
+    """Same commands on one event loop; commands run on a bounded worker pool"""
+    INLINE_COMMANDS = UniversityServer.READ_COMMANDS  # Cheap lookups answered on the loop itself
+
+    def __init__(self, host='127.0.0.1', port=5500, workers=4, max_pending=1024):
+        self.workers = workers
+        self.max_pending = max_pending
+        super().__init__(host, port)
+
+    async def handle_client(self, reader, writer):
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            # Commands from one connection run in order, so pipelined writes are visible to later reads
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                request_id, command_data = frame
+                writer.write(pack_frame(request_id, await self.dispatch(command_data)))
+                await writer.drain()
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            writer.close()
+
+    async def dispatch(self, command_data):
+        if command_data and command_data[0] in self.INLINE_COMMANDS:
+            return self.execute(command_data)
+        # Backpressure: with max_pending commands queued, connections stop reading and TCP pushes back on clients
+        async with self.pending:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, self.execute, command_data)
+
+    async def serve(self):
+        self.pending = asyncio.Semaphore(self.max_pending)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        server = await asyncio.start_server(self.handle_client, sock=self.sock)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=False)
+
+    def run(self):
+        print(f"Server is running (asyncio, {self.workers} workers)...")
+        asyncio.run(self.serve())
 
 
 if __name__ == "__main__":
-    server = UniversityServer()
+    parser = argparse.ArgumentParser(description="University socket server")
+    parser.add_argument('--port', type=int, default=5500)
+    parser.add_argument('--async', dest='use_async', action='store_true', help="serve every connection from one event loop")
+    parser.add_argument('--workers', type=int, default=4, help="worker threads for commands (asyncio mode)")
+    parser.add_argument('--max-pending', type=int, default=1024, help="queued commands before reads pause (asyncio mode)")
+    options = parser.parse_args()
+    load_data()
+    if options.use_async:
+        server = AsyncUniversityServer(port=options.port, workers=options.workers, max_pending=options.max_pending)
+    else:
+        server = UniversityServer(port=options.port)
     server.run()
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from models import University, Student
+from data_manager import journal
+from locking import entity_locks
 
 students_bp = Blueprint('students', __name__)
 
@@ -15,7 +17,8 @@ def create_student():
             email=data['email'],
             major=data['major']
         )
-        university.users.append(student)
+        university.add_user(student)
+        journal.record('add_student', student.user_id, student.name, student.email, student.major)
         response_data = {
             'student_id': student.user_id,
             'name': student.name,
@@ -95,12 +98,14 @@ def enroll_student(student_id):
         if not course:
             return jsonify({'error': 'Course not found'}), 404
         
-        if student.enroll_course(course):
-            return jsonify({
-                'message': f'Student enrolled successfully'
-            }), 200
-        else:
-            return jsonify({'error': 'Student already enrolled in this course'}), 400
+        with entity_locks.hold(('student', student_id), ('course', course_id)):
+            if student.enroll_course(course):
+                journal.record('enroll', student_id, course_id)
+                return jsonify({
+                    'message': f'Student enrolled successfully'
+                }), 200
+            else:
+                return jsonify({'error': 'Student already enrolled in this course'}), 400
             
     except KeyError as e:
         return jsonify({'error': f'Missing required field: {str(e)}'}), 400
@@ -118,12 +123,14 @@ def register_student_to_library(student_id):
             return jsonify({'error': 'Student not found'}), 404
             
         library = university.library
-        if library.register_student(student):
-            return jsonify({
-                'message': f'Student {student.name} registered to library successfully'
-            }), 200
-        else:
-            return jsonify({'error': 'Student already registered in library'}), 400
+        with entity_locks.hold(('student', student_id)):
+            if library.register_student(student):
+                journal.record('register_library', student_id)
+                return jsonify({
+                    'message': f'Student {student.name} registered to library successfully'
+                }), 200
+            else:
+                return jsonify({'error': 'Student already registered in library'}), 400
             
     except Exception as e:
         print(e)
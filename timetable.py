@@ -0,0 +1,140 @@
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from intervals import parse_time_slot
+
+PARALLEL_MIN_SECTIONS = 500   # Smaller problems solve faster in-process than shipped to worker processes
+MAX_RESTARTS = 64             # Per request, so one solve can't hold the shared pool indefinitely
+_pool = None
+_pool_workers = os.cpu_count() or 1
+_pool_lock = threading.Lock()
+
+def _shared_pool():
+    """One worker pool per process, started on first use and reused by every solve"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+        return _pool
+
+def _run_restarts(problem, seeds, workers):
+    global _pool
+    if workers > 1 and len(seeds) > 1 and len(problem[0]) >= PARALLEL_MIN_SECTIONS:
+        try:
+            return list(_shared_pool().map(_greedy, [problem] * len(seeds), seeds)), min(_pool_workers, len(seeds))
+        except BrokenProcessPool:
+            with _pool_lock:
+                _pool = None   # A worker died; the next solve starts a fresh pool, this one runs in-process
+    return [_greedy(problem, seed) for seed in seeds], 1
+
+def _overlapping_slots(time_slots):
+    ranges = [parse_time_slot(slot) for slot in time_slots]
+    return [[j for j, (s2, e2) in enumerate(ranges) if s2 < e1 and s1 < e2]
+            for s1, e1 in ranges]
+
+def _greedy(problem, seed):
+    """One largest-section-first, best-fit-room pass; seed > 0 perturbs ties and cell order"""
+    sections, rooms, n_dates, overlaps, busy_rooms, busy_profs = problem
+    rng = random.Random(seed)
+    capacities = [capacity for _, capacity in rooms]
+    cells = [(d, t) for d in range(n_dates) for t in range(len(overlaps))]
+    # Free room indexes per (date, slot), kept sorted by capacity via the room order
+    free = {cell: list(range(len(rooms))) for cell in cells}
+    for d, t, r in busy_rooms:
+        if r in free[(d, t)]:
+            free[(d, t)].remove(r)
+    prof_busy = set(busy_profs)
+
+    # Largest sections first (fewest rooms fit them); restarts blur sizes by up to 20%
+    noise = (lambda: 1 + 0.2 * rng.random()) if seed else (lambda: 1)
+    order = sorted(range(len(sections)), key=lambda i: (-sections[i][2] * noise(), i))
+    placements = []
+    unplaced = []
+    wasted = 0
+    for n, i in enumerate(order):
+        section_id, professor_id, size = sections[i]
+        first = bisect_left(capacities, size)
+        if professor_id is None or first == len(rooms):
+            unplaced.append(section_id)
+            continue
+        offset = rng.randrange(len(cells)) if seed else n % len(cells)
+        for k in range(len(cells)):
+            d, t = cells[(offset + k) % len(cells)]
+            if (d, t, professor_id) in prof_busy:
+                continue
+            candidates = free[(d, t)]
+            j = bisect_left(candidates, first)
+            if j == len(candidates):
+                continue
+            r = candidates[j]
+            for o in overlaps[t]:
+                prof_busy.add((d, o, professor_id))
+                slot_free = free[(d, o)]
+                pos = bisect_left(slot_free, r)
+                if pos < len(slot_free) and slot_free[pos] == r:
+                    del slot_free[pos]
+            placements.append((section_id, d, t, r))
+            wasted += capacities[r] - size
+            break
+        else:
+            unplaced.append(section_id)
+
+    return (len(placements), -wasted), placements, unplaced
+
+def solve(sections, rooms, dates, time_slots, busy=(), workers=None, restarts=8):
+    """Assign each section a (date, time slot, room) with no room or professor clash.
+
+    sections: [(section_id, professor_id, enrolled)], rooms: [(room_id, capacity)],
+    busy: existing bookings as [(date, time_slot, room_id, professor_id)].
+    Restarts with different seeds run on a shared process pool (in-process for small problems
+    or workers=1); the best pass wins.
+    """
+    started = time.perf_counter()
+    overlaps = _overlapping_slots(time_slots)
+    rooms = sorted(rooms, key=lambda room: room[1])
+    room_pos = {room_id: r for r, (room_id, _) in enumerate(rooms)}
+    date_pos = {date: d for d, date in enumerate(dates)}
+    slot_ranges = [parse_time_slot(slot) for slot in time_slots]
+
+    busy_rooms, busy_profs = [], []
+    for date, time_slot, room_id, professor_id in busy:
+        if date not in date_pos:
+            continue
+        try:
+            start, end = parse_time_slot(time_slot)
+        except ValueError:
+            continue
+        d = date_pos[date]
+        for t, (s, e) in enumerate(slot_ranges):
+            if s < end and start < e:
+                if room_id in room_pos:
+                    busy_rooms.append((d, t, room_pos[room_id]))
+                busy_profs.append((d, t, professor_id))
+
+    problem = (list(sections), rooms, len(dates), overlaps, busy_rooms, busy_profs)
+    seeds = list(range(max(1, restarts)))
+    runs, workers = _run_restarts(problem, seeds, workers or _pool_workers)
+    score, placements, unplaced = max(runs, key=lambda run: run[0])
+
+    sizes = {section_id: size for section_id, _, size in sections}
+    assignments = [(section_id, dates[d], time_slots[t], rooms[r][0]) for section_id, d, t, r in placements]
+    utilization = [sizes[section_id] / rooms[r][1] for section_id, _, _, r in placements if rooms[r][1]]
+    return {
+        "assignments": assignments,
+        "unplaced": unplaced,
+        "metrics": {
+            "solve_seconds": round(time.perf_counter() - started, 4),
+            "sections": len(sections),
+            "placed": score[0],
+            "unplaced": len(unplaced),
+            "placement_rate": score[0] / len(sections) if sections else 1.0,
+            "wasted_seats": -score[1],
+            "avg_seat_utilization": sum(utilization) / len(utilization) if utilization else None,
+            "restarts": len(seeds),
+            "workers": workers,
+        }
+    }
@@ -1,5 +1,24 @@
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from models import Student  # Import your Student class
+from models import Student, Professor, Course, University, Library  # Import your Student class
+
+def make_library(library_id, books, students=()):
+    """A Library with books [(book_id, title, author[, copies])] added and the given student IDs registered"""
+    library = Library(library_id)
+    for book in books:
+        library.add_book(*book)
+    for student_id in students:
+        library.register_student(Student(student_id, student_id, f"{student_id.lower()}@uni.edu", "CS"))
+    return library
+
+def reloaded(obj):
+    """obj after a pickle round trip, as a saved snapshot would load it"""
+    return pickle.loads(pickle.dumps(obj))
 
 class TestStudent(unittest.TestCase):
     def setUp(self):
@@ -21,5 +40,705 @@ class TestStudent(unittest.TestCase):
         self.student.update_grade("CSC101", "A")
         self.assertEqual(self.student.grades["CSC101"], "A")  # Check grade update
 
+class TestUniversityRegistry(unittest.TestCase):
+    def setUp(self):
+        self.university = University()
+
+    def test_lookup_by_role(self):
+        student = Student("S1", "Jane Roe", "jane@uni.edu", "Math")
+        professor = Professor("P1", "Dr. Smith", "smith@uni.edu", "Math")
+        course = Course("MTH101", "Calculus", "Math", 3)
+        self.university.add_user(student)
+        self.university.add_user(professor)
+        self.university.add_course(course)
+        self.assertIs(self.university.get_student("S1"), student)
+        self.assertIs(self.university.get_professor("P1"), professor)
+        self.assertIs(self.university.get_course("MTH101"), course)
+        self.assertIsNone(self.university.get_student("P1"))  # Wrong role
+
+    def test_reindex_after_bulk_replace(self):
+        student = Student("S2", "John Roe", "john@uni.edu", "CS")
+        self.university.users = [student]
+        self.university.classrooms = []
+        self.university.reindex()
+        self.assertIs(self.university.get_user("S2"), student)
+        self.assertEqual(self.university.classrooms, {})
+
+class TestSlottedModels(unittest.TestCase):
+    def test_legacy_dict_state_still_loads(self):
+        student = Student("S1", "A", "a@uni.edu", "CS")
+        self.assertFalse(hasattr(student, '__dict__'))
+        # What a pre-slots snapshot stores: a plain __dict__, here from before library fields existed
+        legacy = Student.__new__(Student)
+        legacy.__setstate__({'user_id': "S1", 'name': "A", 'role': "student", 'email': "a@uni.edu",
+                             'logged_in': False, 'major': "CS", 'courses_enrolled': ["C1"], 'grades': {}})
+        self.assertEqual((legacy.courses_enrolled, legacy.borrowed_books, legacy.libraryRegistered), (["C1"], [], False))
+        course = reloaded(Course("C1", "Algorithms", "CS", 3))
+        self.assertFalse(hasattr(course, 'exams'))  # Created on first scheduled exam, as before
+        self.assertIs(course.course_id, sys.intern("C1"))
+
+class TestEnrollmentSets(unittest.TestCase):
+    def test_both_sides_stay_in_step(self):
+        university = University.get_instance()
+        course = Course("SET-C1", "Sets", "CS", 3)
+        university.add_course(course)
+        student = Student("SET-S1", "A", "a@uni.edu", "CS")
+        self.assertTrue(course.add_student(student))
+        self.assertFalse(course.add_student(student))
+        self.assertEqual(student.courses_enrolled, ["SET-C1"])   # course_id, not the course name
+        self.assertIn(student, course.enrolled_students)
+        student.drop_course("SET-C1")
+        self.assertNotIn(student, course.enrolled_students)
+        self.assertEqual(student.to_dict()['courses_enrolled'], [])
+
+    def test_legacy_lists_become_sets(self):
+        legacy = Course.__new__(Course)
+        legacy.__setstate__({'course_id': "SET-C2", 'name': "Old", 'department': "CS", 'credits': 3,
+                             'enrolled_students': [], 'professor': None})
+        student = Student("SET-S2", "A", "a@uni.edu", "CS")
+        student.courses_enrolled.add("Old")
+        legacy.enrolled_students.append(student)
+        restored = reloaded(legacy)
+        self.assertEqual(len(restored.enrolled_students), 1)
+        self.assertEqual(next(iter(restored.enrolled_students)).courses_enrolled, ["Old"])
+
+class TestGradebook(unittest.TestCase):
+    def test_running_totals_follow_model_changes(self):
+        from gradebook import Gradebook
+        university = University.get_instance()
+        course = Course("GB-C1", "Gradebook", "CS", 3)
+        university.add_course(course)
+        students = [Student(f"GB-S{i}", "A", "a@uni.edu", "CS") for i in range(4)]
+        gradebook = university.get_gradebook()
+        for student, grade in zip(students, "ABF"):
+            student.enroll_course(course)
+            student.update_grade("GB-C1", grade)
+        students[3].enroll_course(course)  # Enrolled, not graded yet
+        students[2].drop_course("GB-C1")
+        stats = gradebook.course_stats("GB-C1")
+        self.assertEqual((stats['graded'], stats['average']), (2, 90.0))
+        self.assertEqual(stats['distribution'], {'A': 1, 'B': 1, 'C': 0, 'D': 0, 'F': 0})
+        self.assertEqual(gradebook.student_gpa("GB-S1"), 3.0)
+        self.assertEqual(Gradebook.from_courses([course]).course_stats("GB-C1"), stats)  # Same as a rebuild
+
+class TestExamRegistry(unittest.TestCase):
+    def test_lookups_and_legacy_course_exams(self):
+        from models import Classroom, Exam
+        university = University.get_instance()
+        course = Course("EX-C1", "Exams", "CS", 3)
+        room = Classroom("EX-R1", "Hall", 100)
+        university.add_course(course)
+        self.assertTrue(Exam("EX-1", course, "2025-01-10", 90).schedule_exam(room))
+        self.assertFalse(Exam("EX-2", course, "2025-01-10", 90).schedule_exam(room))  # Room taken
+        self.assertIs(university.get_exam("EX-1").classroom, room)
+        self.assertIsNone(university.get_exam("EX-2"))
+        self.assertEqual([e.exam_id for e in course.exams], ["EX-1"])
+        registry = university.get_exam_registry()
+        self.assertEqual([e.exam_id for e in registry.by_room("EX-R1")], ["EX-1"])
+        self.assertEqual([e.exam_id for e in registry.by_date("2025-01-10")], ["EX-1"])
+
+        # Exams an older snapshot only kept on their course are picked up on the next rebuild
+        legacy = Exam("EX-3", course, "2025-01-11", 60)
+        course.exams.append(legacy)
+        university.reindex()
+        self.assertIs(university.get_exam("EX-3"), legacy)
+        self.assertEqual([e.exam_id for e in university.get_exam_registry().by_course("EX-C1")], ["EX-1", "EX-3"])
+
+class TestBulkExamResults(unittest.TestCase):
+    def test_streamed_rows_are_batched_and_rejects_reported(self):
+        import io
+        from unittest import mock
+        from models import Classroom, Exam
+        from exam import import_exam_results
+        from bulk_rows import read_rows
+        university = University.get_instance()
+        course = Course("BER-C1", "Bulk results", "CS", 3)
+        university.add_course(course)
+        for i in range(3):
+            university.add_user(Student(f"BER-S{i}", "A", "a@uni.edu", "CS"))
+        Exam("BER-1", course, "2025-02-10", 60).schedule_exam(Classroom("BER-R1", "Hall", 100))
+        body = b"studentId,grade\nBER-S0,90\nBER-S1,\nBER-S9,70\nBER-S0,50\nBER-S2,80\nBER-S1,65\n"
+        with mock.patch('exam.journal') as journal:
+            summary = import_exam_results(university, read_rows(io.BytesIO(body), 'text/csv'),
+                                          exam_id="BER-1", batch_size=2)
+        self.assertEqual((summary["rows"], summary["recorded"], summary["rejected"]), (6, 3, 3))
+        self.assertEqual([(r["row"], r["error"]) for r in summary["rejected_rows"]],
+                         [(2, "Missing required fields"), (3, "Student not found"), (4, "Result already exists")])
+        self.assertEqual(journal.record.call_count, 2)
+        self.assertEqual(university.get_exam("BER-1").student_results, {"BER-S0": "90", "BER-S2": "80", "BER-S1": "65"})
+
+        rows = list(read_rows(io.BytesIO(b'{"studentId": "BER-S1", "grade": 70}\nnot json\n'), 'application/x-ndjson'))
+        self.assertEqual(rows, [{"studentId": "BER-S1", "grade": 70}, None])
+
+class TestExamStats(unittest.TestCase):
+    def test_running_aggregates_match_a_full_scan(self):
+        import random
+        import statistics
+        from models import Exam
+        course = Course("EXS-C1", "Stats", "CS", 3)
+        exam = Exam("EXS-1", course, "2025-03-01", 60)
+        exam.get_stats()  # Built empty; every result below goes through the running update
+        rng = random.Random(7)
+        grades = [rng.randint(0, 100) for _ in range(500)]
+        for i, grade in enumerate(grades):
+            exam.add_result(Student(f"EXS-S{i}", "A", "a@uni.edu", "CS"), str(grade) if i % 2 else grade)
+        exam.add_result(Student("EXS-X", "A", "a@uni.edu", "CS"), "absent")  # Not numeric, not counted
+
+        summary = exam.get_stats().summary(percentiles=(50, 100))
+        self.assertEqual(summary['count'], 500)
+        self.assertAlmostEqual(summary['average'], statistics.mean(grades))
+        self.assertAlmostEqual(summary['std_dev'], statistics.pstdev(grades))
+        self.assertEqual((summary['min'], summary['max'], summary['percentiles']['100']), (min(grades), max(grades), max(grades)))
+        self.assertEqual(summary['percentiles']['50'], sorted(grades)[249])
+        self.assertEqual(sum(summary['histogram'].values()), 500)
+
+        restored = reloaded(exam)  # Stats are not pickled; rebuilt on first use
+        self.assertNotIn('_stats', vars(restored))
+        rebuilt = restored.get_stats().summary(percentiles=(50, 100))
+        self.assertAlmostEqual(rebuilt.pop('std_dev'), summary.pop('std_dev'))
+        self.assertEqual(rebuilt, summary)
+
+class TestExamRooms(unittest.TestCase):
+    def test_overlaps_and_capacity_are_checked(self):
+        from models import Classroom, Exam
+        university = University.get_instance()
+        course = Course("EXR-C1", "Rooms", "CS", 3)
+        university.add_course(course)
+        for i in range(50):
+            Student(f"EXR-S{i}", "A", "a@uni.edu", "CS").enroll_course(course)
+        small, large = Classroom("EXR-R1", "Hall", 30), Classroom("EXR-R2", "Hall", 25)
+        self.assertFalse(Exam("EXR-1", course, "2025-04-01", 120).schedule_exam(small))  # 50 students, 30 seats
+        split = Exam("EXR-2", course, "2025-04-01", 120)
+        self.assertTrue(split.schedule_exam([small, large], "09:00"))
+        self.assertEqual([(room.classroom_id, seats) for room, seats in split.rooms], [("EXR-R1", 30), ("EXR-R2", 20)])
+        # 10:30 starts inside the 09:00-11:00 booking; the old exact-match check let it through
+        self.assertFalse(Exam("EXR-3", course, "2025-04-01", 60).schedule_exam([small, large], "10:30"))
+        self.assertTrue(Exam("EXR-4", course, "2025-04-01", 60).schedule_exam([small, large], "11:00"))
+
+    def test_room_bookings_stay_in_step_with_the_schedule(self):
+        from models import Classroom
+        room = Classroom("EXR-R3", "Annex", 40)
+        room.schedule["2025-04-02"] = ["09:00-12:00", "10:00-11:00", "Lunch"]   # Older data may overlap
+        self.assertTrue(room.is_allocated("2025-04-02", "11:30-12:30"))
+        self.assertTrue(room.is_allocated("2025-04-02", "Lunch"))
+        self.assertTrue(room.allocate("2025-04-02", "12:00-13:00"))
+        self.assertFalse(room.allocate("2025-04-02", "12:30-13:30"))
+        room.release("2025-04-02", "09:00-12:00")
+        self.assertFalse(room.is_allocated("2025-04-02", "09:00-10:00"))
+        restored = reloaded(room)   # The parsed view is rebuilt, not pickled
+        self.assertTrue(restored.is_allocated("2025-04-02", "12:15-12:45"))
+
+    def test_planner_splits_rooms_and_avoids_student_clashes(self):
+        from exam_planner import plan_exams
+        exams = [("BIG", 120, [f"S{i}" for i in range(100)]),
+                 ("CLASH", 60, ["S1", "X1"]),
+                 ("FREE", 60, ["X2"]),
+                 ("HUGE", 60, [f"H{i}" for i in range(1000)])]
+        rooms = [("R60", 60), ("R50", 50), ("R10", 10)]
+        plan = plan_exams(exams, rooms, ["2025-05-01"], ["09:00", "10:00", "13:00"],
+                          busy=[("2025-05-01", "13:00-14:00", "R60")])
+        placed = {exam_id: (time_slot, seating) for exam_id, _, time_slot, seating in plan["assignments"]}
+        self.assertEqual(sorted(placed["BIG"][1]), [("R50", 40), ("R60", 60)])
+        big_start, clash_start = placed["BIG"][0][:5], placed["CLASH"][0][:5]
+        self.assertEqual(big_start, "09:00")   # 09:00-11:00 blocks both 09:00 and 10:00 for S1
+        self.assertEqual(clash_start, "13:00")
+        self.assertNotIn("R60", [room for room, _ in placed["CLASH"][1]])   # Booked 13:00-14:00
+        self.assertEqual(plan["unplaced"], [{"examId": "HUGE", "reason": "More students than all rooms seat"}])
+
+        overlapping = [("2025-05-01", "09:00-12:00", "R10"), ("2025-05-01", "09:30-10:00", "R10")]   # Older data
+        plan = plan_exams([("LATE", 30, ["S1"])], [("R10", 10)], ["2025-05-01"], ["11:00", "12:00"], busy=overlapping)
+        self.assertEqual(plan["assignments"][0][2], "12:00-12:30")
+
+class TestLibraryCatalog(unittest.TestCase):
+    def test_search_and_availability_follow_the_books(self):
+        library = make_library("LIB-T", [("B1", "Dune", "Frank Herbert"), ("B2", "Dune Messiah", "Frank Herbert"),
+                                         ("B3", "Children of Dune", "Frank Herbert")], ["LIB-S1"])
+        catalog, availability = library.get_catalog(), library.get_availability()
+        library.add_book("B4", "Herbert's Garden", "Ann Gardner")   # Indexed as it is added
+        self.assertEqual(catalog.search("dune messiah"), (1, [("B2", 8)]))
+        total, hits = catalog.search("herb")    # Prefix; a title match outranks author matches
+        self.assertEqual((total, hits[0][0]), (4, "B4"))
+        self.assertEqual(catalog.search("dune", offset=1, limit=1)[1], [("B2", 4)])
+        self.assertEqual(catalog.search("zzz"), (0, []))
+
+        library.borrow_book("LIB-S1", "B2")
+        self.assertEqual(availability.page(limit=2), (["B1", "B3"], "B3"))
+        self.assertEqual(availability.page(after="B3", limit=2), (["B4"], None))
+        library.return_book("LIB-S1", "B2")
+        self.assertIn("B2", availability)
+
+        restored = reloaded(library)   # Indexes are rebuilt, not pickled
+        self.assertNotIn('_catalog', vars(restored))
+        self.assertEqual(restored.get_catalog().search("dune messiah"), (1, [("B2", 8)]))
+        self.assertEqual(len(restored.get_availability()), 4)
+
+    def test_books_added_during_an_index_build_are_indexed(self):
+        library = make_library("LIB-TB", [("B0", "Dune", "Frank Herbert")])
+        adder = threading.Thread(target=lambda: [library.add_book(f"B{i}", f"Dune {i}", "Frank Herbert")
+                                                 for i in range(1, 3000)])
+        adder.start()
+        while adder.is_alive():
+            library.__dict__.pop('_catalog', None)   # Keep rebuilding while books arrive
+            library.__dict__.pop('_availability', None)
+            library.get_catalog()
+            library.get_availability()
+        adder.join()
+        self.assertEqual((len(library.get_catalog()), len(library.get_availability())), (3000, 3000))
+
+class TestLibraryHolds(unittest.TestCase):
+    def test_copies_holds_and_overdue(self):
+        library = make_library("LIB-H", [("B1", "Dune", "Frank Herbert", 2)], ["H1", "H2", "H3", "H4"])
+        library.borrow_book("H1", "B1", now=0)
+        library.borrow_book("H2", "B1", now=100)
+        self.assertFalse(library.books["B1"]["available"])
+        with self.assertRaises(Exception):
+            library.borrow_book("H3", "B1")
+        self.assertEqual((library.place_hold("H3", "B1"), library.place_hold("H4", "B1")), (1, 2))
+
+        library.return_book("H1", "B1", now=50)   # The copy goes to the first in line, not the shelf
+        self.assertIn(("H3", "B1"), library.loans)
+        self.assertEqual(list(library.holds["B1"]), ["H4"])
+        library.add_copies("B1", 1, now=60)
+        self.assertNotIn("B1", library.holds)
+        self.assertEqual(library.books["B1"]["copies"], 3)
+
+        day = Library.LOAN_PERIOD
+        self.assertEqual(library.overdue(now=day + 55), [("H3", "B1", day + 50)])
+        library.return_book("H3", "B1", now=day + 56)
+        self.assertEqual(library.overdue(now=day + 100), [("H4", "B1", day + 60), ("H2", "B1", day + 100)])
+
+        legacy = Library("LIB-OLD")   # Saved before copies: a single copy, out with borrowed_by
+        legacy.books = {"B9": {"title": "T", "author": "A", "available": False, "borrowed_by": "H1"}}
+        for key in ("loans", "holds"):
+            del legacy.__dict__[key]
+        restored = reloaded(legacy)
+        self.assertEqual((restored.books["B9"]["copies"], restored.books["B9"]["on_shelf"]), (1, []))
+        self.assertIn(("H1", "B9"), restored.loans)
+
+    def test_return_skips_a_holder_no_longer_registered(self):
+        library = make_library("LIB-H2", [("B1", "Dune", "Frank Herbert")], ["H1", "H2", "H3"])
+        library.borrow_book("H1", "B1", now=0)
+        library.place_hold("H2", "B1")
+        library.place_hold("H3", "B1")
+        library.students_registered["H2"].libraryRegistered = False
+        library.return_book("H1", "B1", now=10)
+        self.assertIn(("H3", "B1"), library.loans)
+        self.assertNotIn(("H2", "B1"), library.loans)
+        self.assertEqual(library.overdue(now=Library.LOAN_PERIOD + 10), [("H3", "B1", Library.LOAN_PERIOD + 10)])
+
+class TestCatalogImport(unittest.TestCase):
+    def test_import_dedupes_batches_and_indexes_once(self):
+        import io
+        from unittest import mock
+        from library import import_books
+        from bulk_rows import read_rows
+        library = make_library("LIB-I", [("B0", "Emma", "Jane Austen")])
+        library.get_catalog()
+        body = b"bookId,title,author,copies\nB1,Dune,Frank Herbert,2\nB0,Emma,JA,\nB2,,Nobody,\nB1,Dune again,FH,\nB3,Persuasion,Jane Austen,\n"
+        with mock.patch('library.journal') as journal:
+            summary = import_books(library, read_rows(io.BytesIO(body), 'text/csv'), batch_size=1)
+        self.assertEqual((summary["rows"], summary["added"], summary["duplicates"], summary["rejected"]), (5, 2, 2, 1))
+        self.assertEqual(journal.record.call_count, 2)
+        self.assertEqual((library.books["B1"]["title"], library.books["B1"]["copies"]), ("Dune", 2))
+        self.assertEqual(library.get_catalog().search("austen")[0], 2)
+
+        marc = b'{"001": "B4", "245": {"a": "Sanditon"}, "100": {"a": "Jane Austen"}}\n'
+        with mock.patch('library.journal'):
+            import_books(library, read_rows(io.BytesIO(marc), 'application/x-ndjson'))
+        self.assertEqual(library.books["B4"]["title"], "Sanditon")
+
+        rows = b'{"bookId": 7, "title": "Kim", "author": "Kipling"}\n' \
+               b'{"001": "B5", "245": {"b": "no main title"}, "100": "Someone"}\n' \
+               b'{"bookId": "B6", "title": "Kim", "author": {"name": "Kipling"}}\n'
+        with mock.patch('library.journal'):
+            summary = import_books(library, read_rows(io.BytesIO(rows), 'application/x-ndjson'))
+        self.assertIn("7", library.books)
+        self.assertEqual([(r["bookId"], r["error"]) for r in summary["rejected_rows"]],
+                         [("B5", "Missing required fields"), ("B6", "title and author must be text")])
+
+class TestLoanHistory(unittest.TestCase):
+    def test_history_survives_returns_and_pickling(self):
+        from circulation import week_of_date
+        library = make_library("LIB-LH", [("B1", "Dune", "Frank Herbert")], ["LH1", "LH2"])
+        monday = 1736121600   # 2025-01-06
+        day = 24 * 60 * 60
+        library.borrow_book("LH1", "B1", now=monday)
+        library.place_hold("LH2", "B1")
+        library.return_book("LH1", "B1", now=monday + 3 * day)     # Handed straight to LH2
+        library.return_book("LH2", "B1", now=monday + 8 * day)
+        library.borrow_book("LH1", "B1", now=monday + 9 * day)
+
+        history = reloaded(library).history
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history.title_weeks("B1"), [("2025-01-06", 2), ("2025-01-13", 1)])
+        self.assertEqual(history.title_weeks("B1", first=week_of_date("2025-01-13")), [("2025-01-13", 1)])
+        self.assertEqual(history.top_borrowers(1), [("LH1", 2)])
+        self.assertEqual(history.loan_durations(), [("2025-01-06", 1, 3 * day), ("2025-01-13", 1, 5 * day)])
+        self.assertEqual(history.summary()["average_loan_seconds"], 4 * day)
+
+class TestLoanIndex(unittest.TestCase):
+    def test_loans_by_student_and_book_track_every_change(self):
+        library = make_library("LIB-LI", [("B1", "Dune", "Frank Herbert", 2), ("B2", "Emma", "Jane Austen")],
+                               ["LI1", "LI2", "LI3"])
+        index = library.get_loan_index()
+        library.borrow_book("LI1", "B1")
+        library.borrow_book("LI1", "B2")
+        library.borrow_book("LI2", "B1")
+        library.place_hold("LI3", "B1")
+        library.return_book("LI1", "B1")    # Handed to LI3
+
+        total, loans = index.student_loans("LI1")
+        self.assertEqual((total, [loan.book_id for loan in loans]), (1, ["B2"]))
+        self.assertEqual(sorted(loan.student_id for loan in index.borrowers("B1")), ["LI2", "LI3"])
+        self.assertEqual(index.student_loans("LI3", offset=0, limit=1)[1][0].book_id, "B1")
+        self.assertEqual(index.count("LI9"), 0)
+
+        restored = reloaded(library).get_loan_index()   # Rebuilt from loans on load
+        self.assertEqual(sorted((loan.student_id, loan.book_id) for loan in restored.borrowers("B1")),
+                         [("LI2", "B1"), ("LI3", "B1")])
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        from data_manager import Journal
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.journal = Journal(self.path)
+
+    def tearDown(self):
+        self.journal.truncate()
+        os.remove(self.path)
+
+    def test_replay_in_order(self):
+        self.journal.record('enroll', 'S1', 'C1')
+        self.journal.record('grade', 'S1', 'C1', 'A')
+        self.assertEqual(list(self.journal.replay()),
+                         [('enroll', ('S1', 'C1')), ('grade', ('S1', 'C1', 'A'))])
+
+    def test_torn_tail_is_ignored(self):
+        self.journal.record('enroll', 'S1', 'C1')
+        with open(self.path, "ab") as f:
+            f.write(b"\x00\x00\x00\x40partial")
+        self.assertEqual(len(list(self.journal.replay())), 1)
+
+    def test_checkpoint_waits_for_a_mutation_to_be_journaled(self):
+        from locking import SharedExclusiveLock
+        gate = SharedExclusiveLock()
+        applied = threading.Event()
+
+        def mutate():
+            with gate.shared():
+                applied.set()
+                time.sleep(0.05)   # A concurrent compaction must not truncate before this record lands
+                self.journal.record('enroll', 'S1', 'C1')
+        writer = threading.Thread(target=mutate)
+        writer.start()
+        applied.wait()
+        with gate.exclusive():
+            self.journal.checkpoint(self.path + ".snap", lambda f: f.write(b"snapshot"))
+        writer.join()
+        os.remove(self.path + ".snap")
+        self.assertEqual(list(self.journal.replay()), [])
+
+class TestSectionedSnapshot(unittest.TestCase):
+    def test_sections_load_on_first_access(self):
+        from data_manager import SnapshotReader, write_snapshot
+        source = University()
+        source.library = Library("LIB-01")
+        source.schedules = []
+        source.exams = []
+        student = Student("S3", "Ann Lee", "ann@uni.edu", "CS")
+        source.add_user(student)
+        source.library.register_student(student)
+
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            write_snapshot(f, source)
+        target = University()
+        reader = SnapshotReader(path)
+        reader.attach(target)
+        try:
+            self.assertNotIn('schedules', vars(target))
+            registered = target.library.students_registered["S3"]
+            self.assertIs(registered, target.get_student("S3"))  # Cross-section identity kept
+            self.assertNotIn('schedules', vars(target))
+            self.assertEqual(target.schedules, [])
+        finally:
+            reader.close()
+            os.remove(path)
+
+class TestConcurrentWriters(unittest.TestCase):
+    WRITERS = 64
+
+    def run_writers(self, target):
+        barrier = threading.Barrier(self.WRITERS)
+        results = [None] * self.WRITERS
+        def worker(i):
+            barrier.wait()
+            try:
+                results[i] = target(i)
+            except Exception:
+                results[i] = False
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.WRITERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_book_is_borrowed_once(self):
+        library = make_library("LIB-T", [("B1", "Dune", "Herbert")], [f"S{i}" for i in range(self.WRITERS)])
+        results = self.run_writers(lambda i: library.borrow_book(f"S{i}", "B1"))
+        self.assertEqual(results.count(True), 1)
+
+    def test_no_lost_enrollments(self):
+        course = Course("CSC200", "Systems", "CS", 3)
+        students = [Student(f"S{i}", "Student", "s@uni.edu", "CS") for i in range(self.WRITERS)]
+        self.run_writers(lambda i: students[i].enroll_course(course))
+        self.assertEqual(len(course.enrolled_students), self.WRITERS)
+
+    def test_room_slot_booked_once(self):
+        from models import Classroom
+        room = Classroom("R1", "Main", 30)
+        results = self.run_writers(lambda i: room.allocate("2030-01-01", "09:00-10:00"))
+        self.assertEqual(results.count(True), 1)
+
+    def test_gradebook_built_during_enrollments_misses_none(self):
+        from unittest import mock
+        university = University()
+        courses = [Course(f"GBW-C{c}", "Load", "CS", 3) for c in range(50)]
+        for course in courses:
+            university.add_course(course)
+        students = [Student(f"GBW-S{i}", "Student", "s@uni.edu", "CS") for i in range(self.WRITERS)]
+
+        def enroll(i):
+            for course in courses:
+                students[i].enroll_course(course)
+                students[i].update_grade(course.course_id, "A")
+            return True
+
+        with mock.patch.object(University, '_instance', university):
+            results = []
+            writers = threading.Thread(target=lambda: results.extend(self.run_writers(enroll)))
+            writers.start()
+            while writers.is_alive():
+                university.__dict__.pop('_gradebook', None)   # Keep rebuilding while enrollments land
+                university.get_gradebook()
+            writers.join()
+            gradebook = university.get_gradebook()
+        self.assertEqual(results, [True] * self.WRITERS)
+        self.assertEqual(len(gradebook), self.WRITERS * len(courses))
+        self.assertEqual({gradebook.course_stats(c.course_id)['graded'] for c in courses}, {self.WRITERS})
+
+class TestScheduleConflicts(unittest.TestCase):
+    def setUp(self):
+        from models import Classroom
+        self.course = Course("SCH101", "Timetabling", "CS", 3)
+        self.professor = Professor("P-SCH", "Dr. Slot", "slot@uni.edu", "CS")
+        self.room = Classroom("R-SCH", "Annex", 40)
+        self.other_room = Classroom("R-SCH2", "Annex", 40)
+        self.third_room = Classroom("R-SCH3", "Annex", 40)
+
+    def schedule(self, schedule_id, time_slot, room=None, professor=None):
+        from models import Schedule
+        return Schedule(schedule_id, self.course, professor or self.professor,
+                        time_slot, room or self.room, "2031-03-01")
+
+    def test_overlapping_ranges_clash(self):
+        self.assertTrue(self.schedule("SCH-1", "09:00-10:30").assign_schedule())
+        self.assertFalse(self.schedule("SCH-2", "10:00-11:00").assign_schedule())  # Same room
+        other = Professor("P-SCH2", "Dr. Other", "other@uni.edu", "CS")
+        self.assertFalse(self.schedule("SCH-3", "10:00-11:00", self.other_room).assign_schedule())  # Same professor
+        self.assertTrue(self.schedule("SCH-4", "10:30-11:00", professor=other).assign_schedule())  # Back to back
+
+    def test_update_ignores_itself(self):
+        first = self.schedule("SCH-5", "13:00-14:00")
+        self.assertTrue(first.assign_schedule())
+        self.assertTrue(first.update_schedule(new_time_slot="13:30-14:30"))
+        self.assertFalse(self.schedule("SCH-6", "14:00-15:00", self.other_room).assign_schedule())
+
+    def test_update_keeps_legacy_free_form_slots(self):
+        legacy = self.schedule("SCH-7", "Monday morning")
+        self.assertTrue(legacy.update_schedule(new_location=self.other_room))
+        self.assertIs(legacy.classroom, self.other_room)
+
+    def test_overlapping_legacy_rows_still_clash(self):
+        from unittest import mock
+        university = University()
+        university.schedules = [self.schedule("SCH-8", "09:00-12:00"),
+                                self.schedule("SCH-9", "10:00-10:30", self.other_room)]   # Older data may overlap
+        with mock.patch.object(University, 'get_instance', return_value=university):
+            self.assertFalse(self.schedule("SCH-10", "11:00-11:30", self.third_room).assign_schedule())
+            self.assertFalse(self.schedule("SCH-11", "11:00-11:30").assign_schedule())
+
+class TestBulkScheduleImport(unittest.TestCase):
+    def test_rows_clash_within_batch(self):
+        from models import Classroom
+        from unittest import mock
+        from schedules import import_schedules
+        university = University()
+        university.add_course(Course("BLK101", "Bulk", "CS", 3))
+        university.add_user(Professor("P-BLK", "Dr. Bulk", "bulk@uni.edu", "CS"))
+        university.add_classroom(Classroom("R-BLK", "Hall", 30))
+        row = {"courseId": "BLK101", "professorId": "P-BLK", "classroomId": "R-BLK", "date": "2031-04-01"}
+        rows = [dict(row, scheduleId="BLK-1", timeSlot="09:00-10:00"),
+                dict(row, scheduleId="BLK-2", timeSlot="09:30-10:30"),
+                dict(row, scheduleId="BLK-3", timeSlot="10:00-11:00"),
+                dict(row, scheduleId="BLK-4", courseId="NOPE", timeSlot="12:00-13:00"),
+                "not a row"]
+        with mock.patch.object(University, 'get_instance', return_value=university), \
+             mock.patch('schedules.journal') as journal:
+            results, accepted = import_schedules(university, rows)
+        self.assertEqual([r["status"] for r in results], ["created", "error", "created", "error", "error"])
+        self.assertEqual([a[0] for a in accepted], ["BLK-1", "BLK-3"])
+        journal.record.assert_called_once_with('schedule_bulk', accepted)
+
+class TestTimetableSolver(unittest.TestCase):
+    def test_respects_capacity_and_clashes(self):
+        from timetable import solve
+        sections = [("BIG", "P1", 80), ("SMALL", "P1", 20), ("OTHER", "P2", 25), ("HUGE", "P3", 500)]
+        rooms = [("R-S", 30), ("R-L", 100)]
+        busy = [("2031-05-01", "09:00-10:00", "R-L", "P9")]
+        result = solve(sections, rooms, ["2031-05-01"], ["09:00-10:00", "10:00-11:00"], busy, workers=1)
+        placed = {course: (slot, room) for course, _, slot, room in result["assignments"]}
+        self.assertEqual(placed["BIG"], ("10:00-11:00", "R-L"))      # Only free room that fits
+        self.assertNotEqual(placed["SMALL"][0], placed["BIG"][0])      # Same professor
+        self.assertEqual(len({value for value in placed.values()}), len(placed))
+        self.assertEqual(result["unplaced"], ["HUGE"])
+
+class TestFraming(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from data_manager import journal
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.journal_path, journal.path = journal.path, os.path.join(cls.tmp.name, "journal.log")
+
+    @classmethod
+    def tearDownClass(cls):
+        from data_manager import journal
+        journal.truncate()
+        journal.path = cls.journal_path
+        cls.tmp.cleanup()
+
+    def test_large_and_coalesced_frames(self):
+        import socket
+        from protocol import pack_frame, recv_frame
+        left, right = socket.socketpair()
+        big = "x" * 100_000
+        left.sendall(pack_frame(1, big) + pack_frame(2, ('GET_STUDENT', 'S1')))  # One write, two frames
+        left.close()
+        self.assertEqual(recv_frame(right), (1, big))
+        self.assertEqual(recv_frame(right), (2, ['GET_STUDENT', 'S1']))
+        self.assertIsNone(recv_frame(right))
+        right.close()
+
+    def test_codec_refuses_objects_and_bad_input(self):
+        from protocol import encode_message, decode_message
+        message = {'ok': [None, True, -1, 2**40, 1.5, "é" * 40, b"\x00"], 'n': {'x': 300}}
+        self.assertEqual(decode_message(encode_message(message)), message)
+        self.assertEqual(encode_message({'a': 1}), b'\x81\xa1a\x01')  # Same bytes msgpack produces
+        with self.assertRaises(TypeError):
+            encode_message(Student("S1", "A", "a@uni.edu", "CS"))
+        for bad in (b'\xa5ab', b'\xc1', b'\x00\x00', b'\x91' * 100):
+            with self.assertRaises(ValueError):
+                decode_message(bad)
+
+    def test_pipelined_replies_match_requests(self):
+        from client import UniversityClient
+        from server import UniversityServer
+        server = UniversityServer(port=0)
+        threading.Thread(target=server.run, daemon=True).start()
+        client = UniversityClient(port=server.port)
+        replies = client.pipeline([('ADD_STUDENT', 'PIPE1', 'A', 'a@uni.edu', 'CS'),
+                                   ('GET_STUDENT', 'PIPE1'), ('NOPE',)])
+        client.close()
+        self.assertEqual(replies[0], "Student PIPE1 added successfully")
+        self.assertEqual(replies[1]['student_id'], 'PIPE1')
+        self.assertEqual(replies[2], "Unknown command")
+
+    def test_batch_returns_one_result_per_operation(self):
+        from client import UniversityClient
+        from server import UniversityServer
+        server = UniversityServer(port=0)
+        threading.Thread(target=server.run, daemon=True).start()
+        client = UniversityClient(port=server.port)
+        for course_id in ('BATCH-C1', 'BATCH-C2'):
+            University.get_instance().add_course(Course(course_id, "Batch", "CS", 3))
+        results = client.batch([('ADD_STUDENT', 'BATCH1', 'A', 'a@uni.edu', 'CS'),
+                                ('ENROLL', 'BATCH1', 'BATCH-C1'), ('ENROLL', 'BATCH1', 'BATCH-C2'),
+                                ('ENROLL', 'NOBODY', 'BATCH-C1'), ('ENROLL', 'BATCH1'),
+                                ('ENROLL', 'BATCH1', 'NO-COURSE'),
+                                ('GET_STUDENT', 'BATCH1', ['courses_enrolled'])])
+        client.close()
+        self.assertEqual(results[:4], ["Student BATCH1 added successfully", "Student BATCH1 enrolled in BATCH-C1",
+                                       "Student BATCH1 enrolled in BATCH-C2", "Student not found"])
+        self.assertTrue(results[4].startswith("Error processing command"))
+        self.assertEqual(results[5], "Course not found")  # No placeholder course is created
+        self.assertEqual(results[6], {'courses_enrolled': ['BATCH-C1', 'BATCH-C2']})
+        # The socket server shares the Flask app's store
+        student = University.get_instance().get_student('BATCH1')
+        self.assertEqual([s.user_id for s in University.get_instance().get_course('BATCH-C1').enrolled_students],
+                         [student.user_id])
+
+    def test_pool_reconnects_and_bounds_sockets(self):
+        from client import UniversityClientPool
+        from server import UniversityServer
+        server = UniversityServer(port=0)
+        threading.Thread(target=server.run, daemon=True).start()
+        pool = UniversityClientPool(port=server.port, size=2)
+        pool.add_student('POOL1', 'A', 'a@uni.edu', 'CS')
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.get_student('POOL1')['name']))
+                   for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['A'] * 16)
+        self.assertLessEqual(pool._idle.qsize(), 2)
+        for client in list(pool._idle.queue):
+            client.sock.close()  # Stale sockets, as after a server restart
+        self.assertTrue(pool.ping())
+        pool.close()
+
+    def test_pool_never_resends_a_write_the_server_may_have_run(self):
+        import socket
+        from unittest import mock
+        from client import UniversityClientPool
+        pool = UniversityClientPool(size=1)
+        stalled = mock.Mock(last_used=time.monotonic())
+        stalled.send.return_value = 1
+        stalled.receive.side_effect = socket.timeout("timed out")   # Sent, but no reply in time
+        pool._idle.put(stalled)
+        with mock.patch('client.UniversityClient') as reconnect:
+            with self.assertRaises(socket.timeout):
+                pool.add_student('POOL2', 'A', 'a@uni.edu', 'CS')
+        reconnect.assert_not_called()
+        stalled.close.assert_called_once()
+
+    def test_async_client_multiplexes_requests(self):
+        import asyncio
+        from client import AsyncUniversityClient
+        from server import AsyncUniversityServer
+        server = AsyncUniversityServer(port=0)
+        threading.Thread(target=server.run, daemon=True).start()
+
+        async def lookups():
+            async with AsyncUniversityClient(port=server.port, connections=2) as client:
+                await client.add_student('AC1', 'A', 'a@uni.edu', 'CS')
+                return await asyncio.gather(*[client.get_student('AC1', ['name']) for _ in range(200)])
+        self.assertEqual(asyncio.run(lookups()), [{'name': 'A'}] * 200)
+
+    def test_async_server_with_small_queue(self):
+        from client import UniversityClient
+        from server import AsyncUniversityServer
+        server = AsyncUniversityServer(port=0, workers=2, max_pending=2)
+        threading.Thread(target=server.run, daemon=True).start()
+        client = UniversityClient(port=server.port)
+        commands = [('ADD_STUDENT', f'ASYNC{i}', 'A', 'a@uni.edu', 'CS') for i in range(20)]
+        replies = client.pipeline(commands + [('GET_STUDENT', 'ASYNC19')])
+        client.close()
+        self.assertEqual(replies[:20], [f"Student ASYNC{i} added successfully" for i in range(20)])
+        self.assertEqual(replies[20]['student_id'], 'ASYNC19')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file